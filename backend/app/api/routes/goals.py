@@ -1,54 +1,188 @@
 import uuid
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+
+from app.core.config import settings
+from app.core.responses import FastJSONResponse, trusted_response
+from app.core.profiling import profiled
+from app.core.lifecycle import (
+    ClientDisconnectedError,
+    raise_if_cancelled,
+    run_detached,
+    run_until_disconnected,
+    start_background_job,
+    wait_until_disconnected
+)
 
 from app.models import GoalRequest, GoalGraphResponse, GoalGraphUpdateRequest
-from app.services import generate_goal_breakdown, regenerate_goal_breakdown, process_goal_with_dual_llm
+from app.services import (
+    generate_goal_breakdown,
+    regenerate_goal_breakdown,
+    PIPELINE_RANKED_CANDIDATES,
+    process_goal_with_pipeline,
+    generate_subtree_for_node,
+    make_checkpoint_key,
+    was_graph_truncated,
+    schedule_variant_prefetch,
+    take_prefetched_variant,
+    get_prefetch_stats,
+    get_token_usage,
+    fill_missing_descriptions,
+    schedule_description_fill,
+    search_user_goals
+)
 from app.db import (
     save_goal_graph,
     get_user_goal_graphs,
     get_goal_graph_by_id,
     delete_goal_graph,
-    update_goal_graph
+    update_goal_graph,
+    get_goal_graph_revisions,
+    get_goal_graph_revision
+)
+from app.utils import find_node, get_ancestor_path, splice_subtree, diff_nodes, delta_stats
+from app.utils.idempotency import (
+    IdempotencyStore,
+    IdempotencyKeyMismatchError,
+    IdempotencyKeyInProgressError,
+    request_fingerprint
 )
 
 router = APIRouter(prefix="/goals", tags=["goals"])
 
+# Responses of requests sent with an Idempotency-Key header (replayed by all
+# worker processes when SHARED_CACHE_PATH is set; requests still in progress
+# are only waited for by duplicates reaching the same worker)
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    wait_timeout_seconds=settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS,
+    shared_path=settings.SHARED_CACHE_PATH)
+
+# Status of a graph still being generated by an async job
+JOB_PENDING = "pending"
+
+# Nginx's code for requests closed by the client, so they stand out in the logs
+CLIENT_CLOSED_REQUEST = 499
+
+
+@profiled
+def _process_goal(request: GoalRequest, checkpoint_key: str, graph_id: Optional[str] = None) -> Dict[str, Any]:
+    """Run the LLM pipeline for a goal and save the resulting graph (under graph_id if given)."""
+    # Call the LLM pipeline to analyze the goal and generate a graph structure.
+    # A retry of the same request resumes after the last completed stage.
+    try:
+        nodes, pipeline = process_goal_with_pipeline(
+            request.goal, request.pipeline_mode, checkpoint_key)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    truncated = was_graph_truncated()
+
+    # Nothing is saved for a client that is gone
+    raise_if_cancelled()
+
+    # Save to Firebase if user_id is provided
+    saved = False
+    saved_graph_id = None
+
+    if request.user_id:
+        # Generate a unique ID for the graph, unless an async job already handed one out
+        graph_id = graph_id or str(uuid.uuid4())
+
+        # Save to Firebase and get the document ID
+        saved_graph_id = save_goal_graph(
+            request.user_id, request.goal, nodes, graph_id)
+
+        # If saving was successful, update the saved flag
+        if saved_graph_id:
+            saved = True
+            # Prepare alternatives in the background for a later regenerate
+            schedule_variant_prefetch(saved_graph_id, request.goal)
+            # Describe the nodes of a labels-first graph in the background
+            schedule_description_fill(saved_graph_id, nodes)
+
+    return {"nodes": nodes, "saved": saved, "graph_id": saved_graph_id, "pipeline": pipeline,
+            "truncated": truncated}
+
+
+async def _run_idempotent(
+    http_request: Request,
+    key: str,
+    payload: Any,
+    handler: Callable[[], Awaitable[Dict[str, Any]]],
+    status_code: int = 200,
+) -> FastJSONResponse:
+    """Run a handler once per idempotency key and replay its result to duplicates.
+
+    A client that disconnects stops waiting, but the handler is not cancelled:
+    a retry with the same key may be waiting for it, or replay it later.
+    """
+    try:
+        result, replayed = await wait_until_disconnected(http_request, idempotency_store.run(
+            key, request_fingerprint(payload), handler))
+    except IdempotencyKeyMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyKeyInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return trusted_response(result, headers, status_code)
+
+
+async def _start_goal_job(request: GoalRequest, checkpoint_key: str) -> Dict[str, Any]:
+    """Process a goal in the background and return the ID its graph will be saved under."""
+    graph_id = str(uuid.uuid4())
+    start_background_job(_process_goal, request, checkpoint_key, graph_id)
+    return {"nodes": [], "saved": False, "graph_id": graph_id, "pipeline": None, "status": JOB_PENDING}
+
 
 @router.post("/process", response_model=GoalGraphResponse)
-async def process_goal(request: GoalRequest):
-    """Process a goal and generate a breakdown of subgoals using dual LLM approach."""
+async def process_goal(
+    request: GoalRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None),
+):
+    """Process a goal and generate a breakdown of subgoals using dual LLM approach.
+
+    Requests sent with an Idempotency-Key header run the pipeline only once,
+    duplicates get the stored response.
+
+    If the client disconnects, the pipeline stops before its next LLM call and
+    nothing is saved, unless the request has an Idempotency-Key: then the
+    pipeline finishes for a retry to pick up. With async_job set, the response (202) only holds the
+    graph ID; the graph is generated in the background and can be fetched
+    from GET /goals/{graph_id} once it is saved.
+    """
     try:
         # Validate input
         if not request.goal or len(request.goal.strip()) == 0:
             raise HTTPException(status_code=400, detail="Goal cannot be empty")
 
-        # Call the dual LLM service to analyze the goal and generate a graph structure
-        try:
-            nodes = process_goal_with_dual_llm(request.goal)
-        except ValueError as e:
-            raise HTTPException(status_code=500, detail=str(e))
+        if request.async_job and not request.user_id:
+            raise HTTPException(
+                status_code=400, detail="An async job needs a user_id to save the graph")
 
-        # Save to Firebase if user_id is provided
-        saved = False
-        graph_id = None
+        status_code = 202 if request.async_job else 200
 
-        if request.user_id:
-            # Generate a unique ID for the graph
-            graph_id = str(uuid.uuid4())
+        if not idempotency_key:
+            checkpoint_key = make_checkpoint_key(
+                "process", request.user_id, request.goal, request.pipeline_mode)
+            if request.async_job:
+                return trusted_response(await _start_goal_job(request, checkpoint_key), status_code=status_code)
+            return trusted_response(await run_until_disconnected(
+                http_request, _process_goal, request, checkpoint_key))
 
-            # Save to Firebase and get the document ID
-            saved_graph_id = save_goal_graph(
-                request.user_id, request.goal, nodes, graph_id)
+        key = make_checkpoint_key("process", request.user_id, idempotency_key)
 
-            # If saving was successful, update the saved flag
-            if saved_graph_id:
-                saved = True
-                graph_id = saved_graph_id
-            else:
-                graph_id = None
+        def run() -> Awaitable[Dict[str, Any]]:
+            if request.async_job:
+                return _start_goal_job(request, key)
+            return run_detached(_process_goal, request, key)
 
-        return {"nodes": nodes, "saved": saved, "graph_id": graph_id}
+        return await _run_idempotent(
+            http_request, key, request.model_dump(), run, status_code)
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -56,12 +190,39 @@ async def process_goal(request: GoalRequest):
             status_code=500, detail=f"Unexpected error: {str(e)}")
 
 
+@router.get("/prefetch/stats", response_model=Dict[str, Any])
+async def get_prefetch_stats_endpoint():
+    """Report variant prefetch counters, hit rate and remaining budget."""
+    return get_prefetch_stats()
+
+
+@router.get("/tokens/stats", response_model=Dict[str, Any])
+async def get_token_stats_endpoint():
+    """Report the accumulated token usage per LLM call."""
+    return get_token_usage()
+
+
 @router.get("/user/{user_id}", response_model=List[Dict[str, Any]])
 async def get_user_goal_graphs_endpoint(user_id: str):
-    """Retrieve all goal graphs for a specific user."""
+    """Retrieve the summaries of all goal graphs of a specific user; fetch a graph's nodes by its ID."""
     try:
         graphs = get_user_goal_graphs(user_id)
-        return graphs
+        return trusted_response(graphs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/user/{user_id}/search", response_model=List[Dict[str, Any]])
+async def search_user_goal_graphs_endpoint(
+    user_id: str,
+    q: str = Query(..., min_length=1),
+    limit: Optional[int] = Query(None, ge=1, le=100)
+):
+    """Search a user's goal graphs by goal, node labels and descriptions, best match first."""
+    try:
+        # The search reads Firestore, which would block the event loop
+        results = await run_in_threadpool(search_user_goals, user_id, q, limit)
+        return trusted_response(results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -73,7 +234,7 @@ async def get_goal_graph_endpoint(graph_id: str):
         graph = get_goal_graph_by_id(graph_id)
         if not graph:
             raise HTTPException(status_code=404, detail="Goal graph not found")
-        return graph
+        return trusted_response(graph)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -129,33 +290,234 @@ async def update_goal_graph_endpoint(graph_id: str, request: GoalGraphUpdateRequ
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@profiled
+def _regenerate_goal_graph(graph_id: str, checkpoint_key: str) -> Dict[str, Any]:
+    """Rerun the LLM pipeline for a stored goal and overwrite its nodes."""
+    # Get the existing goal graph
+    graph = get_goal_graph_by_id(graph_id)
+    if not graph:
+        raise HTTPException(status_code=404, detail="Goal graph not found")
+
+    goal_text = graph.get("goal")
+
+    if not goal_text:
+        raise HTTPException(
+            status_code=400, detail="Goal text not found in the existing graph")
+
+    # Swap in a prefetched variant if one is ready. Otherwise pick the best of
+    # several ranked candidates (the runners-up are kept for the next regenerate
+    # of this graph), or run the pipeline when only one candidate is configured.
+    variant = take_prefetched_variant(graph_id, goal_text)
+    truncated = False
+    if variant is not None:
+        nodes, pipeline = variant.get("nodes", []), variant.get("pipeline")
+    else:
+        try:
+            if settings.REGENERATE_CANDIDATES > 1:
+                nodes = regenerate_goal_breakdown(goal_text, cache_key=graph_id)
+                pipeline = PIPELINE_RANKED_CANDIDATES
+            else:
+                nodes, pipeline = process_goal_with_pipeline(
+                    goal_text, checkpoint_key=checkpoint_key)
+                truncated = was_graph_truncated()
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    # Keep the graph as it was for a client that is gone
+    raise_if_cancelled()
+
+    # Refill the variant pool for the next regenerate
+    schedule_variant_prefetch(graph_id, goal_text, count=1)
+
+    # Update the existing graph with new nodes
+    success = update_goal_graph(graph_id, nodes=nodes)
+    saved = success
+    if saved:
+        schedule_description_fill(graph_id, nodes)
+
+    return {"nodes": nodes, "saved": saved, "graph_id": graph_id if saved else None, "pipeline": pipeline,
+            "truncated": truncated}
+
+
 @router.post("/{graph_id}/regenerate", response_model=GoalGraphResponse)
-async def regenerate_goal_graph_endpoint(graph_id: str):
+async def regenerate_goal_graph_endpoint(
+    graph_id: str,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None),
+):
     """Regenerate subgoals for an existing goal using the dual LLM approach."""
     try:
-        # Get the existing goal graph
-        graph = get_goal_graph_by_id(graph_id)
-        if not graph:
-            raise HTTPException(status_code=404, detail="Goal graph not found")
+        if not idempotency_key:
+            checkpoint_key = make_checkpoint_key("regenerate", graph_id)
+            return trusted_response(await run_until_disconnected(
+                http_request, _regenerate_goal_graph, graph_id, checkpoint_key))
 
-        goal_text = graph.get("goal")
-        user_id = graph.get("user_id")
+        key = make_checkpoint_key("regenerate", graph_id, idempotency_key)
+        return await _run_idempotent(
+            http_request, key, {"graph_id": graph_id},
+            lambda: run_detached(_regenerate_goal_graph, graph_id, key))
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if not goal_text:
-            raise HTTPException(
-                status_code=400, detail="Goal text not found in the existing graph")
 
-        # Call the dual LLM service to regenerate the graph structure
+@profiled
+def _regenerate_node_subtree(graph_id: str, node_id: str, replace: bool) -> Dict[str, Any]:
+    """Generate a new subtree for one node of a stored graph and splice it in."""
+    # Get the existing goal graph
+    graph = get_goal_graph_by_id(graph_id)
+    if not graph:
+        raise HTTPException(status_code=404, detail="Goal graph not found")
+
+    nodes = graph.get("nodes", [])
+    if find_node(nodes, node_id) is None:
+        raise HTTPException(status_code=404, detail="Node not found in the goal graph")
+
+    # Only the branch leading to the node is sent to the LLM
+    ancestor_path = get_ancestor_path(nodes, node_id)
+    existing_children = None
+    if not replace:
+        existing_children = [
+            node for node in nodes if node.get("parent_id") == node_id]
+
+    try:
+        subtree = generate_subtree_for_node(
+            graph.get("goal", ""), ancestor_path, existing_children)
+        nodes = splice_subtree(nodes, node_id, subtree, replace=replace)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Keep the graph as it was for a client that is gone
+    raise_if_cancelled()
+
+    # Update the existing graph with the spliced nodes
+    success = update_goal_graph(graph_id, nodes=nodes)
+    saved = success
+
+    return {"nodes": nodes, "saved": saved, "graph_id": graph_id if saved else None}
+
+
+@router.post("/{graph_id}/nodes/{node_id}/regenerate", response_model=GoalGraphResponse)
+async def regenerate_node_endpoint(graph_id: str, node_id: str, http_request: Request):
+    """Replace the subtree below a single node with a newly generated one."""
+    try:
+        return trusted_response(await run_until_disconnected(
+            http_request, _regenerate_node_subtree, graph_id, node_id, replace=True))
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/{graph_id}/nodes/{node_id}/expand", response_model=GoalGraphResponse)
+async def expand_node_endpoint(graph_id: str, node_id: str, http_request: Request):
+    """Add newly generated children below a single node, keeping the existing ones."""
+    try:
+        return trusted_response(await run_until_disconnected(
+            http_request, _regenerate_node_subtree, graph_id, node_id, replace=False))
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _get_node_description(graph_id: str, node_id: str) -> Dict[str, Any]:
+    """Return the description of a node, describing all undescribed nodes of its graph first."""
+    graph = get_goal_graph_by_id(graph_id)
+    if not graph:
+        raise HTTPException(status_code=404, detail="Goal graph not found")
+
+    node = find_node(graph.get("nodes", []), node_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Node not found in the goal graph")
+
+    if not node.get("description"):
         try:
-            nodes = process_goal_with_dual_llm(goal_text)
+            nodes = fill_missing_descriptions(graph_id)
         except ValueError as e:
             raise HTTPException(status_code=500, detail=str(e))
+        node = find_node(nodes or [], node_id) or node
+
+    return {"graph_id": graph_id, "node_id": node_id, "description": node.get("description")}
+
+
+@router.get("/{graph_id}/nodes/{node_id}/description", response_model=Dict[str, Any])
+async def get_node_description_endpoint(graph_id: str, node_id: str, http_request: Request):
+    """Get the description of a node of a graph generated labels first.
+
+    Missing descriptions are written in one batched LLM call for the whole
+    graph and stored, so later requests read them from the graph.
+    """
+    try:
+        return trusted_response(await run_until_disconnected(
+            http_request, _get_node_description, graph_id, node_id))
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{graph_id}/revisions", response_model=List[Dict[str, Any]])
+async def get_goal_graph_revisions_endpoint(graph_id: str):
+    """List the revisions of a goal graph, oldest first, with the number of changed nodes."""
+    try:
+        revisions = get_goal_graph_revisions(graph_id)
+        if not revisions:
+            raise HTTPException(status_code=404, detail="No revisions found for the goal graph")
+        return trusted_response(revisions)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{graph_id}/revisions/{revision}", response_model=Dict[str, Any])
+async def get_goal_graph_revision_endpoint(graph_id: str, revision: int):
+    """Retrieve a past revision of a goal graph."""
+    try:
+        graph_revision = get_goal_graph_revision(graph_id, revision)
+        if not graph_revision:
+            raise HTTPException(status_code=404, detail="Revision not found")
+        return trusted_response(dict(graph_revision, graph_id=graph_id))
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
-        # Update the existing graph with new nodes
-        success = update_goal_graph(graph_id, nodes=nodes)
-        saved = success
+@router.get("/{graph_id}/diff", response_model=Dict[str, Any])
+async def diff_goal_graph_revisions_endpoint(
+    graph_id: str,
+    from_revision: int = Query(..., alias="from", ge=1),
+    to_revision: int = Query(..., alias="to", ge=1)
+):
+    """Compare two revisions of a goal graph: added, removed, changed and reparented nodes."""
+    try:
+        old = get_goal_graph_revision(graph_id, from_revision)
+        new = get_goal_graph_revision(graph_id, to_revision)
+        if not old or not new:
+            raise HTTPException(status_code=404, detail="Revision not found")
 
-        return {"nodes": nodes, "saved": saved, "graph_id": graph_id if saved else None}
+        delta = diff_nodes(old["nodes"], new["nodes"])
+        result = {
+            "graph_id": graph_id,
+            "from": from_revision,
+            "to": to_revision,
+            "delta": delta,
+            "stats": delta_stats(delta)
+        }
+        if old.get("goal") != new.get("goal"):
+            result["goal"] = {"from": old.get("goal"), "to": new.get("goal")}
+        return trusted_response(result)
     except HTTPException as e:
         raise e
     except Exception as e:
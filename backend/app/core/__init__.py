@@ -1,3 +1,4 @@
 from .config import settings
+from .responses import FastJSONResponse, trusted_response
 
-__all__ = ["settings"]
+__all__ = ["settings", "FastJSONResponse", "trusted_response"]
@@ -23,13 +23,171 @@ class Settings(BaseSettings):
     # OpenAI settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
 
+    # Alternative LLM API endpoints, e.g. the local stand-ins of the load test
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")
+    # Served over the REST transport, which also accepts http:// endpoints
+    GOOGLE_GEMINI_API_ENDPOINT: str = os.getenv("GOOGLE_GEMINI_API_ENDPOINT", "")
+
+    # Goal pipeline settings
+    # "dual_llm", "local_outline" (outline parsed locally, LLM structuring only as fallback)
+    # or "auto" (simple goals get a single breakdown call, complex ones "dual_llm")
+    GRAPH_PIPELINE_MODE: str = os.getenv("GRAPH_PIPELINE_MODE", "dual_llm")
+    # "auto" mode: goals whose local complexity score is at most this are simple
+    SIMPLE_GOAL_MAX_SCORE: float = float(
+        os.getenv("SIMPLE_GOAL_MAX_SCORE", "1.0"))
+    # "auto" mode: model of the single breakdown call for simple goals
+    SIMPLE_GOAL_MODEL: str = os.getenv("SIMPLE_GOAL_MODEL", "gpt-4o-mini")
+    # How long a completed first stage is kept so a retried request can resume at stage 2
+    STAGE_CHECKPOINT_TTL_SECONDS: int = int(
+        os.getenv("STAGE_CHECKPOINT_TTL_SECONDS", "600"))
+    # Attempts per pipeline stage within a single request
+    ANALYZE_STAGE_MAX_ATTEMPTS: int = int(
+        os.getenv("ANALYZE_STAGE_MAX_ATTEMPTS", "1"))
+    STRUCTURE_STAGE_MAX_ATTEMPTS: int = int(
+        os.getenv("STRUCTURE_STAGE_MAX_ATTEMPTS", "2"))
+    # Stream the structuring call and stop it once this many nodes are complete; 0 disables it
+    STRUCTURE_NODE_CAP: int = int(os.getenv("STRUCTURE_NODE_CAP", "0"))
+
+    # Number of candidates requested per regenerate_goal_breakdown call, ranked locally
+    REGENERATE_CANDIDATES: int = int(os.getenv("REGENERATE_CANDIDATES", "1"))
+    # Model of regenerate_goal_breakdown. o-series models take no temperature, so their
+    # candidates are varied by the prompt, one call each; other models sample n at once.
+    REGENERATE_MODEL: str = os.getenv("REGENERATE_MODEL", "o3-mini")
+    # How long the runner-up candidates are kept as alternates
+    ALTERNATES_TTL_SECONDS: int = int(
+        os.getenv("ALTERNATES_TTL_SECONDS", "3600"))
+
+    # Token budgets
+    # Prompts above this many tokens are rejected before they are sent
+    MAX_PROMPT_TOKENS: int = int(os.getenv("MAX_PROMPT_TOKENS", "8000"))
+    # Output budget: base plus a share per expected node
+    OUTPUT_TOKENS_BASE: int = int(os.getenv("OUTPUT_TOKENS_BASE", "200"))
+    OUTPUT_TOKENS_PER_NODE: int = int(
+        os.getenv("OUTPUT_TOKENS_PER_NODE", "120"))
+    # Extra output budget for reasoning models (o3-mini counts reasoning as output):
+    # a base plus a share per expected node, so the cap still tracks the graph size.
+    # Too low a cap can end the response during reasoning with empty content.
+    REASONING_TOKENS_ALLOWANCE: int = int(
+        os.getenv("REASONING_TOKENS_ALLOWANCE", "2000"))
+    REASONING_TOKENS_PER_NODE: int = int(
+        os.getenv("REASONING_TOKENS_PER_NODE", "500"))
+
+    # Variant prefetch settings
+    # Generate alternative breakdowns in the background so regenerate can answer instantly
+    PREFETCH_VARIANTS_ENABLED: bool = os.getenv(
+        "PREFETCH_VARIANTS_ENABLED", "false").lower() == "true"
+    PREFETCH_VARIANTS_PER_GRAPH: int = int(
+        os.getenv("PREFETCH_VARIANTS_PER_GRAPH", "1"))
+    # Budget: maximum number of background pipeline runs per hour
+    PREFETCH_MAX_RUNS_PER_HOUR: int = int(
+        os.getenv("PREFETCH_MAX_RUNS_PER_HOUR", "100"))
+    PREFETCH_MAX_WORKERS: int = int(os.getenv("PREFETCH_MAX_WORKERS", "1"))
+
+    # Node description settings
+    # "inline" (the structuring call writes them), "background" (labels first, then one
+    # batched call after saving) or "on_demand" (written when a description is requested)
+    NODE_DESCRIPTIONS_MODE: str = os.getenv("NODE_DESCRIPTIONS_MODE", "inline")
+    # Output budget per node of a labels-only structuring call
+    LABEL_OUTPUT_TOKENS_PER_NODE: int = int(
+        os.getenv("LABEL_OUTPUT_TOKENS_PER_NODE", "30"))
+    # Model of the batched description call
+    DESCRIPTIONS_MODEL: str = os.getenv("DESCRIPTIONS_MODEL", "gpt-4o-mini")
+
+    # Idempotency settings
+    # How long responses are replayed for requests with the same Idempotency-Key
+    IDEMPOTENCY_TTL_SECONDS: int = int(
+        os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    # How long a duplicate waits for the original request to finish
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: int = int(
+        os.getenv("IDEMPOTENCY_WAIT_TIMEOUT_SECONDS", "120"))
+
+    # LLM record/replay settings
+    # "record" appends every provider call to the cassette, "replay" answers calls from it offline
+    LLM_CASSETTE_MODE: str = os.getenv("LLM_CASSETTE_MODE", "")
+    LLM_CASSETTE_PATH: str = os.getenv(
+        "LLM_CASSETTE_PATH", "cassettes/llm_calls.jsonl")
+    # "recorded" replays with the original latency, "zero" answers immediately
+    LLM_CASSETTE_REPLAY_LATENCY: str = os.getenv(
+        "LLM_CASSETTE_REPLAY_LATENCY", "recorded")
+
+    # LLM HTTP connection pool settings (one pool per provider client)
+    LLM_HTTP_MAX_CONNECTIONS: int = int(
+        os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    # Idle connections are kept open this long, so TLS handshakes are not repeated
+    LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(
+        os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", "120"))
+    LLM_HTTP_CONNECT_TIMEOUT_SECONDS: float = float(
+        os.getenv("LLM_HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+    # Reasoning models can take minutes to answer
+    LLM_HTTP_READ_TIMEOUT_SECONDS: float = float(
+        os.getenv("LLM_HTTP_READ_TIMEOUT_SECONDS", "300"))
+    LLM_HTTP_MAX_RETRIES: int = int(os.getenv("LLM_HTTP_MAX_RETRIES", "2"))
+
+    # Tracing settings
+    # "stdout", "file" or empty to create spans and request IDs without exporting them
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "")
+    # File the spans are appended to (OTLP/JSON, one document per line) with the file exporter
+    TRACING_EXPORT_PATH: str = os.getenv(
+        "TRACING_EXPORT_PATH", "traces/spans.jsonl")
+
+    # Profiling settings
+    # Requests with X-Profile: 1 (or ?profile=1) are profiled only with this admin token
+    PROFILING_ADMIN_TOKEN: str = os.getenv("PROFILING_ADMIN_TOKEN", "")
+    # Profile 1 in N goal API requests; 0 disables the sampled mode
+    PROFILING_SAMPLE_EVERY: int = int(os.getenv("PROFILING_SAMPLE_EVERY", "0"))
+    PROFILING_DIR: str = os.getenv("PROFILING_DIR", "profiles")
+
     # Firebase settings
     FIREBASE_SERVICE_ACCOUNT_KEY: str = os.getenv(
         "FIREBASE_SERVICE_ACCOUNT_KEY", "")
 
     # Server settings
+    # Create provider and Firestore clients at startup instead of on the first request
+    WARM_UP_ON_STARTUP: bool = os.getenv(
+        "WARM_UP_ON_STARTUP", "false").lower() == "true"
     HOST: str = os.getenv("BACKEND_HOST", "0.0.0.0")
     PORT: int = int(os.getenv("BACKEND_PORT", "8000"))
+    # On shutdown, how long to wait for running pipelines, background jobs and
+    # prefetches before the provider and Firestore connections are closed
+    SHUTDOWN_GRACE_PERIOD_SECONDS: float = float(
+        os.getenv("SHUTDOWN_GRACE_PERIOD_SECONDS", "30"))
+
+    # Production server settings (serve.py)
+    # Number of worker processes; 0 uses one per CPU core
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+    # Import the app once in the master process before forking the workers
+    PRELOAD_APP: bool = os.getenv("PRELOAD_APP", "false").lower() == "true"
+    # How long a stopping or restarting worker may finish its requests (LLM calls take up to a minute)
+    GRACEFUL_TIMEOUT_SECONDS: int = int(
+        os.getenv("GRACEFUL_TIMEOUT_SECONDS", "90"))
+    # Workers are restarted after this many requests (with jitter); 0 disables it
+    MAX_REQUESTS_PER_WORKER: int = int(
+        os.getenv("MAX_REQUESTS_PER_WORKER", "1000"))
+    # SQLite file for caches shared by all worker processes; empty keeps the caches per process
+    SHARED_CACHE_PATH: str = os.getenv("SHARED_CACHE_PATH", "")
+
+    # Graph cache settings
+    # Serve goal graph reads from memory, kept fresh by Firestore snapshot listeners
+    GRAPH_CACHE_ENABLED: bool = os.getenv(
+        "GRAPH_CACHE_ENABLED", "false").lower() == "true"
+    # Most recently read graphs that are cached, each with its own listener
+    GRAPH_CACHE_MAX_LISTENERS: int = int(
+        os.getenv("GRAPH_CACHE_MAX_LISTENERS", "100"))
+
+    # Search settings
+    # Users whose search index is kept in memory, and how long an unused one is kept
+    SEARCH_INDEX_MAX_USERS: int = int(
+        os.getenv("SEARCH_INDEX_MAX_USERS", "1000"))
+    SEARCH_INDEX_TTL_SECONDS: int = int(
+        os.getenv("SEARCH_INDEX_TTL_SECONDS", "3600"))
+    SEARCH_MAX_RESULTS: int = int(os.getenv("SEARCH_MAX_RESULTS", "20"))
+
+    # Revision history settings
+    # Every graph edit stores a delta; after this many deltas a full snapshot is stored again
+    REVISION_SNAPSHOT_INTERVAL: int = int(
+        os.getenv("REVISION_SNAPSHOT_INTERVAL", "10"))
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,247 @@
+"""Cancellation of request work on client disconnect, and draining of work on shutdown.
+
+The LLM pipeline runs in threadpool workers, where a provider call that has
+already started cannot be interrupted. Each request therefore gets a
+CancellationToken, which is checked before every provider call and before
+the result is written to Firestore. Once the client has gone away, the work
+stops at the next of these points instead of paying for the remaining
+stages.
+
+Goals processed as async jobs are not tied to a request and run to
+completion, as does the work of a request sent with an Idempotency-Key,
+which a retry of the request may be waiting for. On shutdown, ``drain`` waits for running pipelines and jobs.
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from app.core.metrics import CLIENT_DISCONNECTS
+
+
+class OperationCancelledError(Exception):
+    """Raised at a cancellation point when the client of the request disconnected."""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised by run_until_disconnected when the client left before the work finished."""
+
+
+class CancellationToken:
+    """A flag shared by a request handler and the worker thread running its work."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+_current_token: ContextVar[Optional[CancellationToken]] = ContextVar(
+    "cancellation_token", default=None)
+
+# Work running in worker threads, and the background jobs not yet finished
+_running = 0
+_idle = threading.Condition()
+_jobs: Set[asyncio.Task] = set()
+
+
+def raise_if_cancelled() -> None:
+    """
+    Stop the work of the current request if its client disconnected.
+
+    Raises:
+        OperationCancelledError: If the request was cancelled
+    """
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        raise OperationCancelledError("The client disconnected")
+
+
+@contextmanager
+def _tracked() -> Iterator[None]:
+    global _running
+    with _idle:
+        _running += 1
+    try:
+        yield
+    finally:
+        with _idle:
+            _running -= 1
+            _idle.notify_all()
+
+
+def _run_with_token(token: Optional[CancellationToken], func: Callable, *args: Any, **kwargs: Any) -> Any:
+    reset = _current_token.set(token)
+    try:
+        with _tracked():
+            return func(*args, **kwargs)
+    finally:
+        _current_token.reset(reset)
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # The body was already read, so the next message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+def _discard_result(work: asyncio.Future) -> None:
+    if not work.cancelled() and work.exception() is not None:
+        error = work.exception()
+        if not isinstance(error, OperationCancelledError):
+            print(f"Error in abandoned request work: {str(error)}")
+
+
+async def _until_disconnected(request: Request, work: asyncio.Future) -> bool:
+    """Wait for the work or for the client to disconnect; tell whether the work finished."""
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    return work.done()
+
+
+def _disconnected(request: Request) -> ClientDisconnectedError:
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    CLIENT_DISCONNECTS.inc(route=route)
+    return ClientDisconnectedError("The client disconnected before the response was ready")
+
+
+async def run_until_disconnected(request: Request, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking function in the threadpool and cancel it if the client disconnects.
+
+    Args:
+        request (Request): The request whose client is watched
+        func (Callable): The function to run, checking raise_if_cancelled at its cancellation points
+        *args (Any): Positional arguments passed to the function
+        **kwargs (Any): Keyword arguments passed to the function
+
+    Returns:
+        Any: The result of the function
+
+    Raises:
+        ClientDisconnectedError: If the client disconnected before the function finished
+    """
+    token = CancellationToken()
+    work = asyncio.ensure_future(run_in_threadpool(_run_with_token, token, func, *args, **kwargs))
+    try:
+        await _until_disconnected(request, work)
+    finally:
+        if not work.done():
+            # The worker thread stops at its next cancellation point
+            token.cancel()
+            work.add_done_callback(_discard_result)
+
+    if not work.done():
+        raise _disconnected(request)
+    return work.result()
+
+
+async def wait_until_disconnected(request: Request, awaitable: Awaitable[Any]) -> Any:
+    """
+    Wait for work shared with other requests, giving up if the client disconnects.
+
+    Unlike run_until_disconnected, the work is not cancelled when the client
+    leaves; only this request stops waiting for it.
+
+    Args:
+        request (Request): The request whose client is watched
+        awaitable (Awaitable[Any]): The wait for the shared work
+
+    Returns:
+        Any: The result of the work
+
+    Raises:
+        ClientDisconnectedError: If the client disconnected before the work finished
+    """
+    wait = asyncio.ensure_future(awaitable)
+    try:
+        finished = await _until_disconnected(request, wait)
+    finally:
+        if not wait.done():
+            wait.cancel()
+
+    if not finished:
+        raise _disconnected(request)
+    return wait.result()
+
+
+async def run_detached(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking function in the threadpool without a cancellation token.
+
+    The function runs to completion whoever is waiting for it, and shutdown
+    waits for it within the grace period.
+
+    Args:
+        func (Callable): The function to run
+        *args (Any): Positional arguments passed to the function
+        **kwargs (Any): Keyword arguments passed to the function
+
+    Returns:
+        Any: The result of the function
+    """
+    return await run_in_threadpool(_run_with_token, None, func, *args, **kwargs)
+
+
+def start_background_job(func: Callable, *args: Any, **kwargs: Any) -> asyncio.Task:
+    """
+    Run a blocking function in the threadpool independently of the current request.
+
+    The job runs to completion even if the client disconnects, and shutdown
+    waits for it within the grace period.
+
+    Args:
+        func (Callable): The function to run
+        *args (Any): Positional arguments passed to the function
+        **kwargs (Any): Keyword arguments passed to the function
+
+    Returns:
+        asyncio.Task: The task running the job
+    """
+    async def job():
+        try:
+            await run_in_threadpool(_run_with_token, None, func, *args, **kwargs)
+        except Exception as e:
+            print(f"Error in background job: {str(e)}")
+
+    task = asyncio.ensure_future(job())
+    _jobs.add(task)
+    task.add_done_callback(_jobs.discard)
+    return task
+
+
+def _wait_until_idle(timeout: float) -> bool:
+    with _idle:
+        return _idle.wait_for(lambda: _running == 0, timeout=timeout)
+
+
+async def drain(timeout: float) -> bool:
+    """
+    Wait for running request work and background jobs to finish.
+
+    Args:
+        timeout (float): The maximum time to wait, in seconds
+
+    Returns:
+        bool: True if everything finished in time
+    """
+    deadline = time.monotonic() + timeout
+    if _jobs:
+        await asyncio.wait(set(_jobs), timeout=timeout)
+    remaining = max(deadline - time.monotonic(), 0)
+    return await run_in_threadpool(_wait_until_idle, remaining) and not _jobs
@@ -0,0 +1,313 @@
+"""In-process metrics, served in the Prometheus text exposition format.
+
+Counters, gauges and histograms are plain Python objects guarded by a lock,
+so recording a value costs a dictionary lookup and no external dependency is
+needed. Modules that already keep their own counters (token usage) register
+a collector that is read when the metrics are rendered.
+"""
+import bisect
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.tracing import SPAN_KIND_CLIENT, start_span
+
+# Latency buckets in seconds, from fast Firestore reads to slow reasoning calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# A collected metric family: name, type, help text and (labels, value) samples
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(key, _escape(str(value))) for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class of labelled metrics."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError("{} expects labels {}, got {}".format(
+                self.name, self.labelnames, tuple(labels)))
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def clear(self) -> None:
+        """Forget all recorded values."""
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return ["{}{} {}".format(self.name, _format_labels(self._labels(key)), _format_value(value))
+                for key, value in items]
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, the +Inf bucket last, then the sum
+                state = [0] * (len(self.buckets) + 1) + [0.0]
+                self._values[key] = state
+            state[index] += 1
+            state[-1] += value
+
+    def get_count(self, **labels: Any) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state[:-1]) if state else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+
+        lines = []
+        for key, state in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                bucket_labels = dict(labels, le=_format_value(bound))
+                lines.append("{}_bucket{} {}".format(
+                    self.name, _format_labels(bucket_labels), cumulative))
+            lines.append("{}_sum{} {}".format(self.name, _format_labels(labels), _format_value(state[-1])))
+            lines.append("{}_count{} {}".format(self.name, _format_labels(labels), cumulative))
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics and collectors rendered by the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """Add a function that returns metric families read at render time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append("# HELP {} {}".format(metric.name, metric.documentation))
+            lines.append("# TYPE {} {}".format(metric.name, metric.kind))
+            lines.extend(metric.render())
+
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append("# HELP {} {}".format(name, documentation))
+                lines.append("# TYPE {} {}".format(name, kind))
+                lines.extend("{}{} {}".format(name, _format_labels(labels), _format_value(value))
+                             for labels, value in samples)
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests by route.",
+    ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.")
+STAGE_LATENCY = registry.histogram(
+    "pipeline_stage_duration_seconds", "Latency of LLM pipeline stages and Firestore operations.",
+    ("stage",))
+LLM_ERRORS = registry.counter(
+    "llm_errors_total", "Failed LLM calls by provider and stage.",
+    ("provider", "stage"))
+CACHE_LOOKUPS = registry.counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit or miss).",
+    ("cache", "result"))
+GOAL_ROUTING = registry.counter(
+    "goal_routing_decisions_total", "Goals routed to a pipeline tier by the complexity classifier.",
+    ("tier", "language"))
+TIER_LATENCY = registry.histogram(
+    "goal_pipeline_tier_duration_seconds", "Latency of routed goal pipelines by tier.",
+    ("tier",))
+CLIENT_DISCONNECTS = registry.counter(
+    "client_disconnects_total", "Requests whose client disconnected before the response, by route.",
+    ("route",))
+GRAPH_CACHE_LISTENERS = registry.gauge(
+    "graph_cache_listeners", "Firestore snapshot listeners of cached goal graphs.")
+GRAPH_CACHE_UPDATES = registry.counter(
+    "graph_cache_updates_total", "Cached goal graphs refreshed by a snapshot listener.")
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Count a lookup of a cache as a hit or a miss."""
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def timed_stage(stage: str, provider: Optional[str] = None) -> Callable:
+    """
+    Decorate a function so its latency is recorded under a pipeline stage.
+
+    The call is also traced as a client span named after the stage.
+
+    Args:
+        stage (str): The stage label, e.g. "analyze_goal_for_actions" or "firestore_get"
+        provider (str, optional): The LLM provider; failures are counted as LLM errors of it
+
+    Returns:
+        Callable: The decorator
+    """
+    span_attributes = {"stage": stage}
+    if provider:
+        span_attributes["llm.provider"] = provider
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with start_span(stage, span_attributes, SPAN_KIND_CLIENT):
+                    return func(*args, **kwargs)
+            except Exception:
+                if provider:
+                    LLM_ERRORS.inc(provider=provider, stage=stage)
+                raise
+            finally:
+                STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency and the in-flight count of HTTP requests.
+
+    Requests are labelled with the route template (e.g. /api/v1/goals/{graph_id})
+    rather than the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", "unmatched"),
+                status=status["code"])
+
+
+def render_metrics() -> str:
+    """Render all registered metrics in the Prometheus text exposition format."""
+    return registry.render()
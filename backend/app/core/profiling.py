@@ -0,0 +1,138 @@
+"""On-demand and sampled profiling of goal API requests.
+
+A request under /api/v1/goals is profiled with cProfile when
+
+- it carries an ``X-Profile: 1`` header or a ``profile=1`` query parameter
+  together with an ``X-Admin-Token`` header matching PROFILING_ADMIN_TOKEN, or
+- it is picked by the sampled mode, which profiles 1 in PROFILING_SAMPLE_EVERY
+  requests.
+
+cProfile only sees the thread it is enabled on, so the request is profiled on
+the event loop thread and every route helper decorated with ``profiled``
+profiles itself in its threadpool worker. The profiles are merged and written
+as a pstats file to PROFILING_DIR, readable with ``python -m pstats`` or
+snakeviz. Only one request is profiled at a time; the event loop profile also
+contains the code of requests served concurrently.
+"""
+import contextvars
+import cProfile
+import functools
+import hmac
+import itertools
+import os
+import pstats
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List
+from urllib.parse import parse_qs
+
+from app.core.config import settings
+
+PROFILE_FILE_HEADER = b"x-profile-file"
+
+_active_profiles: contextvars.ContextVar = contextvars.ContextVar("active_profiles", default=None)
+# Held while a request is profiled; a second profiler cannot run on the same thread
+_profiling_lock = threading.Lock()
+_request_counter = itertools.count(1)
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Decorate a function run in the threadpool so it is profiled with its request.
+
+    Without an active request profile the function is called directly.
+
+    Args:
+        func (Callable): The function
+
+    Returns:
+        Callable: The wrapped function
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiles = _active_profiles.get()
+        if profiles is None:
+            return func(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            profiles.append(profile)
+    return wrapper
+
+
+def _is_explicitly_requested(scope: Dict[str, Any]) -> bool:
+    """Check the profile flag and the admin token of a request."""
+    if not settings.PROFILING_ADMIN_TOKEN:
+        return False
+
+    headers = dict(scope.get("headers", []))
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    flag = headers.get(b"x-profile", b"").decode("latin-1") or query.get("profile", [""])[0]
+    if flag not in ("1", "true"):
+        return False
+
+    token = headers.get(b"x-admin-token", b"")
+    return hmac.compare_digest(token, settings.PROFILING_ADMIN_TOKEN.encode("latin-1"))
+
+
+def _is_sampled() -> bool:
+    every = settings.PROFILING_SAMPLE_EVERY
+    return every > 0 and next(_request_counter) % every == 0
+
+
+def _write_profile(profiles: List[cProfile.Profile], path: str) -> None:
+    """Merge the profiles of a request and write them as a pstats file."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+    except Exception as e:
+        print(f"Error writing request profile: {str(e)}")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests to the goal API on demand or by sampling."""
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self.path_prefix = settings.API_V1_STR + "/goals"
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not scope.get("path", "").startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        requested = _is_explicitly_requested(scope)
+        if not (requested or _is_sampled()) or not _profiling_lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        file_name = "{}-{}.prof".format(time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:8])
+
+        async def send_with_profile_header(message: Dict[str, Any]) -> None:
+            if requested and message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_FILE_HEADER, file_name.encode("latin-1"))]
+            await send(message)
+
+        profiles: List[cProfile.Profile] = []
+        token = _active_profiles.set(profiles)
+        loop_profile = cProfile.Profile()
+        try:
+            loop_profile.enable()
+            try:
+                await self.app(scope, receive, send_with_profile_header)
+            finally:
+                loop_profile.disable()
+                _active_profiles.reset(token)
+            _write_profile([loop_profile] + profiles,
+                           os.path.join(settings.PROFILING_DIR, file_name))
+        finally:
+            _profiling_lock.release()
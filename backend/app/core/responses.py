@@ -0,0 +1,47 @@
+import datetime
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    """Serialize the types orjson does not handle natively."""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    # Firestore timestamps are datetime subclasses, which orjson rejects
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """JSON response rendered by orjson, including Firestore timestamps and Pydantic models."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def trusted_response(
+    content: Any,
+    headers: Optional[Dict[str, str]] = None,
+    status_code: int = 200,
+) -> FastJSONResponse:
+    """Serialize data that is already validated, skipping response_model validation.
+
+    FastAPI only validates and encodes the return value of a route when it is
+    not a Response, so returning this keeps the response_model for the OpenAPI
+    schema without paying for a second validation pass.
+
+    Args:
+        content (Any): The already validated response data
+        headers (Dict[str, str], optional): Extra response headers
+        status_code (int): The HTTP status code
+
+    Returns:
+        FastJSONResponse: The rendered response
+    """
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
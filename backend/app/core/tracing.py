@@ -0,0 +1,255 @@
+"""Request tracing with spans exported in the OpenTelemetry (OTLP/JSON) format.
+
+Every HTTP request gets a root span and a request ID, which is returned in
+the X-Request-ID response header and added to log records as
+``%(request_id)s``. LLM stages and Firestore operations open child spans
+through ``start_span`` (see ``timed_stage`` in app.core.metrics). The current
+span is kept in a context variable, so spans opened in threadpool workers
+still attach to their request.
+
+Finished spans are written one OTLP/JSON ``resourceSpans`` document per line
+to stdout or to a file, depending on TRACING_EXPORTER. With no exporter the
+spans are still created, so request IDs work, but nothing is written.
+"""
+import contextvars
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import orjson
+
+from app.core.config import settings
+
+REQUEST_ID_HEADER = "x-request-id"
+_TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_REQUEST_ID_PATTERN = re.compile(r"^[\w\-.:]{1,128}$")
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+_export_file = None
+
+
+class Span:
+    """A timed operation of a trace."""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_span_id", "request_id",
+                 "attributes", "start_ns", "end_ns", "status_code", "status_message")
+
+    def __init__(self, name: str, kind: int, trace_id: str, parent_span_id: Optional[str],
+                 request_id: Optional[str], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent_span_id
+        self.request_id = request_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status_code = STATUS_OK
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = "{}: {}".format(type(error).__name__, str(error))
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Return the span in the OTLP/JSON representation."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _export(span: Span) -> None:
+    """Write a finished span with the configured exporter."""
+    global _export_file
+
+    exporter = settings.TRACING_EXPORTER
+    if not exporter:
+        return
+
+    line = orjson.dumps({"resourceSpans": [{
+        "resource": {"attributes": [_otlp_attribute("service.name", settings.PROJECT_NAME)]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp()]}],
+    }]}) + b"\n"
+
+    try:
+        with _export_lock:
+            if exporter == "stdout":
+                sys.stdout.buffer.write(line)
+                sys.stdout.flush()
+            elif exporter == "file":
+                if _export_file is None:
+                    directory = os.path.dirname(settings.TRACING_EXPORT_PATH)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    _export_file = open(settings.TRACING_EXPORT_PATH, "ab")
+                _export_file.write(line)
+                _export_file.flush()
+    except Exception as e:
+        print(f"Error exporting trace span: {str(e)}")
+
+
+def get_current_span() -> Optional[Span]:
+    """Return the span of the current context, if any."""
+    return _current_span.get()
+
+
+def get_request_id() -> Optional[str]:
+    """Return the request ID of the current context, if any."""
+    span = _current_span.get()
+    return span.request_id if span is not None else None
+
+
+@contextmanager
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    kind: int = SPAN_KIND_INTERNAL,
+    trace_id: Optional[str] = None,
+    parent_span_id: Optional[str] = None,
+    request_id: Optional[str] = None,
+) -> Iterator[Span]:
+    """
+    Open a span as a child of the current span, or as a new root span.
+
+    Args:
+        name (str): The span name, e.g. "create_graph_from_actions"
+        attributes (Dict[str, Any], optional): Span attributes
+        kind (int): The OTLP span kind
+        trace_id (str, optional): Trace ID of a new root span, e.g. from an incoming traceparent
+        parent_span_id (str, optional): Remote parent of a new root span
+        request_id (str, optional): Request ID of a new root span
+
+    Yields:
+        Span: The open span; it is ended and exported when the block exits
+    """
+    parent = _current_span.get()
+    if parent is not None and trace_id is None:
+        span = Span(name, kind, parent.trace_id, parent.span_id, parent.request_id, attributes)
+    else:
+        span = Span(name, kind, trace_id or uuid.uuid4().hex, parent_span_id,
+                    request_id, attributes)
+
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end_ns = time.time_ns()
+        _export(span)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of every HTTP request.
+
+    An incoming X-Request-ID header is reused as the request ID and an
+    incoming W3C traceparent header continues the caller's trace. The request
+    ID and the traceparent of the request span are added to the response.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1")
+                   for key, value in scope.get("headers", [])}
+        request_id = headers.get(REQUEST_ID_HEADER, "")
+        if not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        trace_id = parent_span_id = None
+        traceparent = _TRACEPARENT_PATTERN.match(headers.get("traceparent", ""))
+        if traceparent:
+            trace_id, parent_span_id = traceparent.group(1), traceparent.group(2)
+
+        method = scope.get("method", "")
+        attributes = {"http.method": method, "http.target": scope.get("path", ""),
+                      "request_id": request_id}
+
+        with start_span("HTTP " + method, attributes, SPAN_KIND_SERVER,
+                        trace_id or uuid.uuid4().hex, parent_span_id, request_id) as span:
+            async def send_with_headers(message: Dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status_code = STATUS_ERROR
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (REQUEST_ID_HEADER.encode("latin-1"), request_id.encode("latin-1")),
+                        (b"traceparent", "00-{}-{}-01".format(span.trace_id, span.span_id).encode("latin-1")),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.name = "{} {}".format(method, route.path)
+                    span.set_attribute("http.route", route.path)
+
+
+def install_log_record_factory() -> None:
+    """Add the request ID and trace ID of the current span to every log record.
+
+    Log formats can then use ``%(request_id)s`` and ``%(trace_id)s``; both are
+    "-" outside of a request.
+    """
+    previous_factory = logging.getLogRecordFactory()
+    if getattr(previous_factory, "_adds_request_id", False):
+        return
+
+    def factory(*args, **kwargs):
+        record = previous_factory(*args, **kwargs)
+        span = _current_span.get()
+        record.request_id = span.request_id if span is not None and span.request_id else "-"
+        record.trace_id = span.trace_id if span is not None else "-"
+        return record
+
+    factory._adds_request_id = True
+    logging.setLogRecordFactory(factory)
@@ -1,19 +1,31 @@
 from .firebase import (
     initialize_firebase,
+    close_firebase,
     save_goal_graph,
     get_user_goal_graphs,
     get_goal_graph_by_id,
+    get_goal_graph_terms,
     delete_goal_graph,
     update_goal_graph,
-    db
+    add_goal_graph_variant,
+    pop_goal_graph_variant,
+    set_node_descriptions,
+    get_goal_graph_revisions,
+    get_goal_graph_revision
 )
 
 __all__ = [
     "initialize_firebase",
+    "close_firebase",
     "save_goal_graph",
     "get_user_goal_graphs",
     "get_goal_graph_by_id",
+    "get_goal_graph_terms",
     "delete_goal_graph",
     "update_goal_graph",
-    "db"
+    "add_goal_graph_variant",
+    "pop_goal_graph_variant",
+    "set_node_descriptions",
+    "get_goal_graph_revisions",
+    "get_goal_graph_revision"
 ]
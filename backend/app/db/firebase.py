@@ -1,38 +1,202 @@
 import os
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
+import copy
+import json
+import threading
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 from typing import List, Dict, Any, Optional, Union
 
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.utils.graph_diff import diff_nodes, apply_delta, delta_stats
+from app.utils.search_index import graph_terms
+from app.db.graph_cache import (
+    graph_cache_enabled,
+    get_cached_graph,
+    cache_generation,
+    cache_graph,
+    invalidate_cached_graph,
+    clear_graph_cache
+)
+
 # Load environment variables
 load_dotenv()
 
 # Path to Firebase service account key
 firebase_key_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY")
 
+# The Firestore client, created on first use
+_db = None
+_db_lock = threading.Lock()
+_missing_key_reported = False
+
 
 def initialize_firebase():
-    """Initialize Firebase Admin SDK with the service account key."""
-    try:
-        if not firebase_key_path:
-            print(
-                "Warning: FIREBASE_SERVICE_ACCOUNT_KEY environment variable is not set.")
+    """Initialize Firebase Admin SDK with the service account key.
+
+    The SDK is imported and connected on the first call only; later calls
+    return the same Firestore client.
+    """
+    global _db, _missing_key_reported
+
+    if _db is not None:
+        return _db
+
+    with _db_lock:
+        if _db is not None:
+            return _db
+
+        try:
+            if not firebase_key_path:
+                if not _missing_key_reported:
+                    print(
+                        "Warning: FIREBASE_SERVICE_ACCOUNT_KEY environment variable is not set.")
+                    _missing_key_reported = True
+                return None
+
+            import firebase_admin
+            from firebase_admin import credentials
+            from firebase_admin import firestore
+
+            if not firebase_admin._apps:
+                cred = credentials.Certificate(firebase_key_path)
+                firebase_admin.initialize_app(cred)
+            _db = firestore.client()
+            print("Firebase initialized successfully.")
+            return _db
+        except Exception as e:
+            print(f"Error initializing Firebase: {str(e)}")
             return None
 
-        cred = credentials.Certificate(firebase_key_path)
-        firebase_admin.initialize_app(cred)
-        db = firestore.client()
-        print("Firebase initialized successfully.")
-        return db
-    except Exception as e:
-        print(f"Error initializing Firebase: {str(e)}")
+
+def close_firebase():
+    """Close the Firestore client and its connections, if it was created.
+
+    A later call to initialize_firebase creates a new client.
+    """
+    global _db
+
+    clear_graph_cache()
+    with _db_lock:
+        db, _db = _db, None
+
+    if db is not None:
+        try:
+            db.close()
+        except Exception as e:
+            print(f"Warning: error closing the Firestore client: {str(e)}")
+
+
+# Per-user summaries of the goal graphs (goal, dates, node count), one small
+# document per graph in user_goal_index/{user_id}/goals, so a history page
+# reads no nodes. A graph's summary is written in the graph's own transaction;
+# no document is shared by all of a user's writes. The user document marks
+# that the summaries of the user's older graphs were built.
+USER_INDEX_COLLECTION = 'user_goal_index'
+USER_INDEX_GOALS = 'goals'
+# The summary fields listed on a history page; the search terms of a graph
+# are kept in its summary too, but only read by the search (see search_service)
+SUMMARY_FIELDS = ['goal', 'node_count', 'created_at', 'updated_at']
+
+
+def _summary_ref(db, user_id, graph_id):
+    """Return the reference of a goal graph's history summary, None for a graph without a user."""
+    if not user_id:
         return None
+    return db.collection(USER_INDEX_COLLECTION).document(user_id).collection(
+        USER_INDEX_GOALS).document(graph_id)
+
+
+def _index_entry(data):
+    """Build the history summary of a goal graph document, with its search terms."""
+    return {
+        'goal': data.get('goal'),
+        'node_count': len(data.get('nodes') or []),
+        'created_at': data.get('created_at'),
+        'updated_at': data.get('updated_at', data.get('created_at')),
+        'terms': graph_terms(data)
+    }
 
 
+# Revision log of each goal graph: a full snapshot of the nodes, followed by
+# the deltas of later edits (see graph_diff), with a new snapshot every
+# settings.REVISION_SNAPSHOT_INTERVAL revisions
+REVISIONS_COLLECTION = 'revisions'
+
+
+def _revision_doc_id(revision):
+    """Zero-padded, so the revision documents sort by number."""
+    return f"{revision:08d}"
+
+
+def _add_revision(transaction, doc_ref, data, new_data):
+    """Log the new version of a goal graph within a transaction.
+
+    Args:
+        transaction: The Firestore transaction
+        doc_ref: The reference of the goal graph document
+        data (dict): The stored graph, None for a new one
+        new_data (dict): The graph after the write (goal and nodes)
+
+    Returns:
+        dict: The revision fields to store on the graph document
+    """
+    from firebase_admin import firestore
+
+    revisions_ref = doc_ref.collection(REVISIONS_COLLECTION)
+    revision, base = 0, 0
+    if data is not None:
+        revision = data.get('revision') or 0
+        base = data.get('revision_base') or 0
+        # Graphs saved before the log existed start it with their current version
+        if not revision:
+            revision = base = 1
+            transaction.set(revisions_ref.document(_revision_doc_id(1)), {
+                'revision': 1, 'base': 1, 'kind': 'snapshot', 'goal': data.get('goal'),
+                'nodes': data.get('nodes', []), 'stats': delta_stats({}),
+                'created_at': data.get('updated_at', data.get('created_at'))
+            })
+
+    revision += 1
+    nodes = new_data.get('nodes', [])
+    entry = {'revision': revision, 'goal': new_data.get('goal'), 'created_at': firestore.SERVER_TIMESTAMP}
+
+    delta = diff_nodes(data.get('nodes', []), nodes) if data is not None else {}
+    entry['stats'] = delta_stats(delta)
+    # A delta as large as the nodes themselves is not worth replaying
+    if (data is None or revision - base >= settings.REVISION_SNAPSHOT_INTERVAL
+            or len(json.dumps(delta, default=str)) >= len(json.dumps(nodes, default=str))):
+        base = revision
+        entry.update(kind='snapshot', nodes=nodes)
+    else:
+        entry.update(kind='delta', delta=delta)
+    entry['base'] = base
+
+    transaction.set(revisions_ref.document(_revision_doc_id(revision)), entry)
+    return {'revision': revision, 'revision_base': base}
+
+
+def _set_summary(transaction, db, graph_id, data):
+    """Write the history summary of a changed goal graph within a transaction."""
+    summary_ref = _summary_ref(db, data.get('user_id'), graph_id)
+    if summary_ref is not None:
+        transaction.set(summary_ref, _index_entry(data))
+
+
+def _save_in_transaction(transaction, doc_ref, summary_ref, data):
+    """Write a goal graph and its history summary within a transaction."""
+    data = dict(data, **_add_revision(transaction, doc_ref, None, data))
+    transaction.set(doc_ref, data)
+    if summary_ref is not None:
+        transaction.set(summary_ref, _index_entry(data))
+
+
+@timed_stage("firestore_save")
 def save_goal_graph(user_id, goal, nodes, graph_id=None):
     """Save a goal graph to Firestore.
 
+    The graph's history summary is written in the same transaction.
+
     Args:
         user_id (str): The ID of the user who created the goal
         goal (str): The main goal text
@@ -46,6 +210,8 @@ def save_goal_graph(user_id, goal, nodes, graph_id=None):
     if not db:
         return None
 
+    from firebase_admin import firestore
+
     try:
         # Create a document reference with either the provided ID or a generated one
         if graph_id:
@@ -53,47 +219,102 @@ def save_goal_graph(user_id, goal, nodes, graph_id=None):
         else:
             doc_ref = db.collection('goal_graphs').document()
 
-        # Set document data
-        doc_ref.set({
+        save = firestore.transactional(_save_in_transaction)
+        save(db.transaction(), doc_ref, _summary_ref(db, user_id, doc_ref.id), {
             'user_id': user_id,
             'goal': goal,
             'nodes': nodes,
             'created_at': firestore.SERVER_TIMESTAMP
         })
 
+        invalidate_cached_graph(doc_ref.id)
         return doc_ref.id
     except Exception as e:
         print(f"Error saving goal graph: {str(e)}")
         return None
 
 
+def _build_index_in_transaction(transaction, index_ref, query):
+    """Write the history summaries of all of a user's goal graphs within a transaction."""
+    from firebase_admin import firestore
+
+    if index_ref.get(transaction=transaction).exists:
+        return
+    for doc in query.stream(transaction=transaction):
+        transaction.set(index_ref.collection(USER_INDEX_GOALS).document(doc.id), _index_entry(doc.to_dict()))
+    transaction.set(index_ref, {'built_at': firestore.SERVER_TIMESTAMP})
+
+
+@timed_stage("firestore_list")
 def get_user_goal_graphs(user_id):
-    """Retrieve all goal graphs for a specific user."""
+    """Retrieve the summaries of all goal graphs of a specific user.
+
+    The summaries are read from the user's history index. Users whose older
+    graphs have no summaries yet get them built from a query over their
+    graphs on the first call.
+
+    Args:
+        user_id (str): The ID of the user
+
+    Returns:
+        list: The ID, goal, created_at, updated_at and node_count of each graph, newest first
+    """
     db = initialize_firebase()
     if not db:
         return []
 
-    try:
-        # Query documents by user_id
-        query = db.collection('goal_graphs').where('user_id', '==', user_id).order_by(
-            'created_at', direction=firestore.Query.DESCENDING)
-        docs = query.stream()
-
-        result = []
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            result.append(data)
+    from firebase_admin import firestore
 
+    try:
+        index_ref = db.collection(USER_INDEX_COLLECTION).document(user_id)
+        if not index_ref.get().exists:
+            query = db.collection('goal_graphs').where('user_id', '==', user_id)
+            build_index = firestore.transactional(_build_index_in_transaction)
+            build_index(db.transaction(), index_ref, query)
+
+        result = [dict(doc.to_dict(), id=doc.id, user_id=user_id)
+                  for doc in index_ref.collection(USER_INDEX_GOALS).select(SUMMARY_FIELDS).stream()]
+        result.sort(key=lambda entry: entry['created_at'] or datetime.min.replace(tzinfo=timezone.utc),
+                    reverse=True)
         return result
     except Exception as e:
         print(f"Error retrieving goal graphs: {str(e)}")
         return []
 
 
+@timed_stage("firestore_get_terms")
+def get_goal_graph_terms(user_id, graph_ids):
+    """Read the search terms of some of a user's goal graphs from their summaries.
+
+    All summaries are fetched in one batched read, without the other fields.
+
+    Args:
+        user_id (str): The ID of the user
+        graph_ids (list): The IDs of the goal graphs
+
+    Returns:
+        dict: The terms by graph ID, for the graphs whose summary has them
+    """
+    db = initialize_firebase()
+    if not db or not graph_ids:
+        return {}
+
+    try:
+        refs = [_summary_ref(db, user_id, graph_id) for graph_id in graph_ids]
+        return {doc.id: doc.to_dict()['terms'] for doc in db.get_all(refs, field_paths=['terms'])
+                if doc.exists and doc.to_dict().get('terms') is not None}
+    except Exception as e:
+        print(f"Error retrieving goal graph terms: {str(e)}")
+        return {}
+
+
+@timed_stage("firestore_get")
 def get_goal_graph_by_id(graph_id):
     """Retrieve a specific goal graph by its ID.
 
+    With settings.GRAPH_CACHE_ENABLED, recently read graphs are served from
+    memory (see graph_cache).
+
     Args:
         graph_id (str): The ID of the goal graph to retrieve
 
@@ -105,24 +326,48 @@ def get_goal_graph_by_id(graph_id):
         return None
 
     try:
+        if graph_cache_enabled():
+            found, data = get_cached_graph(graph_id)
+            if found:
+                return data
+            generation = cache_generation(graph_id)
+
         # Get document by ID
         doc_ref = db.collection('goal_graphs').document(graph_id)
         doc = doc_ref.get()
 
+        data = None
         if doc.exists:
             data = doc.to_dict()
             data['id'] = doc.id
-            return data
-        else:
-            return None
+
+        if graph_cache_enabled():
+            cache_graph(graph_id, doc_ref, data, generation)
+        return data
     except Exception as e:
         print(f"Error retrieving goal graph: {str(e)}")
         return None
 
 
+def _delete_in_transaction(transaction, db, doc_ref):
+    """Delete a goal graph and its history summary within a transaction."""
+    doc = doc_ref.get(transaction=transaction)
+    if not doc.exists:
+        return False
+
+    summary_ref = _summary_ref(db, doc.to_dict().get('user_id'), doc_ref.id)
+    transaction.delete(doc_ref)
+    if summary_ref is not None:
+        transaction.delete(summary_ref)
+    return True
+
+
+@timed_stage("firestore_delete")
 def delete_goal_graph(graph_id):
     """Delete a goal graph from Firestore.
 
+    The graph's history summary is deleted in the same transaction.
+
     Args:
         graph_id (str): The ID of the goal graph to delete
 
@@ -133,14 +378,22 @@ def delete_goal_graph(graph_id):
     if not db:
         return False
 
+    from firebase_admin import firestore
+
     try:
         # Delete document by ID
         doc_ref = db.collection('goal_graphs').document(graph_id)
         doc = doc_ref.get()
 
         if doc.exists:
-            doc_ref.delete()
-            return True
+            # Subcollections are not removed together with their parent document
+            for subcollection in ('variants', REVISIONS_COLLECTION):
+                for child in doc_ref.collection(subcollection).stream():
+                    child.reference.delete()
+            delete = firestore.transactional(_delete_in_transaction)
+            deleted = delete(db.transaction(), db, doc_ref)
+            invalidate_cached_graph(graph_id)
+            return deleted
         else:
             return False
     except Exception as e:
@@ -148,9 +401,25 @@ def delete_goal_graph(graph_id):
         return False
 
 
+def _update_in_transaction(transaction, db, doc_ref, update_data):
+    """Update a goal graph and its history summary within a transaction."""
+    doc = doc_ref.get(transaction=transaction)
+    if not doc.exists:
+        return False
+
+    data = doc.to_dict()
+    update_data = dict(update_data, **_add_revision(transaction, doc_ref, data, dict(data, **update_data)))
+    transaction.update(doc_ref, update_data)
+    _set_summary(transaction, db, doc_ref.id, dict(data, **update_data))
+    return True
+
+
+@timed_stage("firestore_update")
 def update_goal_graph(graph_id, goal=None, nodes=None):
     """Update an existing goal graph in Firestore.
 
+    The graph's history summary is updated in the same transaction.
+
     Args:
         graph_id (str): The ID of the goal graph to update
         goal (str, optional): The updated main goal text
@@ -163,14 +432,9 @@ def update_goal_graph(graph_id, goal=None, nodes=None):
     if not db:
         return False
 
-    try:
-        # Get document reference
-        doc_ref = db.collection('goal_graphs').document(graph_id)
-        doc = doc_ref.get()
-
-        if not doc.exists:
-            return False
+    from firebase_admin import firestore
 
+    try:
         # Prepare update data
         update_data = {}
         if goal is not None:
@@ -179,16 +443,199 @@ def update_goal_graph(graph_id, goal=None, nodes=None):
             update_data['nodes'] = nodes
 
         # Only update if there's data to update
-        if update_data:
-            update_data['updated_at'] = firestore.SERVER_TIMESTAMP
-            doc_ref.update(update_data)
-            return True
-        else:
+        if not update_data:
             return False
+
+        update_data['updated_at'] = firestore.SERVER_TIMESTAMP
+        doc_ref = db.collection('goal_graphs').document(graph_id)
+        update = firestore.transactional(_update_in_transaction)
+        updated = update(db.transaction(), db, doc_ref, update_data)
+        invalidate_cached_graph(graph_id)
+        return updated
     except Exception as e:
         print(f"Error updating goal graph: {str(e)}")
         return False
 
 
-# Initialize Firebase on module import
-db = initialize_firebase()
+@timed_stage("firestore_save_variant")
+def add_goal_graph_variant(graph_id, goal, nodes, pipeline=None):
+    """Store a pre-generated alternative breakdown for a goal graph.
+
+    Args:
+        graph_id (str): The ID of the goal graph the variant belongs to
+        goal (str): The goal text the variant was generated for
+        nodes (list): List of subgoal nodes of the variant
+        pipeline (str, optional): The pipeline path that produced the variant
+
+    Returns:
+        str: The ID of the created variant document if successful, None otherwise
+    """
+    db = initialize_firebase()
+    if not db:
+        return None
+
+    from firebase_admin import firestore
+
+    try:
+        doc_ref = db.collection('goal_graphs').document(
+            graph_id).collection('variants').document()
+        doc_ref.set({
+            'goal': goal,
+            'nodes': nodes,
+            'pipeline': pipeline,
+            'created_at': firestore.SERVER_TIMESTAMP
+        })
+        return doc_ref.id
+    except Exception as e:
+        print(f"Error saving goal graph variant: {str(e)}")
+        return None
+
+
+def _pop_variant_in_transaction(transaction, variants_ref):
+    """Read and delete the oldest variant within a transaction."""
+    docs = list(variants_ref.order_by('created_at').limit(
+        1).stream(transaction=transaction))
+    if not docs:
+        return None
+
+    transaction.delete(docs[0].reference)
+    return docs[0].to_dict()
+
+
+@timed_stage("firestore_pop_variant")
+def pop_goal_graph_variant(graph_id):
+    """Take the oldest pre-generated variant of a goal graph.
+
+    The variant is removed, so concurrent callers never get the same one.
+
+    Args:
+        graph_id (str): The ID of the goal graph
+
+    Returns:
+        dict: The variant data if one was available, None otherwise
+    """
+    db = initialize_firebase()
+    if not db:
+        return None
+
+    from firebase_admin import firestore
+
+    try:
+        variants_ref = db.collection('goal_graphs').document(
+            graph_id).collection('variants')
+        pop_variant = firestore.transactional(_pop_variant_in_transaction)
+        return pop_variant(db.transaction(), variants_ref)
+    except Exception as e:
+        print(f"Error retrieving goal graph variant: {str(e)}")
+        return None
+
+
+def _set_descriptions_in_transaction(transaction, db, doc_ref, descriptions):
+    """Fill in missing node descriptions within a transaction."""
+    from firebase_admin import firestore
+
+    doc = doc_ref.get(transaction=transaction)
+    if not doc.exists:
+        return None
+
+    data = doc.to_dict()
+    nodes = copy.deepcopy(data.get('nodes', []))
+    for node in nodes:
+        if not node.get('description') and node.get('id') in descriptions:
+            node['description'] = descriptions[node['id']]
+
+    update_data = {'nodes': nodes, 'updated_at': firestore.SERVER_TIMESTAMP}
+    update_data = dict(update_data, **_add_revision(transaction, doc_ref, data, dict(data, **update_data)))
+    transaction.update(doc_ref, update_data)
+    _set_summary(transaction, db, doc_ref.id, dict(data, **update_data))
+    return nodes
+
+
+@timed_stage("firestore_set_descriptions")
+def set_node_descriptions(graph_id, descriptions):
+    """Store generated descriptions of the nodes of a goal graph.
+
+    Only nodes that still exist and have no description are changed, so
+    edits made while the descriptions were generated are kept.
+
+    Args:
+        graph_id (str): The ID of the goal graph
+        descriptions (dict): The descriptions by node ID
+
+    Returns:
+        list: The updated nodes if successful, None otherwise
+    """
+    db = initialize_firebase()
+    if not db:
+        return None
+
+    from firebase_admin import firestore
+
+    try:
+        doc_ref = db.collection('goal_graphs').document(graph_id)
+        set_descriptions = firestore.transactional(_set_descriptions_in_transaction)
+        nodes = set_descriptions(db.transaction(), db, doc_ref, descriptions)
+        invalidate_cached_graph(graph_id)
+        return nodes
+    except Exception as e:
+        print(f"Error saving node descriptions: {str(e)}")
+        return None
+
+
+@timed_stage("firestore_list_revisions")
+def get_goal_graph_revisions(graph_id):
+    """List the revisions of a goal graph, without their nodes.
+
+    Args:
+        graph_id (str): The ID of the goal graph
+
+    Returns:
+        list: The revision number, kind, goal, created_at and change counts of each revision, oldest first
+    """
+    db = initialize_firebase()
+    if not db:
+        return []
+
+    try:
+        query = db.collection('goal_graphs').document(graph_id).collection(
+            REVISIONS_COLLECTION).order_by('revision').select(
+            ['revision', 'kind', 'goal', 'created_at', 'stats'])
+        return [doc.to_dict() for doc in query.stream()]
+    except Exception as e:
+        print(f"Error retrieving goal graph revisions: {str(e)}")
+        return []
+
+
+@timed_stage("firestore_get_revision")
+def get_goal_graph_revision(graph_id, revision):
+    """Rebuild a revision of a goal graph from its snapshot and the deltas after it.
+
+    Args:
+        graph_id (str): The ID of the goal graph
+        revision (int): The revision number
+
+    Returns:
+        dict: The revision number, goal, nodes and created_at if found, None otherwise
+    """
+    db = initialize_firebase()
+    if not db:
+        return None
+
+    try:
+        revisions_ref = db.collection('goal_graphs').document(graph_id).collection(REVISIONS_COLLECTION)
+        doc = revisions_ref.document(_revision_doc_id(revision)).get()
+        if not doc.exists:
+            return None
+
+        entries = revisions_ref.where('revision', '>=', doc.to_dict()['base']).where(
+            'revision', '<=', revision).order_by('revision').stream()
+        nodes = []
+        for entry in entries:
+            data = entry.to_dict()
+            nodes = data['nodes'] if data['kind'] == 'snapshot' else apply_delta(nodes, data['delta'])
+
+        return {'revision': revision, 'goal': data.get('goal'), 'nodes': nodes,
+                'created_at': data.get('created_at')}
+    except Exception as e:
+        print(f"Error retrieving goal graph revision: {str(e)}")
+        return None
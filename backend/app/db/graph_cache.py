@@ -0,0 +1,162 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import record_cache_lookup, GRAPH_CACHE_LISTENERS, GRAPH_CACHE_UPDATES
+from app.utils.ttl_cache import TTLCache
+
+
+class _Entry:
+    def __init__(self):
+        self.data: Optional[Dict[str, Any]] = None
+        # False until a read or a snapshot filled the entry, and after a local write
+        self.valid = False
+        self.watch = None
+
+
+# Recently read goal graphs by ID, least recently read first. Every entry
+# holds a snapshot listener that refreshes it when any worker changes the
+# document, so the cache never serves a stale graph for long.
+_entries: "OrderedDict[str, _Entry]" = OrderedDict()
+_lock = threading.Lock()
+# Write generation of each recently written graph, bumped by every local write.
+# It is kept apart from the entries, so a read of a graph that is not cached yet
+# cannot store data older than a write that finished while it was running.
+_generations = TTLCache(ttl_seconds=300, max_size=10000)
+
+
+def graph_cache_enabled() -> bool:
+    """Tell whether goal graph reads may be served from the in-process cache."""
+    return settings.GRAPH_CACHE_ENABLED and settings.GRAPH_CACHE_MAX_LISTENERS > 0
+
+
+def _unsubscribe(watch) -> None:
+    if watch is None:
+        return
+    try:
+        watch.unsubscribe()
+    except Exception as e:
+        print(f"Warning: error closing a graph snapshot listener: {str(e)}")
+    GRAPH_CACHE_LISTENERS.dec()
+
+
+def get_cached_graph(graph_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Look up a goal graph in the cache.
+
+    Args:
+        graph_id (str): The ID of the goal graph
+
+    Returns:
+        Tuple[bool, Optional[Dict[str, Any]]]: Whether the entry was found, and the
+        graph (None for a graph the listener saw deleted)
+    """
+    with _lock:
+        entry = _entries.get(graph_id)
+        hit = entry is not None and entry.valid
+        if hit:
+            _entries.move_to_end(graph_id)
+            data = copy.deepcopy(entry.data)
+
+    record_cache_lookup("goal_graph", hit)
+    return (True, data) if hit else (False, None)
+
+
+def _on_snapshot(graph_id: str):
+    def callback(doc_snapshots, changes, read_time):
+        for doc in doc_snapshots:
+            data = None
+            if doc.exists:
+                data = doc.to_dict()
+                data['id'] = doc.id
+            with _lock:
+                entry = _entries.get(graph_id)
+                if entry is not None:
+                    entry.data = data
+                    entry.valid = True
+            GRAPH_CACHE_UPDATES.inc()
+
+    return callback
+
+
+def cache_generation(graph_id: str) -> int:
+    """Return the write generation of a goal graph; take it before reading the graph."""
+    with _lock:
+        return _generations.get(graph_id, 0)
+
+
+def cache_graph(graph_id: str, doc_ref: Any, data: Optional[Dict[str, Any]], generation: int) -> None:
+    """
+    Store a goal graph read from Firestore and listen to changes of its document.
+
+    A read that started before a local write (an older generation) is dropped.
+    When more than settings.GRAPH_CACHE_MAX_LISTENERS graphs are cached, the
+    least recently read one is dropped and its listener closed.
+
+    Args:
+        graph_id (str): The ID of the goal graph
+        doc_ref (Any): The Firestore document reference of the graph
+        data (Optional[Dict[str, Any]]): The graph as read, None if it does not exist
+        generation (int): The cache_generation of the graph taken before the read
+    """
+    evicted = []
+    with _lock:
+        if _generations.get(graph_id, 0) != generation:
+            return
+        entry = _entries.get(graph_id)
+        subscribe = entry is None
+        if subscribe:
+            entry = _entries[graph_id] = _Entry()
+        # A snapshot that arrived since is newer than this read
+        if not entry.valid:
+            entry.data = copy.deepcopy(data)
+            entry.valid = True
+        _entries.move_to_end(graph_id)
+        while len(_entries) > settings.GRAPH_CACHE_MAX_LISTENERS:
+            evicted.append(_entries.popitem(last=False)[1].watch)
+
+    for watch in evicted:
+        _unsubscribe(watch)
+    if not subscribe:
+        return
+
+    try:
+        watch = doc_ref.on_snapshot(_on_snapshot(graph_id))
+    except Exception as e:
+        print(f"Warning: could not listen to goal graph {graph_id}: {str(e)}")
+        with _lock:
+            _entries.pop(graph_id, None)
+        return
+
+    GRAPH_CACHE_LISTENERS.inc()
+    with _lock:
+        current = _entries.get(graph_id)
+        if current is entry:
+            entry.watch = watch
+            return
+    # Evicted while the listener was starting
+    _unsubscribe(watch)
+
+
+def invalidate_cached_graph(graph_id: str) -> None:
+    """Make the next read of a goal graph go to Firestore, after a write by this worker.
+
+    The listener is kept and fills the entry again with the written document.
+    """
+    with _lock:
+        _generations.set(graph_id, _generations.get(graph_id, 0) + 1)
+        entry = _entries.get(graph_id)
+        if entry is not None:
+            entry.valid = False
+
+
+def clear_graph_cache() -> None:
+    """Drop all cached graphs and close their listeners."""
+    with _lock:
+        watches = [entry.watch for entry in _entries.values()]
+        _entries.clear()
+
+    for watch in watches:
+        _unsubscribe(watch)
@@ -1,20 +1,67 @@
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # Try both relative and absolute imports
 try:
     from app.core.config import settings
+    from app.core.responses import FastJSONResponse
+    from app.core.metrics import MetricsMiddleware, render_metrics
+    from app.core.tracing import TracingMiddleware, install_log_record_factory
+    from app.core.profiling import ProfilingMiddleware
+    from app.core.lifecycle import drain
     from app.api import router as api_router
 except ImportError:  # If running from within the app directory
     from core.config import settings
+    from core.responses import FastJSONResponse
+    from core.metrics import MetricsMiddleware, render_metrics
+    from core.tracing import TracingMiddleware, install_log_record_factory
+    from core.profiling import ProfilingMiddleware
+    from core.lifecycle import drain
     from api import router as api_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Optionally create provider clients and the Firestore client before serving requests.
+
+    On shutdown, running pipelines, async jobs and variant prefetches get
+    SHUTDOWN_GRACE_PERIOD_SECONDS to finish and store their results, then the
+    provider and Firestore connections are closed.
+    """
+    try:
+        from app.services.providers import warm_up_providers, close_providers
+        from app.services.prefetch_service import shutdown_prefetch
+        from app.db import initialize_firebase, close_firebase
+    except ImportError:  # If running from within the app directory
+        from services.providers import warm_up_providers, close_providers
+        from services.prefetch_service import shutdown_prefetch
+        from db import initialize_firebase, close_firebase
+
+    if settings.WARM_UP_ON_STARTUP:
+        warm_up_providers()
+        initialize_firebase()
+    yield
+
+    deadline = time.monotonic() + settings.SHUTDOWN_GRACE_PERIOD_SECONDS
+    if not await drain(settings.SHUTDOWN_GRACE_PERIOD_SECONDS):
+        print("Warning: shutting down with goal requests still running.")
+    if not await run_in_threadpool(shutdown_prefetch, max(deadline - time.monotonic(), 0)):
+        print("Warning: shutting down with variant prefetches still running.")
+    close_providers()
+    close_firebase()
+
+
 def create_application() -> FastAPI:
     """Create and configure the FastAPI application."""
     app = FastAPI(
         title=settings.PROJECT_NAME,
         description="API for goal visualization and planning",
+        default_response_class=FastJSONResponse,
+        lifespan=lifespan,
     )
 
     # Configure CORS
@@ -26,6 +73,16 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Profile goal API requests on demand (admin token) or 1 in N
+    app.add_middleware(ProfilingMiddleware)
+
+    # Open a span per request and return its request ID
+    app.add_middleware(TracingMiddleware)
+    install_log_record_factory()
+
+    # Record request latency and in-flight requests (outermost middleware)
+    app.add_middleware(MetricsMiddleware)
+
     # Include API routes
     app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -34,6 +91,11 @@ def create_application() -> FastAPI:
     async def root():
         return {"message": "Welcome to GraphedGoal API"}
 
+    # Metrics in the Prometheus text format
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
     return app
 
 
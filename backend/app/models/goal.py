@@ -1,10 +1,13 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Literal
 
 
 class GoalRequest(BaseModel):
     goal: str
     user_id: Optional[str] = None
+    pipeline_mode: Optional[Literal["dual_llm", "local_outline", "auto"]] = None
+    # Respond at once and finish the graph in the background, even if the client leaves
+    async_job: bool = False
 
 
 class SubgoalNode(BaseModel):
@@ -18,6 +21,11 @@ class GoalGraphResponse(BaseModel):
     nodes: List[SubgoalNode]
     saved: bool = False
     graph_id: Optional[str] = None
+    pipeline: Optional[str] = None
+    # "pending" while an async job is still generating the graph
+    status: Optional[str] = None
+    # The structuring call was stopped at the node cap (STRUCTURE_NODE_CAP)
+    truncated: bool = False
 
 
 class GoalGraphUpdateRequest(BaseModel):
@@ -1,8 +1,43 @@
-from .openai_service import generate_goal_breakdown, regenerate_goal_breakdown
-from .goal_analysis_service import process_goal_with_dual_llm
+from .openai_service import (
+    generate_goal_breakdown,
+    regenerate_goal_breakdown,
+    PIPELINE_RANKED_CANDIDATES
+)
+from .goal_analysis_service import (
+    process_goal_with_dual_llm,
+    process_goal_with_pipeline,
+    generate_subtree_for_node,
+    make_checkpoint_key,
+    was_graph_truncated
+)
+from .token_budget import get_token_usage
+from .prefetch_service import (
+    schedule_variant_prefetch,
+    take_prefetched_variant,
+    get_prefetch_stats,
+    shutdown_prefetch
+)
+from .description_service import (
+    fill_missing_descriptions,
+    schedule_description_fill
+)
+from .search_service import search_user_goals
 
 __all__ = [
     "generate_goal_breakdown",
     "regenerate_goal_breakdown",
-    "process_goal_with_dual_llm"
+    "PIPELINE_RANKED_CANDIDATES",
+    "process_goal_with_dual_llm",
+    "process_goal_with_pipeline",
+    "generate_subtree_for_node",
+    "make_checkpoint_key",
+    "was_graph_truncated",
+    "schedule_variant_prefetch",
+    "take_prefetched_variant",
+    "get_prefetch_stats",
+    "shutdown_prefetch",
+    "fill_missing_descriptions",
+    "schedule_description_fill",
+    "search_user_goals",
+    "get_token_usage"
 ]
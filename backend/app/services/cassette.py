@@ -0,0 +1,165 @@
+"""Record/replay of LLM provider calls.
+
+With LLM_CASSETTE_MODE set to "record", every provider call is made as usual
+and its request fingerprint, response body and latency are appended to the
+cassette file (one compact JSON object per line). With "replay", calls are
+answered from the cassette without any network access, after the recorded
+latency or immediately (LLM_CASSETTE_REPLAY_LATENCY="zero"). Requests
+recorded several times are replayed in turn.
+"""
+import hashlib
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from app.core.config import settings
+from app.core.lifecycle import raise_if_cancelled
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+
+def request_fingerprint(provider: str, request: Dict[str, Any]) -> str:
+    """
+    Build a stable fingerprint of a provider request.
+
+    Args:
+        provider (str): The provider name, e.g. "openai"
+        request (Dict[str, Any]): The request arguments
+
+    Returns:
+        str: The hex digest of the provider and the request
+    """
+    payload = orjson.dumps({"provider": provider, "request": request},
+                           option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _dump_openai(response: Any) -> Dict[str, Any]:
+    return response.model_dump(mode="json")
+
+
+def _load_openai(body: Dict[str, Any]) -> Any:
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate(body)
+
+
+def _dump_gemini(response: Any) -> Dict[str, Any]:
+    metadata = getattr(response, "usage_metadata", None)
+    return {
+        "text": response.text,
+        "usage_metadata": {
+            key: getattr(metadata, key) for key in ("prompt_token_count", "candidates_token_count")
+            if isinstance(getattr(metadata, key, None), int)
+        },
+    }
+
+
+def _load_gemini(body: Dict[str, Any]) -> Any:
+    # Only the parts of the response that the services read
+    return SimpleNamespace(text=body["text"], usage_metadata=SimpleNamespace(**body["usage_metadata"]))
+
+
+_CODECS = {
+    "openai": (_dump_openai, _load_openai),
+    "gemini": (_dump_gemini, _load_gemini),
+}
+
+
+class CassetteStore:
+    """Recorded provider responses, kept in memory and appended to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._replay_positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        entry = orjson.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+
+    def append(self, key: str, provider: str, latency_ms: float, response: Dict[str, Any]) -> None:
+        entry = {"key": key, "provider": provider, "latency_ms": round(latency_ms, 1), "response": response}
+        with self._lock:
+            self._entries.setdefault(key, []).append(entry)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(orjson.dumps(entry) + b"\n")
+
+    def next(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the next recorded entry of a request, cycling through its recordings."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            position = self._replay_positions.get(key, 0)
+            self._replay_positions[key] = position + 1
+            return entries[position % len(entries)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+
+_store: Optional[CassetteStore] = None
+_store_lock = threading.Lock()
+
+
+def get_cassette_store() -> CassetteStore:
+    """Return the cassette store of LLM_CASSETTE_PATH, loading it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None or _store.path != settings.LLM_CASSETTE_PATH:
+            _store = CassetteStore(settings.LLM_CASSETTE_PATH)
+        return _store
+
+
+def recorded_call(provider: str, request: Dict[str, Any], call: Callable[[], Any]) -> Any:
+    """
+    Make a provider call through the cassette layer.
+
+    Args:
+        provider (str): The provider name, "openai" or "gemini"
+        request (Dict[str, Any]): The request arguments, used for the fingerprint
+        call (Callable[[], Any]): Makes the live provider call
+
+    Returns:
+        Any: The live response, or the replayed one in replay mode
+
+    Raises:
+        ValueError: In replay mode, if the request was never recorded
+        OperationCancelledError: If the client of the request disconnected
+    """
+    # Every provider call passes here, so it is the place to stop abandoned work
+    raise_if_cancelled()
+
+    mode = settings.LLM_CASSETTE_MODE
+    if mode not in (MODE_RECORD, MODE_REPLAY):
+        return call()
+
+    dump, load = _CODECS[provider]
+    key = request_fingerprint(provider, request)
+    store = get_cassette_store()
+
+    if mode == MODE_REPLAY:
+        entry = store.next(key)
+        if entry is None:
+            raise ValueError(f"No recorded {provider} response for this request in {store.path}")
+        if settings.LLM_CASSETTE_REPLAY_LATENCY != "zero":
+            time.sleep(entry["latency_ms"] / 1000)
+        return load(entry["response"])
+
+    start = time.perf_counter()
+    response = call()
+    store.append(key, provider, (time.perf_counter() - start) * 1000, dump(response))
+    return response
@@ -0,0 +1,137 @@
+import threading
+from typing import List, Dict, Any, Optional
+
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.db import get_goal_graph_by_id, set_node_descriptions
+from app.utils.graph_utils import get_ancestor_path
+from app.utils.ttl_cache import TTLCache
+from app.services.prompts import DESCRIPTIONS_SYSTEM_PROMPT, DESCRIPTIONS_USER_TEMPLATE, build_messages
+from app.services.llm_json import descriptions_response_format, parse_descriptions
+from app.services.token_budget import enforce_prompt_budget, output_token_budget, record_token_usage
+from app.services.providers import get_openai_client
+from app.services.cassette import recorded_call
+from app.services.openai_service import is_reasoning_model
+from app.services.prefetch_service import submit_background_task
+from app.services.goal_analysis_service import DESCRIPTIONS_BACKGROUND
+
+# One fill per graph at a time, so a request for a description waits for a
+# running background fill instead of paying for the same descriptions again
+_graph_locks = TTLCache(ttl_seconds=600, max_size=1024)
+_graph_locks_lock = threading.Lock()
+
+
+def _graph_lock(graph_id: str) -> threading.Lock:
+    with _graph_locks_lock:
+        lock = _graph_locks.get(graph_id)
+        if lock is None:
+            lock = threading.Lock()
+            _graph_locks.set(graph_id, lock)
+        return lock
+
+
+@timed_stage("generate_node_descriptions", provider="openai")
+def generate_node_descriptions(
+    goal_text: str,
+    nodes: List[Dict[str, Any]],
+    node_ids: List[str],
+) -> Dict[str, str]:
+    """
+    Single LLM call: Write the descriptions of several nodes of a graph.
+
+    Each node is sent with the labels of the path leading to it, so the
+    descriptions fit the plan.
+
+    Args:
+        goal_text (str): The main goal of the graph
+        nodes (List[Dict[str, Any]]): All nodes of the graph
+        node_ids (List[str]): The IDs of the nodes to describe
+
+    Returns:
+        Dict[str, str]: The descriptions by node ID
+    """
+    steps_text = "\n".join(
+        "{}: {}".format(node_id, " > ".join(
+            node.get("label", "") for node in get_ancestor_path(nodes, node_id)))
+        for node_id in node_ids)
+
+    messages = build_messages(
+        DESCRIPTIONS_SYSTEM_PROMPT, DESCRIPTIONS_USER_TEMPLATE,
+        goal_text=goal_text, steps_text=steps_text)
+    prompt_tokens = enforce_prompt_budget(messages)
+
+    model = settings.DESCRIPTIONS_MODEL
+    request = {
+        "model": model,
+        "messages": messages,
+        "response_format": descriptions_response_format(),
+        "extra_body": {"max_completion_tokens": output_token_budget(
+            len(node_ids), reasoning=is_reasoning_model(model))},
+    }
+    response = recorded_call(
+        "openai", request, lambda: get_openai_client().chat.completions.create(**request))
+    record_token_usage("generate_node_descriptions", response, prompt_tokens)
+
+    return parse_descriptions(response.choices[0].message.content)
+
+
+def fill_missing_descriptions(graph_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Describe all nodes of a stored graph that have no description yet, in one batch.
+
+    Args:
+        graph_id (str): The ID of the goal graph
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The nodes with their descriptions, None if the graph does not exist
+    """
+    with _graph_lock(graph_id):
+        graph = get_goal_graph_by_id(graph_id)
+        if not graph:
+            return None
+
+        nodes = graph.get("nodes", [])
+        missing = [node["id"] for node in nodes if not node.get("description")]
+        if not missing:
+            return nodes
+
+        descriptions = generate_node_descriptions(graph.get("goal", ""), nodes, missing)
+        updated = set_node_descriptions(graph_id, descriptions)
+        if updated is not None:
+            return updated
+
+        # Not saved; the descriptions are still returned for this request
+        for node in nodes:
+            if not node.get("description") and node["id"] in descriptions:
+                node["description"] = descriptions[node["id"]]
+        return nodes
+
+
+def _fill_in_background(graph_id: str) -> None:
+    try:
+        fill_missing_descriptions(graph_id)
+    except Exception as e:
+        print(f"Error generating node descriptions: {str(e)}")
+
+
+def schedule_description_fill(graph_id: Optional[str], nodes: List[Dict[str, Any]]) -> bool:
+    """
+    Schedule the batched description call of a saved labels-first graph.
+
+    Nothing is scheduled unless settings.NODE_DESCRIPTIONS_MODE is
+    "background" and some nodes have no description.
+
+    Args:
+        graph_id (str): The ID of the saved goal graph
+        nodes (List[Dict[str, Any]]): The saved nodes
+
+    Returns:
+        bool: Whether the call was scheduled
+    """
+    if settings.NODE_DESCRIPTIONS_MODE != DESCRIPTIONS_BACKGROUND or not graph_id:
+        return False
+    if all(node.get("description") for node in nodes):
+        return False
+
+    submit_background_task(_fill_in_background, graph_id)
+    return True
@@ -1,31 +1,102 @@
-import os
-import json
-import openai
-import anthropic
-from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
-from app.models.goal import SubgoalNode
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import hashlib
+import time
+from contextvars import ContextVar
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from app.core.config import settings
+from app.core.metrics import timed_stage, record_cache_lookup, GOAL_ROUTING, TIER_LATENCY
+from app.core.lifecycle import OperationCancelledError
+from app.utils.outline_parser import parse_outline, outline_to_actions
+from app.utils.goal_complexity import classify_goal, TIER_SIMPLE
+from app.utils.shared_cache import create_cache
+from app.services.prompts import (
+    ANALYZE_ACTIONS_TEMPLATE,
+    ANALYZE_OUTLINE_TEMPLATE,
+    GRAPH_STRUCTURE_SYSTEM_PROMPT,
+    GRAPH_STRUCTURE_LABELS_SYSTEM_PROMPT,
+    GRAPH_STRUCTURE_USER_TEMPLATE,
+    SUBTREE_SYSTEM_PROMPT,
+    SUBTREE_USER_TEMPLATE,
+    SUBTREE_EXISTING_TEMPLATE,
+    build_messages
+)
+from app.services.llm_json import (
+    graph_response_format,
+    parse_graph_nodes,
+    StreamingNodeParser,
+    close_truncated_graph,
+    is_truncated_graph
+)
+from app.services.token_budget import enforce_prompt_budget, output_token_budget, record_token_usage, count_tokens
+from app.services.providers import get_openai_client, get_gemini_model
+from app.services.cassette import recorded_call
+from app.services.openai_service import generate_goal_breakdown
+
+# Pipeline modes and the paths reported back to the client
+PIPELINE_DUAL_LLM = "dual_llm"
+PIPELINE_LOCAL_OUTLINE = "local_outline"
+PIPELINE_OUTLINE_FALLBACK = "local_outline_fallback"
+PIPELINE_AUTO = "auto"
+PIPELINE_SINGLE_CALL = "single_call"
+
+# Node description modes, see settings.NODE_DESCRIPTIONS_MODE
+DESCRIPTIONS_INLINE = "inline"
+DESCRIPTIONS_BACKGROUND = "background"
+DESCRIPTIONS_ON_DEMAND = "on_demand"
+
+# Expected node counts, used for the output token budgets
+# (the goal plus up to 15 subgoals, or up to 6 sub-steps with their own sub-steps)
+MAX_GRAPH_NODES = 16
+MAX_SUBTREE_NODES = 12
+
+# Whether a structuring call of the current pipeline run stopped at the node cap.
+# Set in the thread running the pipeline, read by its caller with was_graph_truncated.
+_graph_truncated: ContextVar[bool] = ContextVar("graph_truncated", default=False)
+
+# Results of completed first stages, kept until the second stage succeeds
+# (shared by all worker processes when SHARED_CACHE_PATH is set)
+stage_checkpoints = create_cache(
+    "stage_checkpoints", settings.STAGE_CHECKPOINT_TTL_SECONDS, shared_path=settings.SHARED_CACHE_PATH)
+
+
+def _call_gemini(call_name: str, prompt: str, expected_nodes: int) -> str:
+    """
+    Send a prompt to Gemini and return the text of the response.
 
-# Load environment variables
-load_dotenv()
+    Args:
+        call_name (str): The name of the calling stage, used for token usage reporting
+        prompt (str): The prompt to send
+        expected_nodes (int): The number of items the response should contain, used for the output budget
 
-# Initialize OpenAI client
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
+    Returns:
+        str: The text content of the response
+    """
+    prompt_tokens = enforce_prompt_budget(prompt)
+
+    # Shared Gemini model handle, configured on first use
+    request = {
+        "model": "gemini-2.0-flash",
+        "contents": prompt,
+        "generation_config": {
+            "temperature": 0.7,
+            "max_output_tokens": output_token_budget(expected_nodes)
+        }
+    }
+    response = recorded_call("gemini", request, lambda: get_gemini_model(request["model"]).generate_content(
+        prompt, generation_config=request["generation_config"]))
+    record_token_usage(call_name, response, prompt_tokens)
 
-openai_client = openai.OpenAI(api_key=openai_api_key)
+    try:
+        content = response.text
+    except Exception as e:
+        raise ValueError(f"Error processing LLM response: {str(e)}")
 
-# Initialize Anthropic client
-anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-if not anthropic_api_key:
-    raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
+    if content is None:
+        raise ValueError("Empty response from LLM")
 
-anthropic_client = anthropic.Anthropic(api_key=anthropic_api_key)
+    return content
 
 
+@timed_stage("analyze_goal_for_actions", provider="gemini")
 def analyze_goal_for_actions(goal_text: str) -> List[str]:
     """
     First LLM call: Analyze the goal and generate 5-10 proposed actions.
@@ -36,52 +107,12 @@ def analyze_goal_for_actions(goal_text: str) -> List[str]:
     Returns:
         List[str]: A list of 5-10 proposed actions to achieve the goal
     """
+    prompt = ANALYZE_ACTIONS_TEMPLATE.format(goal_text=goal_text)
 
-    # Initialize Google Gemini API
-    gemini_api_key = os.getenv("GOOGLE_GEMINI_API_KEY")
-    if not gemini_api_key:
-        raise ValueError(
-            "GOOGLE_GEMINI_API_KEY environment variable is not set")
-
-    genai.configure(api_key=gemini_api_key)
-
-    prompt = f"""
-    Given the following goal: "{goal_text}"
-    
-    Analyze this goal and suggest 5-10 specific, concrete actions that would help achieve this goal.
-    Each action should be clear, actionable, and directly related to the goal.
-    
-    Your response must clearly depict which actions follow which, to enable presentation as a tree graph.
-    Indicate parent-child relationships between actions where appropriate.
-    
-    The actions must be named in the same language as the original goal query.
-    
-    Please format your response as a numbered list of actions, one per line.
-    """
-
-    # Configure safety settings
-    safety_settings = {
-        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-    }
-
-    # Call the Gemini API
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        generation_config={"temperature": 0.7},
-        safety_settings=safety_settings
-    )
-
-    response = model.generate_content(prompt)
+    content = _call_gemini("analyze_goal_for_actions", prompt, MAX_GRAPH_NODES)
 
     # Parse the response to extract the actions
     try:
-        content = response.text
-        if content is None:
-            raise ValueError("Empty response from LLM")
-
         # Extract the numbered actions from the text response
         # This regex-free approach is more robust for various response formats
         actions = []
@@ -104,10 +135,108 @@ def analyze_goal_for_actions(goal_text: str) -> List[str]:
         raise ValueError(f"Error processing LLM response: {str(e)}")
 
 
+@timed_stage("analyze_goal_for_outline", provider="gemini")
+def analyze_goal_for_outline(goal_text: str) -> str:
+    """
+    First LLM call (outline mode): Analyze the goal and return the actions as an outline.
+
+    The outline uses hierarchical numbering (1., 1.1, 1.2, 2., ...) so that the
+    tree can be built locally by ``parse_outline`` without a second LLM call.
+
+    Args:
+        goal_text (str): The main goal to analyze
+
+    Returns:
+        str: The raw outline text
+    """
+    prompt = ANALYZE_OUTLINE_TEMPLATE.format(goal_text=goal_text)
+
+    content = _call_gemini("analyze_goal_for_outline", prompt, MAX_GRAPH_NODES)
+
+    if not content.strip():
+        raise ValueError("Empty response from LLM")
+
+    return content
+
+
+def _stream_graph_completion(request: Dict[str, Any], node_cap: int, prompt_tokens: int) -> Any:
+    """
+    Stream a structuring call and stop it once node_cap nodes are complete.
+
+    Closing the stream ends the HTTP response, so the provider stops
+    generating. A stopped response holds the nodes received so far, closed
+    as valid JSON by close_truncated_graph; its completion tokens are counted
+    locally, since the provider only reports usage at the end of the stream.
+
+    Args:
+        request (Dict[str, Any]): The chat completion arguments
+        node_cap (int): The number of nodes after which the stream is stopped
+        prompt_tokens (int): The local prompt token count, reported for a stopped response
+
+    Returns:
+        Any: A ChatCompletion with the complete or the truncated content
+    """
+    from openai.types.chat import ChatCompletion
+
+    stream = get_openai_client().chat.completions.create(
+        **dict(request, stream=True,
+               extra_body=dict(request["extra_body"], stream_options={"include_usage": True})))
+
+    parser = StreamingNodeParser()
+    parts = []
+    completion = {"id": "", "created": int(time.time()), "model": request["model"]}
+    finish_reason = "stop"
+    usage = None
+    truncated = False
+    try:
+        for chunk in stream:
+            completion.update(id=chunk.id, created=chunk.created, model=chunk.model)
+            # The last chunk holds the usage of the whole call
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            text = chunk.choices[0].delta.content
+            if text:
+                parts.append(text)
+                if parser.feed(text) >= node_cap:
+                    truncated = True
+                    break
+    finally:
+        stream.response.close()
+
+    content = "".join(parts)
+    if truncated:
+        completion_tokens = count_tokens(content)
+        content = close_truncated_graph(parser.nodes[:node_cap])
+        finish_reason = "length"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+    return ChatCompletion.model_validate(dict(
+        completion, object="chat.completion", usage=usage,
+        choices=[{"index": 0, "finish_reason": finish_reason,
+                  "message": {"role": "assistant", "content": content}}]))
+
+
+def was_graph_truncated() -> bool:
+    """Tell whether the last pipeline run in this context stopped a structuring call at the node cap."""
+    return _graph_truncated.get()
+
+
+@timed_stage("create_graph_from_actions", provider="openai")
 def create_graph_from_actions(goal_text: str, actions: List[str]) -> List[Dict[str, Any]]:
     """
     Second LLM call: Transform the list of actions into a JSON graph structure.
 
+    Unless settings.NODE_DESCRIPTIONS_MODE is "inline", only IDs, labels and
+    parent links are generated, and the descriptions are written later (see
+    description_service), which takes most of the output tokens off this call.
+
+    With settings.STRUCTURE_NODE_CAP set, the response is streamed and stopped
+    once that many nodes are complete; was_graph_truncated then reports it.
+
     Args:
         goal_text (str): The main goal
         actions (List[str]): List of actions from the first LLM
@@ -115,126 +244,300 @@ def create_graph_from_actions(goal_text: str, actions: List[str]) -> List[Dict[s
     Returns:
         List[Dict[str, Any]]: A list of nodes representing the graph structure
     """
+    # A flag left over from an earlier call in this context must not describe this graph
+    _graph_truncated.set(False)
+
     # Prepare the actions as a numbered list for the prompt
     actions_text = "\n".join(
         [f"{i+1}. {action}" for i, action in enumerate(actions)])
 
-    prompt = f"""
-    Given the following goal: "{goal_text}"
-    
-    And these proposed actions to achieve it:
-    {actions_text}
-    
-    Create a hierarchical tree graph structure representing how these actions relate to each other.
-    Some actions may be prerequisites for others, some may be alternatives, and some may be subtasks.
-    
-    Format the response as a JSON object with a 'nodes' key containing an array where each node has the following properties:
-    - id: A unique string identifier (can be a simple number like "1", "2", etc.)
-    - label: A short, descriptive label for the action or subgoal
-    - parent_id: The ID of the parent node (null for the root node, which should be the main goal)
-    - description: A detailed description of what this action involves
-    
-    The first node should be the main goal with id "0" and parent_id null.
-    The subsequent nodes should represent the actions and any additional steps you think would help organize them logically.
-    
-    Ensure the tree structure is logical with clear parent-child relationships that make sense for achieving the goal.
-    
-    Here's an example of the exact JSON format I need:
-    
-    {{
-      "nodes": [
-        {{
-          "id": "0",
-          "label": "Learn Spanish in 6 months",
-          "parent_id": null,
-          "description": "Master conversational Spanish language skills within a 6-month timeframe"
-        }},
-        {{
-          "id": "1",
-          "label": "Establish learning resources",
-          "parent_id": "0",
-          "description": "Gather necessary learning materials including textbooks, apps, and online courses"
-        }},
-        {{
-          "id": "2",
-          "label": "Create study schedule",
-          "parent_id": "0",
-          "description": "Develop a consistent daily and weekly study plan to ensure regular practice"
-        }},
-        {{
-          "id": "3",
-          "label": "Find language exchange partner",
-          "parent_id": "0",
-          "description": "Connect with native speakers for conversation practice and cultural insights"
-        }}
-      ]
-    }}
-    """
+    descriptions = settings.NODE_DESCRIPTIONS_MODE == DESCRIPTIONS_INLINE
+    messages = build_messages(
+        GRAPH_STRUCTURE_SYSTEM_PROMPT if descriptions else GRAPH_STRUCTURE_LABELS_SYSTEM_PROMPT,
+        GRAPH_STRUCTURE_USER_TEMPLATE, goal_text=goal_text, actions_text=actions_text)
+    prompt_tokens = enforce_prompt_budget(messages)
 
     # Call the Anthropic API
-    # response = anthropic_client.messages.create(
+    # response = get_anthropic_client().messages.create(
     #     model="claude-3-5-sonnet-20240620",
     #     max_tokens=4000,
-    #     messages=[
-    #         {"role": "user", "content": prompt}
-    #     ],
+    #     messages=messages[1:],
     #     temperature=0.7,
-    #     system="You are a graph structure specialist that organizes actions into logical hierarchical trees."
+    #     system=messages[0]["content"]
     # )
 
     # Implement OpenAI o3-mini
-    response = openai_client.chat.completions.create(
-        model="o3-mini",
-        messages=[
-            {"role": "system", "content": "You are a graph structure specialist that organizes actions into logical hierarchical trees."},
-            {"role": "user", "content": prompt}
-        ],
-        # temperature=0.7,
-    )
-
-    # Parse the response
-    try:
-        # Extract the text content from the response
-        content = response.choices[0].message.content
+    # The pinned SDK has no max_completion_tokens argument, which o-series models require
+    request = {
+        "model": "o3-mini",
+        "messages": messages,
+        "response_format": graph_response_format(descriptions=descriptions),
+        "extra_body": {"max_completion_tokens": output_token_budget(
+            max(len(actions) + 1, MAX_GRAPH_NODES), reasoning=True,
+            tokens_per_node=None if descriptions else settings.LABEL_OUTPUT_TOKENS_PER_NODE)},
+        # "temperature": 0.7,
+    }
+    node_cap = settings.STRUCTURE_NODE_CAP
+    if node_cap > 0:
+        response = recorded_call(
+            "openai", dict(request, node_cap=node_cap),
+            lambda: _stream_graph_completion(request, node_cap, prompt_tokens))
+    else:
+        response = recorded_call(
+            "openai", request, lambda: get_openai_client().chat.completions.create(**request))
+    record_token_usage("create_graph_from_actions", response, prompt_tokens)
+
+    # Parse and validate the response
+    content = response.choices[0].message.content
+    nodes = parse_graph_nodes(content)
+    if is_truncated_graph(content):
+        _graph_truncated.set(True)
+    return nodes
+
+
+@timed_stage("generate_subtree_for_node", provider="openai")
+def generate_subtree_for_node(
+    goal_text: str,
+    ancestor_path: List[Dict[str, Any]],
+    existing_children: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Single LLM call: Break down one node of an existing graph into sub-steps.
 
-        if not content:
-            raise ValueError("Empty response from LLM")
+    Only the node and the path leading to it are sent to the LLM, so the prompt
+    size scales with the branch instead of the whole plan.
 
-        data = json.loads(content)
-        nodes = data.get("nodes", [])
+    Args:
+        goal_text (str): The main goal of the graph
+        ancestor_path (List[Dict[str, Any]]): The nodes from the root down to the node to break down
+        existing_children (List[Dict[str, Any]], optional): Children to keep and not duplicate (expand mode)
 
-        # Validate the response structure
-        for node in nodes:
-            if not all(key in node for key in ["id", "label"]):
-                raise ValueError("Invalid node structure in LLM response")
+    Returns:
+        List[Dict[str, Any]]: The new subtree nodes. Top-level nodes have parent_id null.
+    """
+    if not ancestor_path:
+        raise ValueError("Ancestor path cannot be empty")
+
+    node = ancestor_path[-1]
+    path_text = " > ".join(step.get("label", "") for step in ancestor_path)
+
+    existing_text = ""
+    if existing_children:
+        existing_text = SUBTREE_EXISTING_TEMPLATE.format(existing_labels="\n".join(
+            [f"- {child.get('label', '')}" for child in existing_children]))
+
+    messages = build_messages(
+        SUBTREE_SYSTEM_PROMPT, SUBTREE_USER_TEMPLATE,
+        goal_text=goal_text, path_text=path_text, label=node.get("label", ""),
+        description=node.get("description") or "", existing_text=existing_text)
+    prompt_tokens = enforce_prompt_budget(messages)
+
+    request = {
+        "model": "o3-mini",
+        "messages": messages,
+        "response_format": graph_response_format("goal_subtree"),
+        "extra_body": {"max_completion_tokens": output_token_budget(
+            MAX_SUBTREE_NODES, reasoning=True)},
+    }
+    response = recorded_call(
+        "openai", request, lambda: get_openai_client().chat.completions.create(**request))
+    record_token_usage("generate_subtree_for_node", response, prompt_tokens)
 
-        return nodes
+    # Parse and validate the response
+    nodes = parse_graph_nodes(response.choices[0].message.content)
+    if not nodes:
+        raise ValueError("No sub-steps found in LLM response")
 
-    except json.JSONDecodeError:
-        raise ValueError("Error parsing LLM response: Invalid JSON format")
-    except Exception as e:
-        raise ValueError(f"Error processing LLM response: {str(e)}")
+    return nodes
+
+
+def make_checkpoint_key(*parts: Optional[str]) -> str:
+    """
+    Build a checkpoint key from the parts that identify a request.
 
+    Args:
+        *parts (str): The identifying parts, e.g. route, user ID, goal text and pipeline mode
 
-def process_goal_with_dual_llm(goal_text: str) -> List[Dict[str, Any]]:
+    Returns:
+        str: A stable key for the stage checkpoint store
+    """
+    raw_key = "\x1f".join(part or "" for part in parts)
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+def _run_stage(stage: str, max_attempts: int, func: Callable, *args: Any) -> Any:
+    """
+    Run one pipeline stage, retrying it up to its own attempt limit.
+
+    Args:
+        stage (str): The stage name, used in log messages
+        max_attempts (int): How many times the stage may be attempted
+        func (Callable): The stage function
+        *args (Any): Arguments passed to the stage function
+
+    Returns:
+        Any: The result of the stage function
+    """
+    last_error = None
+    for attempt in range(1, max(max_attempts, 1) + 1):
+        try:
+            return func(*args)
+        except OperationCancelledError:
+            # The client disconnected, retrying would only add cost
+            raise
+        except Exception as e:
+            last_error = e
+            print(
+                f"Pipeline stage {stage} failed (attempt {attempt}/{max_attempts}): {str(e)}")
+    raise last_error
+
+
+def _run_first_stage(
+    goal_text: str,
+    analyzer: Callable[[str], Any],
+    checkpoint_key: Optional[str],
+) -> Any:
+    """
+    Run the first LLM stage, or resume from its checkpoint if a previous attempt completed it.
+
+    Args:
+        goal_text (str): The main goal to analyze
+        analyzer (Callable): The first stage function
+        checkpoint_key (str, optional): Key of the stage checkpoint. No checkpoint is stored if None.
+
+    Returns:
+        Any: The result of the first stage
+    """
+    if checkpoint_key:
+        checkpoint = stage_checkpoints.get(checkpoint_key)
+        record_cache_lookup("stage_checkpoint", checkpoint is not None)
+        if checkpoint is not None:
+            return checkpoint
+
+    result = _run_stage("analyze", settings.ANALYZE_STAGE_MAX_ATTEMPTS,
+                        analyzer, goal_text)
+
+    if checkpoint_key:
+        stage_checkpoints.set(checkpoint_key, result)
+
+    return result
+
+
+def process_goal_with_dual_llm(goal_text: str, checkpoint_key: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Process a goal using two LLM calls:
     1. Analyze the goal to get proposed actions
     2. Convert those actions into a graph structure
 
+    If a checkpoint key is given, the actions from the first call are kept in
+    the checkpoint store until the second call succeeds, so a retried request
+    resumes at the second call.
+
     Args:
         goal_text (str): The main goal to process
+        checkpoint_key (str, optional): Key of the stage checkpoint
 
     Returns:
         List[Dict[str, Any]]: A list of nodes representing the graph structure
     """
     # First LLM call to analyze the goal and get actions
-    actions = analyze_goal_for_actions(goal_text)
+    actions = _run_first_stage(
+        goal_text, analyze_goal_for_actions, checkpoint_key)
 
     # Second LLM call to create the graph structure
-    nodes = create_graph_from_actions(goal_text, actions)
+    nodes = _run_stage("structure", settings.STRUCTURE_STAGE_MAX_ATTEMPTS,
+                       create_graph_from_actions, goal_text, actions)
+
+    # The nodes were already validated when the response was parsed
+    if checkpoint_key:
+        stage_checkpoints.pop(checkpoint_key)
+
+    return nodes
+
+
+def process_goal_with_routing(
+    goal_text: str,
+    checkpoint_key: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Route a goal to a pipeline tier by its local complexity classification.
+
+    Simple goals (e.g. "Drink more water") get a single breakdown call with
+    the fast settings.SIMPLE_GOAL_MODEL, complex ones (e.g. "Launch a SaaS
+    business") the dual LLM pipeline. The routing decision and the latency
+    of each tier are recorded in the metrics.
+
+    Args:
+        goal_text (str): The main goal to process
+        checkpoint_key (str, optional): Key of the stage checkpoint of the dual LLM pipeline
+
+    Returns:
+        Tuple[List[Dict[str, Any]], str]: The graph nodes and the pipeline path that produced them
+    """
+    classification = classify_goal(goal_text, settings.SIMPLE_GOAL_MAX_SCORE)
+    tier = classification["tier"]
+    GOAL_ROUTING.inc(tier=tier, language=classification["language"])
+
+    start = time.perf_counter()
+    try:
+        if tier == TIER_SIMPLE:
+            nodes = _run_stage("breakdown", settings.STRUCTURE_STAGE_MAX_ATTEMPTS,
+                               generate_goal_breakdown, goal_text, settings.SIMPLE_GOAL_MODEL)
+            return nodes, PIPELINE_SINGLE_CALL
+        return process_goal_with_dual_llm(goal_text, checkpoint_key), PIPELINE_DUAL_LLM
+    finally:
+        TIER_LATENCY.observe(time.perf_counter() - start, tier=tier)
+
+
+def process_goal_with_pipeline(
+    goal_text: str,
+    mode: Optional[str] = None,
+    checkpoint_key: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Process a goal with the selected pipeline mode.
+
+    - "dual_llm": Gemini proposes actions, o3-mini structures them into a tree
+    - "local_outline": Gemini returns an outline that is parsed into a tree locally.
+      If the outline cannot be parsed, the actions are structured by o3-mini instead.
+    - "auto": simple goals get a single call, complex ones "dual_llm", see process_goal_with_routing
+
+    Args:
+        goal_text (str): The main goal to process
+        mode (str, optional): The pipeline mode. Defaults to settings.GRAPH_PIPELINE_MODE.
+        checkpoint_key (str, optional): Key of the stage checkpoint, see process_goal_with_dual_llm
+
+    Returns:
+        Tuple[List[Dict[str, Any]], str]: The graph nodes and the pipeline path that produced them
+    """
+    mode = mode or settings.GRAPH_PIPELINE_MODE
+    _graph_truncated.set(False)
+
+    if mode == PIPELINE_DUAL_LLM:
+        return process_goal_with_dual_llm(goal_text, checkpoint_key), PIPELINE_DUAL_LLM
+
+    if mode == PIPELINE_AUTO:
+        return process_goal_with_routing(goal_text, checkpoint_key)
+
+    if mode != PIPELINE_LOCAL_OUTLINE:
+        raise ValueError(f"Unknown pipeline mode: {mode}")
+
+    outline_text = _run_first_stage(
+        goal_text, analyze_goal_for_outline, checkpoint_key)
+
+    try:
+        nodes = parse_outline(goal_text, outline_text)
+        pipeline = PIPELINE_LOCAL_OUTLINE
+    except ValueError:
+        # The outline could not be parsed, let the LLM structure the actions
+        actions = outline_to_actions(outline_text)
+        if not actions:
+            raise ValueError("No actions found in LLM response")
+        nodes = _run_stage("structure", settings.STRUCTURE_STAGE_MAX_ATTEMPTS,
+                           create_graph_from_actions, goal_text, actions)
+        pipeline = PIPELINE_OUTLINE_FALLBACK
 
-    # Convert raw dictionaries to SubgoalNode objects and back to dict for consistency
-    subgoal_nodes = [SubgoalNode(**node).dict() for node in nodes]
+    if checkpoint_key:
+        stage_checkpoints.pop(checkpoint_key)
 
-    return subgoal_nodes
+    return nodes, pipeline
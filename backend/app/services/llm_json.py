@@ -0,0 +1,318 @@
+import copy
+import re
+from typing import List, Dict, Any, Optional
+
+import orjson
+from pydantic import TypeAdapter, ValidationError
+
+from app.models.goal import SubgoalNode
+
+# JSON schema of a graph response, used for schema-constrained structured output
+GRAPH_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "nodes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "label": {"type": "string"},
+                    "parent_id": {"type": ["string", "null"]},
+                    "description": {"type": "string"}
+                },
+                "required": ["id", "label", "parent_id", "description"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["nodes"],
+    "additionalProperties": False
+}
+
+# The same without descriptions, for labels-first generation
+GRAPH_LABELS_RESPONSE_SCHEMA = copy.deepcopy(GRAPH_RESPONSE_SCHEMA)
+_label_node_schema = GRAPH_LABELS_RESPONSE_SCHEMA["properties"]["nodes"]["items"]
+del _label_node_schema["properties"]["description"]
+_label_node_schema["required"].remove("description")
+
+# JSON schema of a batch of node descriptions
+DESCRIPTIONS_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "descriptions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "description": {"type": "string"}
+                },
+                "required": ["id", "description"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["descriptions"],
+    "additionalProperties": False
+}
+
+_nodes_adapter = TypeAdapter(List[SubgoalNode])
+
+_CODE_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+
+
+def graph_response_format(name: str = "goal_graph", descriptions: bool = True) -> Dict[str, Any]:
+    """
+    Build the response_format argument for schema-constrained graph output.
+
+    Args:
+        name (str): The schema name reported to the provider
+        descriptions (bool): Whether the nodes have descriptions
+
+    Returns:
+        Dict[str, Any]: The response_format value for chat completions
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": GRAPH_RESPONSE_SCHEMA if descriptions else GRAPH_LABELS_RESPONSE_SCHEMA
+        }
+    }
+
+
+def descriptions_response_format() -> Dict[str, Any]:
+    """Build the response_format argument for a batch of node descriptions."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "node_descriptions",
+            "strict": True,
+            "schema": DESCRIPTIONS_RESPONSE_SCHEMA
+        }
+    }
+
+
+def repair_json_text(content: str) -> str:
+    """
+    Turn near-JSON from an LLM into parseable JSON.
+
+    Removes markdown code fences and any prose around the outermost object,
+    and drops trailing commas before closing brackets.
+
+    Args:
+        content (str): The raw response text
+
+    Returns:
+        str: The repaired text
+    """
+    fenced = _CODE_FENCE_PATTERN.search(content)
+    if fenced:
+        content = fenced.group(1)
+
+    start = content.find("{")
+    end = content.rfind("}")
+    if start != -1 and end > start:
+        content = content[start:end + 1]
+
+    return _TRAILING_COMMA_PATTERN.sub(r"\1", content)
+
+
+def _normalize_ids(nodes: List[Any]) -> List[Any]:
+    """Convert numeric IDs to strings, which LLMs sometimes return."""
+    for node in nodes:
+        if not isinstance(node, dict):
+            continue
+        if isinstance(node.get("id"), int):
+            node["id"] = str(node["id"])
+        if isinstance(node.get("parent_id"), int):
+            node["parent_id"] = str(node["parent_id"])
+    return nodes
+
+
+def validate_graph_nodes(nodes: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Validate a list of raw nodes in bulk.
+
+    Args:
+        nodes (List[Any]): The raw nodes
+
+    Returns:
+        List[Dict[str, Any]]: The validated nodes as plain dictionaries
+
+    Raises:
+        ValueError: If a node does not match the SubgoalNode model
+    """
+    try:
+        return _nodes_adapter.dump_python(_nodes_adapter.validate_python(_normalize_ids(nodes)))
+    except ValidationError as e:
+        raise ValueError(
+            f"Invalid node structure in LLM response: {e.error_count()} errors")
+
+
+def parse_graph_nodes(content: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Parse and validate the nodes of a graph response.
+
+    Strict JSON is tried first; near-JSON goes through repair_json_text.
+
+    Args:
+        content (str): The response text, a JSON object with a 'nodes' key
+
+    Returns:
+        List[Dict[str, Any]]: The validated nodes as plain dictionaries
+
+    Raises:
+        ValueError: If the response is empty, not JSON or has invalid nodes
+    """
+    if not content:
+        raise ValueError("Empty response from LLM")
+
+    try:
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        try:
+            data = orjson.loads(repair_json_text(content))
+        except orjson.JSONDecodeError:
+            raise ValueError("Error parsing LLM response: Invalid JSON format")
+
+    if not isinstance(data, dict) or not isinstance(data.get("nodes", []), list):
+        raise ValueError("Error parsing LLM response: Expected an object with a 'nodes' list")
+
+    return validate_graph_nodes(data.get("nodes", []))
+
+
+def parse_descriptions(content: Optional[str]) -> Dict[str, str]:
+    """
+    Parse a batch of node descriptions.
+
+    Args:
+        content (str): The response text, a JSON object with a 'descriptions' key
+
+    Returns:
+        Dict[str, str]: The descriptions by node ID; items without an ID or text are skipped
+
+    Raises:
+        ValueError: If the response is empty or not JSON
+    """
+    if not content:
+        raise ValueError("Empty response from LLM")
+
+    try:
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        try:
+            data = orjson.loads(repair_json_text(content))
+        except orjson.JSONDecodeError:
+            raise ValueError("Error parsing LLM response: Invalid JSON format")
+
+    items = data.get("descriptions") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise ValueError("Error parsing LLM response: Expected an object with a 'descriptions' list")
+
+    return {
+        str(item["id"]): item["description"].strip()
+        for item in items
+        if isinstance(item, dict) and item.get("id") is not None
+        and isinstance(item.get("description"), str) and item["description"].strip()
+    }
+
+
+class StreamingNodeParser:
+    """Collect the complete node objects of a streamed graph response.
+
+    The response is a JSON object with a 'nodes' array. Every node object is
+    parsed as soon as its closing brace arrives, so the stream can be stopped
+    at a node boundary and the nodes received so far still form valid JSON.
+    """
+
+    # Nesting depth of a node object: {"nodes": [{...}]}
+    NODE_DEPTH = 3
+
+    def __init__(self):
+        self.nodes: List[Dict[str, Any]] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._current: List[str] = []
+
+    def feed(self, text: str) -> int:
+        """
+        Add the next part of the response.
+
+        Args:
+            text (str): The streamed text
+
+        Returns:
+            int: The number of complete nodes so far
+        """
+        for char in text:
+            if self._depth >= self.NODE_DEPTH:
+                self._current.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == self.NODE_DEPTH:
+                    self._current = [char]
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == self.NODE_DEPTH - 1 and self._current:
+                    self._add_node("".join(self._current))
+                    self._current = []
+
+        return len(self.nodes)
+
+    def _add_node(self, text: str) -> None:
+        try:
+            node = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            return
+        if isinstance(node, dict):
+            self.nodes.append(node)
+
+
+def close_truncated_graph(nodes: List[Dict[str, Any]]) -> str:
+    """
+    Build the JSON of a graph response that was stopped after the given nodes.
+
+    Nodes whose parent was not received are dropped, so the result is still a
+    connected tree, and the response is marked as truncated.
+
+    Args:
+        nodes (List[Dict[str, Any]]): The complete nodes received, in order
+
+    Returns:
+        str: A graph response with the nodes and "truncated": true
+    """
+    kept_ids = set()
+    kept = []
+    for node in _normalize_ids(nodes):
+        parent_id = node.get("parent_id")
+        if parent_id is None or parent_id in kept_ids:
+            kept.append(node)
+            kept_ids.add(node.get("id"))
+
+    return orjson.dumps({"nodes": kept, "truncated": True}).decode("utf-8")
+
+
+def is_truncated_graph(content: Optional[str]) -> bool:
+    """Tell whether a graph response was built by close_truncated_graph."""
+    if not content:
+        return False
+    try:
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return False
+    return isinstance(data, dict) and data.get("truncated") is True
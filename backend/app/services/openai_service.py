@@ -1,125 +1,176 @@
-import os
-import json
-import openai
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Initialize OpenAI client
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
-
-openai_client = openai.OpenAI(api_key=openai_api_key)
-
-
-def generate_goal_breakdown(goal_text: str) -> List[Dict[str, Any]]:
+from app.core.config import settings
+from app.core.metrics import timed_stage, record_cache_lookup
+from app.utils.graph_scoring import rank_graphs
+from app.utils.shared_cache import create_cache
+from app.services.prompts import (
+    GOAL_BREAKDOWN_SYSTEM_PROMPT,
+    GOAL_BREAKDOWN_USER_TEMPLATE,
+    REGENERATE_USER_TEMPLATE,
+    REGENERATE_APPROACHES,
+    build_messages
+)
+from app.services.llm_json import graph_response_format, parse_graph_nodes
+from app.services.token_budget import enforce_prompt_budget, output_token_budget, record_token_usage
+from app.services.providers import get_openai_client
+from app.services.cassette import recorded_call
+
+# Expected node count of a breakdown (the goal plus up to 15 subgoals)
+MAX_GRAPH_NODES = 16
+
+# Pipeline reported for graphs picked from ranked regenerate candidates
+PIPELINE_RANKED_CANDIDATES = "ranked_candidates"
+
+# Runner-up candidates of multi-candidate regenerates, keyed by cache key (graph ID) and goal text
+# (shared by all worker processes when SHARED_CACHE_PATH is set)
+alternate_breakdowns = create_cache(
+    "alternate_breakdowns", settings.ALTERNATES_TTL_SECONDS, shared_path=settings.SHARED_CACHE_PATH)
+
+
+def is_reasoning_model(model: str) -> bool:
+    """Tell whether an OpenAI model is an o-series model, which counts reasoning as output."""
+    return model.startswith(("o1", "o3", "o4"))
+
+
+def _breakdown_request(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    n: int = 1,
+) -> Dict[str, Any]:
+    """Build the chat completion arguments of a breakdown; o-series models take no temperature."""
+    request = {
+        "model": model,
+        "messages": messages,
+        "response_format": graph_response_format(),
+        "extra_body": {"max_completion_tokens": output_token_budget(
+            MAX_GRAPH_NODES, reasoning=is_reasoning_model(model))},
+    }
+    if not is_reasoning_model(model):
+        request["temperature"] = temperature
+    if n > 1:
+        request["n"] = n
+    return request
+
+
+@timed_stage("generate_goal_breakdown", provider="openai")
+def generate_goal_breakdown(goal_text: str, model: str = "o3-mini") -> List[Dict[str, Any]]:
     """Generate a breakdown of subgoals for the given goal using OpenAI's API.
 
     Args:
         goal_text (str): The main goal to break down
+        model (str): The OpenAI model, e.g. a faster non-reasoning model for simple goals
 
     Returns:
         List[Dict[str, Any]]: A list of subgoal nodes
     """
-    # Create prompt for the LLM
-    prompt = f"""
-    Given the following goal: "{goal_text}"
-    
-    Break down this goal into a tree of 5-15 subgoals and steps.
-    
-    Format the response as a JSON object with a 'nodes' key containing an array where each node has the following properties:
-    - id: A unique string identifier
-    - label: A short, descriptive label for the subgoal
-    - parent_id: The ID of the parent node (null for the root node)
-    - description: A detailed description of what this subgoal involves
-    
-    Ensure the tree structure is logical with clear parent-child relationships.
-    """
+    # Static instructions first, so the shared prefix can be cached by the provider
+    messages = build_messages(
+        GOAL_BREAKDOWN_SYSTEM_PROMPT, GOAL_BREAKDOWN_USER_TEMPLATE, goal_text=goal_text)
+    prompt_tokens = enforce_prompt_budget(messages)
 
     # Call the OpenAI API
-    response = openai_client.chat.completions.create(
-        model="o3-mini",
-        messages=[
-            {"role": "system", "content": "You are a goal planning assistant that helps break down goals into achievable subgoals and steps."},
-            {"role": "user", "content": prompt}
-        ],
-        response_format={"type": "json_object"},
-        temperature=0.7,
-    )
-
-    # Parse the response
-    try:
-        content = response.choices[0].message.content
-        if content is None:
-            raise ValueError("Empty response from LLM")
-        data = json.loads(content)
-        nodes = data.get("nodes", [])
+    request = _breakdown_request(model, messages, temperature=0.7)
+    response = recorded_call(
+        "openai", request, lambda: get_openai_client().chat.completions.create(**request))
+    record_token_usage("generate_goal_breakdown", response, prompt_tokens)
 
-        # Validate the response structure
-        for node in nodes:
-            if not all(key in node for key in ["id", "label"]):
-                raise ValueError("Invalid node structure in LLM response")
+    # Parse and validate the response
+    return parse_graph_nodes(response.choices[0].message.content)
 
-        return nodes
-    except json.JSONDecodeError:
-        raise ValueError("Error parsing LLM response: Invalid JSON format")
-    except Exception as e:
-        raise ValueError(f"Error processing LLM response: {str(e)}")
 
+def _candidate_contents(goal_text: str, model: str, candidates: int) -> List[str]:
+    """Request the candidate breakdowns of a regenerate and return their raw contents.
 
-def regenerate_goal_breakdown(goal_text: str) -> List[Dict[str, Any]]:
-    """Regenerate a breakdown of subgoals for the given goal using OpenAI's API with higher temperature.
+    Models that take a temperature sample all candidates in one call. o-series
+    models do not, so each candidate gets its own call with a different
+    planning approach in the prompt; the calls run in parallel.
+    """
+    if candidates == 1 or not is_reasoning_model(model):
+        # Static instructions first, so the shared prefix can be cached by the provider
+        messages = build_messages(
+            GOAL_BREAKDOWN_SYSTEM_PROMPT, GOAL_BREAKDOWN_USER_TEMPLATE, goal_text=goal_text)
+        prompt_tokens = enforce_prompt_budget(messages)
+        # Higher temperature for more variation
+        request = _breakdown_request(model, messages, temperature=0.9, n=candidates)
+        response = recorded_call(
+            "openai", request, lambda: get_openai_client().chat.completions.create(**request))
+        record_token_usage("regenerate_goal_breakdown", response, prompt_tokens)
+        return [choice.message.content for choice in response.choices]
+
+    def request_candidate(approach: str) -> str:
+        messages = build_messages(
+            GOAL_BREAKDOWN_SYSTEM_PROMPT, REGENERATE_USER_TEMPLATE, goal_text=goal_text, approach=approach)
+        prompt_tokens = enforce_prompt_budget(messages)
+        request = _breakdown_request(model, messages, temperature=0.9)
+        response = recorded_call(
+            "openai", request, lambda: get_openai_client().chat.completions.create(**request))
+        record_token_usage("regenerate_goal_breakdown", response, prompt_tokens)
+        return response.choices[0].message.content
+
+    approaches = [REGENERATE_APPROACHES[i % len(REGENERATE_APPROACHES)] for i in range(candidates)]
+    with ThreadPoolExecutor(max_workers=candidates) as executor:
+        # Each call runs in a copy of this context, so a cancelled request stops them all
+        futures = [executor.submit(contextvars.copy_context().run, request_candidate, approach)
+                   for approach in approaches]
+        return [future.result() for future in futures]
+
+
+@timed_stage("regenerate_goal_breakdown", provider="openai")
+def regenerate_goal_breakdown(
+    goal_text: str,
+    candidates: Optional[int] = None,
+    cache_key: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Regenerate a breakdown of subgoals for the given goal with more variation than the first one.
+
+    With more than one candidate, the candidates are requested together (see
+    _candidate_contents), ranked locally by their structure (see score_graph)
+    and the best one is returned. With a cache key, the other valid
+    candidates are cached and served by the next regenerate with the same key
+    and goal without calling the LLM.
 
     Args:
         goal_text (str): The main goal to break down
+        candidates (int, optional): Number of candidates. Defaults to settings.REGENERATE_CANDIDATES.
+        cache_key (str, optional): Scope of the cached alternates, e.g. the graph ID. Without it nothing is cached.
 
     Returns:
         List[Dict[str, Any]]: A list of subgoal nodes
     """
-    # Create prompt for the LLM
-    prompt = f"""
-    Given the following goal: "{goal_text}"
-    
-    Break down this goal into a tree of 5-15 subgoals and steps.
-    
-    Format the response as a JSON object with a 'nodes' key containing an array where each node has the following properties:
-    - id: A unique string identifier
-    - label: A short, descriptive label for the subgoal
-    - parent_id: The ID of the parent node (null for the root node)
-    - description: A detailed description of what this subgoal involves
-    
-    Ensure the tree structure is logical with clear parent-child relationships.
-    """
+    candidates = candidates or settings.REGENERATE_CANDIDATES
+
+    alternates_key = (cache_key, goal_text) if cache_key else None
+
+    # Serve a cached alternate from an earlier multi-candidate call first
+    if candidates > 1 and alternates_key:
+        alternates = alternate_breakdowns.pop(alternates_key)
+        record_cache_lookup("alternate_breakdowns", bool(alternates))
+        if alternates:
+            if len(alternates) > 1:
+                alternate_breakdowns.set(alternates_key, alternates[1:])
+            return alternates[0]
 
-    # Call the OpenAI API with higher temperature for more variation
-    response = openai_client.chat.completions.create(
-        model="o3-mini",
-        messages=[
-            {"role": "system", "content": "You are a goal planning assistant that helps break down goals into achievable subgoals and steps."},
-            {"role": "user", "content": prompt}
-        ],
-        response_format={"type": "json_object"},
-        temperature=0.9,  # Higher temperature for more variation
-    )
+    contents = _candidate_contents(goal_text, settings.REGENERATE_MODEL, candidates)
 
     # Parse the response
-    try:
-        content = response.choices[0].message.content
-        if content is None:
-            raise ValueError("Empty response from LLM")
-        data = json.loads(content)
-        nodes = data.get("nodes", [])
-
-        # Validate the response structure
-        for node in nodes:
-            if not all(key in node for key in ["id", "label"]):
-                raise ValueError("Invalid node structure in LLM response")
-
-        return nodes
-    except json.JSONDecodeError:
-        raise ValueError("Error parsing LLM response: Invalid JSON format")
-    except Exception as e:
-        raise ValueError(f"Error processing LLM response: {str(e)}")
+    if candidates == 1:
+        return parse_graph_nodes(contents[0])
+
+    parsed = []
+    for content in contents:
+        try:
+            parsed.append(parse_graph_nodes(content))
+        except ValueError as e:
+            print(f"Skipping invalid regenerate candidate: {str(e)}")
+
+    ranked = rank_graphs(parsed)
+    if not ranked:
+        raise ValueError("No valid graph among the LLM candidates")
+
+    if len(ranked) > 1 and alternates_key:
+        alternate_breakdowns.set(alternates_key, ranked[1:])
+
+    return ranked[0]
@@ -0,0 +1,189 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Any, Callable, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import record_cache_lookup
+from app.db import add_goal_graph_variant, pop_goal_graph_variant
+from app.services.goal_analysis_service import process_goal_with_pipeline
+
+# Background LLM work (variant prefetches, node descriptions) runs on its own
+# small pool, so it never competes with request handling for the default
+# threadpool. It is created on first use.
+_executor: Optional[ThreadPoolExecutor] = None
+# Background tasks that were submitted and have not finished yet
+_pending: Set[Future] = set()
+
+_lock = threading.Lock()
+# Start times of prefetch runs within the last hour, used for the budget
+_recent_runs: deque = deque()
+_stats = {
+    "scheduled": 0,
+    "generated": 0,
+    "failed": 0,
+    "skipped_budget": 0,
+    "cancelled": 0,
+    "hits": 0,
+    "misses": 0,
+}
+
+
+def _increment(stat: str) -> None:
+    with _lock:
+        _stats[stat] += 1
+
+
+def _prune_budget_window(now: float) -> None:
+    """Forget runs older than an hour. Must be called with the lock held."""
+    while _recent_runs and now - _recent_runs[0] > 3600:
+        _recent_runs.popleft()
+
+
+def _reserve_budget() -> bool:
+    """Reserve one prefetch run from the hourly budget."""
+    now = time.monotonic()
+    with _lock:
+        _prune_budget_window(now)
+        if len(_recent_runs) >= settings.PREFETCH_MAX_RUNS_PER_HOUR:
+            return False
+        _recent_runs.append(now)
+        return True
+
+
+def _generate_variant(graph_id: str, goal_text: str) -> None:
+    """Generate one alternative breakdown and store it as a pending variant."""
+    try:
+        nodes, pipeline = process_goal_with_pipeline(goal_text)
+        if add_goal_graph_variant(graph_id, goal_text, nodes, pipeline):
+            _increment("generated")
+        else:
+            _increment("failed")
+    except Exception as e:
+        _increment("failed")
+        print(f"Error prefetching goal graph variant: {str(e)}")
+
+
+def submit_background_task(func: Callable, *args: Any) -> Future:
+    """
+    Run a function on the background LLM pool.
+
+    Args:
+        func (Callable): The function to run
+        *args (Any): Arguments passed to the function
+
+    Returns:
+        Future: The future of the task
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PREFETCH_MAX_WORKERS, thread_name_prefix="variant-prefetch")
+        future = _executor.submit(func, *args)
+        _pending.add(future)
+    future.add_done_callback(_pending.discard)
+    return future
+
+
+def schedule_variant_prefetch(graph_id: str, goal_text: str, count: Optional[int] = None) -> int:
+    """
+    Schedule background generation of alternative breakdowns for a saved graph.
+
+    Nothing is scheduled when prefetching is disabled or the hourly budget
+    (settings.PREFETCH_MAX_RUNS_PER_HOUR) is used up.
+
+    Args:
+        graph_id (str): The ID of the saved goal graph
+        goal_text (str): The goal to generate alternatives for
+        count (int, optional): Number of variants. Defaults to settings.PREFETCH_VARIANTS_PER_GRAPH.
+
+    Returns:
+        int: The number of variants scheduled
+    """
+    if not settings.PREFETCH_VARIANTS_ENABLED or not graph_id:
+        return 0
+
+    count = settings.PREFETCH_VARIANTS_PER_GRAPH if count is None else count
+    scheduled = 0
+    for _ in range(count):
+        if not _reserve_budget():
+            _increment("skipped_budget")
+            continue
+        submit_background_task(_generate_variant, graph_id, goal_text)
+        _increment("scheduled")
+        scheduled += 1
+
+    return scheduled
+
+
+def take_prefetched_variant(graph_id: str, goal_text: str) -> Optional[Dict[str, Any]]:
+    """
+    Take a ready variant of a graph, if one was prefetched for its current goal.
+
+    Args:
+        graph_id (str): The ID of the goal graph
+        goal_text (str): The current goal text; variants for an older goal text are discarded
+
+    Returns:
+        Optional[Dict[str, Any]]: The variant with its nodes and pipeline, or None on a miss
+    """
+    if not settings.PREFETCH_VARIANTS_ENABLED:
+        return None
+
+    variant = pop_goal_graph_variant(graph_id)
+    while variant is not None and variant.get("goal") != goal_text:
+        variant = pop_goal_graph_variant(graph_id)
+
+    _increment("hits" if variant is not None else "misses")
+    record_cache_lookup("prefetched_variants", variant is not None)
+    return variant
+
+
+def shutdown_prefetch(timeout: float) -> bool:
+    """
+    Stop the background pool, letting running tasks store their results.
+
+    Tasks that have not started yet are dropped, since they would only add
+    LLM cost during shutdown.
+
+    Args:
+        timeout (float): The maximum time to wait for running tasks, in seconds
+
+    Returns:
+        bool: True if all running tasks finished in time
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        pending = list(_pending)
+    if executor is None:
+        return True
+
+    for future in pending:
+        if future.cancel():
+            _increment("cancelled")
+
+    _, not_done = wait(pending, timeout=timeout)
+    executor.shutdown(wait=False)
+    return not not_done
+
+
+def get_prefetch_stats() -> Dict[str, Any]:
+    """
+    Return the prefetch counters and the hit rate of regenerate requests.
+
+    Returns:
+        Dict[str, Any]: The counters, hit rate and the remaining hourly budget
+    """
+    with _lock:
+        _prune_budget_window(time.monotonic())
+        stats = dict(_stats)
+        budget_used = len(_recent_runs)
+
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["budget_remaining"] = max(
+        settings.PREFETCH_MAX_RUNS_PER_HOUR - budget_used, 0)
+    return stats
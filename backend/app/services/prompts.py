@@ -0,0 +1,221 @@
+"""Prompt templates for the LLM calls.
+
+Every prompt starts with its static instructions and ends with the variable
+part (goal, actions, path), so providers can cache the shared prefix across
+requests. Templates are filled with str.format.
+"""
+from typing import List, Dict
+
+# Stage 1 (Gemini): propose actions as a numbered list
+ANALYZE_ACTIONS_TEMPLATE = (
+    "Analyze the goal given at the end and suggest 5-10 specific, concrete actions that would help achieve this goal.\n"
+    "Each action should be clear, actionable, and directly related to the goal.\n"
+    "\n"
+    "Your response must clearly depict which actions follow which, to enable presentation as a tree graph.\n"
+    "Indicate parent-child relationships between actions where appropriate.\n"
+    "\n"
+    "The actions must be named in the same language as the original goal query.\n"
+    "\n"
+    "Please format your response as a numbered list of actions, one per line.\n"
+    "\n"
+    "Goal: \"{goal_text}\"\n"
+)
+
+# Stage 1 (Gemini), outline mode: propose actions as a hierarchical outline
+ANALYZE_OUTLINE_TEMPLATE = (
+    "Analyze the goal given at the end and suggest 5-15 specific, concrete actions that would help achieve this goal.\n"
+    "Each action should be clear, actionable, and directly related to the goal.\n"
+    "\n"
+    "The actions must be named in the same language as the original goal query.\n"
+    "\n"
+    "Format your response as an outline with hierarchical numbering, one action per line:\n"
+    "top-level actions are numbered 1., 2., 3., and sub-steps of action 1 are numbered 1.1, 1.2, and so on.\n"
+    "Write every line as \"<number> <short label>: <one sentence description>\".\n"
+    "Do not add any introduction, summary or other text.\n"
+    "\n"
+    "Goal: \"{goal_text}\"\n"
+)
+
+# Stage 2 (o3-mini): structure the actions into a tree
+GRAPH_STRUCTURE_SYSTEM_PROMPT = """You are a graph structure specialist that organizes actions into logical hierarchical trees.
+
+You will be given a goal and proposed actions to achieve it.
+Create a hierarchical tree graph structure representing how these actions relate to each other.
+Some actions may be prerequisites for others, some may be alternatives, and some may be subtasks.
+
+Format the response as a JSON object with a 'nodes' key containing an array where each node has the following properties:
+- id: A unique string identifier (can be a simple number like "1", "2", etc.)
+- label: A short, descriptive label for the action or subgoal
+- parent_id: The ID of the parent node (null for the root node, which should be the main goal)
+- description: A detailed description of what this action involves
+
+The first node should be the main goal with id "0" and parent_id null.
+The subsequent nodes should represent the actions and any additional steps you think would help organize them logically.
+
+Ensure the tree structure is logical with clear parent-child relationships that make sense for achieving the goal.
+
+Here's an example of the exact JSON format I need:
+
+{
+  "nodes": [
+    {
+      "id": "0",
+      "label": "Learn Spanish in 6 months",
+      "parent_id": null,
+      "description": "Master conversational Spanish language skills within a 6-month timeframe"
+    },
+    {
+      "id": "1",
+      "label": "Establish learning resources",
+      "parent_id": "0",
+      "description": "Gather necessary learning materials including textbooks, apps, and online courses"
+    },
+    {
+      "id": "2",
+      "label": "Create study schedule",
+      "parent_id": "0",
+      "description": "Develop a consistent daily and weekly study plan to ensure regular practice"
+    },
+    {
+      "id": "3",
+      "label": "Find language exchange partner",
+      "parent_id": "0",
+      "description": "Connect with native speakers for conversation practice and cultural insights"
+    }
+  ]
+}"""
+
+# Stage 2 (o3-mini), labels first: the same tree without descriptions, which are written later
+GRAPH_STRUCTURE_LABELS_SYSTEM_PROMPT = """You are a graph structure specialist that organizes actions into logical hierarchical trees.
+
+You will be given a goal and proposed actions to achieve it.
+Create a hierarchical tree graph structure representing how these actions relate to each other.
+Some actions may be prerequisites for others, some may be alternatives, and some may be subtasks.
+
+Format the response as a JSON object with a 'nodes' key containing an array where each node has the following properties:
+- id: A unique string identifier (can be a simple number like "1", "2", etc.)
+- label: A short, descriptive label for the action or subgoal
+- parent_id: The ID of the parent node (null for the root node, which should be the main goal)
+
+Do not add descriptions; keep the labels short and self-explanatory.
+
+The first node should be the main goal with id "0" and parent_id null.
+The subsequent nodes should represent the actions and any additional steps you think would help organize them logically.
+
+Ensure the tree structure is logical with clear parent-child relationships that make sense for achieving the goal.
+
+Here's an example of the exact JSON format I need:
+
+{
+  "nodes": [
+    {"id": "0", "label": "Learn Spanish in 6 months", "parent_id": null},
+    {"id": "1", "label": "Establish learning resources", "parent_id": "0"},
+    {"id": "2", "label": "Create study schedule", "parent_id": "0"},
+    {"id": "3", "label": "Find language exchange partner", "parent_id": "0"}
+  ]
+}"""
+
+GRAPH_STRUCTURE_USER_TEMPLATE = (
+    "Goal: \"{goal_text}\"\n"
+    "\n"
+    "Proposed actions:\n"
+    "{actions_text}\n"
+)
+
+# Batched descriptions of the nodes of a labels-first graph
+DESCRIPTIONS_SYSTEM_PROMPT = """You write short descriptions for the steps of a goal plan.
+
+You will be given a goal and steps of its plan, one per line as "<id>: <path of labels leading to the step>".
+For each step, write one or two sentences describing what it involves.
+The descriptions must be written in the same language as the steps.
+
+Format the response as a JSON object with a 'descriptions' key containing an array where each item has the following properties:
+- id: The ID of the step
+- description: The description of the step"""
+
+DESCRIPTIONS_USER_TEMPLATE = (
+    "Goal: \"{goal_text}\"\n"
+    "\n"
+    "Steps:\n"
+    "{steps_text}\n"
+)
+
+# Single-call breakdown (generate/regenerate_goal_breakdown)
+GOAL_BREAKDOWN_SYSTEM_PROMPT = """You are a goal planning assistant that helps break down goals into achievable subgoals and steps.
+
+Break down the goal you are given into a tree of 5-15 subgoals and steps.
+
+Format the response as a JSON object with a 'nodes' key containing an array where each node has the following properties:
+- id: A unique string identifier
+- label: A short, descriptive label for the subgoal
+- parent_id: The ID of the parent node (null for the root node)
+- description: A detailed description of what this subgoal involves
+
+Ensure the tree structure is logical with clear parent-child relationships."""
+
+GOAL_BREAKDOWN_USER_TEMPLATE = "Goal: \"{goal_text}\"\n"
+
+# Regenerated breakdowns: the goal and a planning approach, different for every candidate
+REGENERATE_USER_TEMPLATE = (
+    "Goal: \"{goal_text}\"\n"
+    "\n"
+    "Approach: {approach}\n"
+)
+
+REGENERATE_APPROACHES = [
+    "Organize the plan in phases, in the order they happen.",
+    "Organize the plan by the areas or skills the goal needs.",
+    "Start from the finished goal and work backwards to the first steps.",
+    "Start with small habits and quick wins, then build up to the larger steps.",
+    "Organize the plan around the main obstacles and how to overcome them.",
+]
+
+# Subtree regeneration of a single node
+SUBTREE_SYSTEM_PROMPT = """You are a graph structure specialist that organizes actions into logical hierarchical trees.
+
+You will be given a main goal, the path from the main goal to one step of its plan, and that step.
+Break down this step into 2-6 specific, concrete sub-steps. Sub-steps may have their own sub-steps.
+The sub-steps must be named in the same language as the step.
+
+Format the response as a JSON object with a 'nodes' key containing an array where each node has the following properties:
+- id: A unique string identifier such as "n1", "n2", etc.
+- label: A short, descriptive label for the sub-step
+- parent_id: The ID of the parent sub-step, or null for direct sub-steps of the step being broken down
+- description: A detailed description of what this sub-step involves
+
+Do not include the step being broken down or any of its ancestors in the response.
+If the step already has sub-steps, propose only additional sub-steps that do not duplicate them."""
+
+SUBTREE_USER_TEMPLATE = (
+    "Main goal: \"{goal_text}\"\n"
+    "\n"
+    "Path from the main goal to the step to break down:\n"
+    "{path_text}\n"
+    "\n"
+    "Step to break down: \"{label}\"\n"
+    "Step description: \"{description}\"\n"
+    "{existing_text}"
+)
+
+SUBTREE_EXISTING_TEMPLATE = (
+    "\n"
+    "This step already has the following sub-steps, which will be kept:\n"
+    "{existing_labels}\n"
+)
+
+
+def build_messages(system_prompt: str, user_template: str, **values: str) -> List[Dict[str, str]]:
+    """Build chat messages with the static system prompt first and the filled-in user prompt last.
+
+    Args:
+        system_prompt (str): The static system prompt
+        user_template (str): The user prompt template
+        **values (str): Values for the template placeholders
+
+    Returns:
+        List[Dict[str, str]]: The chat messages
+    """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_template.format(**values)}
+    ]
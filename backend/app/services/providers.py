@@ -0,0 +1,158 @@
+"""Registry of LLM provider clients and model handles, created lazily on first use.
+
+Provider SDKs are only imported when a client is first requested, so the
+application starts quickly and does not fail when the key of an unused
+provider is missing. Every provider gets one client with its own keep-alive
+HTTP connection pool, sized by the LLM_HTTP_* settings, and every Gemini
+model gets one configured handle that is reused across requests.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from dotenv import load_dotenv
+
+from app.core.config import settings
+
+# Load environment variables
+load_dotenv()
+
+_clients: Dict[str, Any] = {}
+# Reentrant, because a factory may request another registered client (a Gemini
+# model handle needs the configured genai module)
+_lock = threading.RLock()
+
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    """Return the client registered under name, creating it on first use."""
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def _require_env(name: str) -> str:
+    """Return an environment variable or raise if it is not set."""
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"{name} environment variable is not set")
+    return value
+
+
+def _create_http_client() -> Any:
+    """Create an HTTP client with a keep-alive pool tuned by the LLM_HTTP_* settings."""
+    import httpx
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        timeout=httpx.Timeout(
+            settings.LLM_HTTP_READ_TIMEOUT_SECONDS,
+            connect=settings.LLM_HTTP_CONNECT_TIMEOUT_SECONDS
+        )
+    )
+
+
+def get_openai_client() -> Any:
+    """Return the shared OpenAI client."""
+    def create():
+        import openai
+        return openai.OpenAI(
+            api_key=_require_env("OPENAI_API_KEY"),
+            base_url=settings.OPENAI_BASE_URL or None,
+            http_client=_create_http_client(),
+            max_retries=settings.LLM_HTTP_MAX_RETRIES
+        )
+
+    return _get_or_create("openai", create)
+
+
+def get_anthropic_client() -> Any:
+    """Return the shared Anthropic client."""
+    def create():
+        import anthropic
+        return anthropic.Anthropic(
+            api_key=_require_env("ANTHROPIC_API_KEY"),
+            http_client=_create_http_client(),
+            max_retries=settings.LLM_HTTP_MAX_RETRIES
+        )
+
+    return _get_or_create("anthropic", create)
+
+
+def get_gemini() -> Any:
+    """Return the google.generativeai module, configured with the API key."""
+    def create():
+        import google.generativeai as genai
+        options = {}
+        if settings.GOOGLE_GEMINI_API_ENDPOINT:
+            options = {"transport": "rest",
+                       "client_options": {"api_endpoint": settings.GOOGLE_GEMINI_API_ENDPOINT}}
+        genai.configure(api_key=_require_env("GOOGLE_GEMINI_API_KEY"), **options)
+        return genai
+
+    return _get_or_create("gemini", create)
+
+
+def get_gemini_model(model_name: str = "gemini-2.0-flash") -> Any:
+    """
+    Return the shared handle of a Gemini model.
+
+    The handle carries the safety settings; the generation config (temperature,
+    output budget) is passed per call to generate_content.
+
+    Args:
+        model_name (str): The Gemini model name
+
+    Returns:
+        Any: The configured google.generativeai.GenerativeModel
+    """
+    def create():
+        genai = get_gemini()
+        from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
+        # Configure safety settings
+        safety_settings = {
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+        }
+        return genai.GenerativeModel(model_name=model_name, safety_settings=safety_settings)
+
+    return _get_or_create(f"gemini:{model_name}", create)
+
+
+def warm_up_providers() -> None:
+    """Create the clients of the providers used by the pipeline ahead of the first request.
+
+    Providers whose key or SDK is missing are skipped, so an unused provider
+    never prevents startup. Anthropic is not used by the pipeline and is not
+    warmed up.
+    """
+    for factory in (get_openai_client, get_gemini_model):
+        try:
+            factory()
+        except (ValueError, ImportError) as e:
+            print(f"Warning: skipping provider warm-up: {str(e)}")
+
+
+def close_providers() -> None:
+    """Close the HTTP connection pools of all clients and forget every handle."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                print(f"Warning: error closing provider client: {str(e)}")
@@ -0,0 +1,91 @@
+import threading
+from typing import List, Dict, Any, Optional
+
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.db import get_user_goal_graphs, get_goal_graph_terms
+from app.utils.ttl_cache import TTLCache
+from app.utils.search_index import BM25Index, query_terms
+
+
+class _UserIndex:
+    """The search index of one user's goal graphs."""
+
+    def __init__(self):
+        self.index = BM25Index()
+        # The updated_at of each graph when it was indexed
+        self.versions: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+
+
+# Search indexes of recently active users, kept by each worker. Each is brought
+# up to date from the user's history summaries before a search, so changes made
+# by other workers are picked up. The terms of a graph are stored in its summary
+# on every write, so only the terms of changed graphs are read, in one batch.
+_user_indexes = TTLCache(
+    ttl_seconds=settings.SEARCH_INDEX_TTL_SECONDS,
+    max_size=settings.SEARCH_INDEX_MAX_USERS)
+_user_indexes_lock = threading.Lock()
+
+
+def _get_user_index(user_id: str) -> _UserIndex:
+    with _user_indexes_lock:
+        user_index = _user_indexes.get(user_id)
+        if user_index is None:
+            user_index = _UserIndex()
+            _user_indexes.set(user_id, user_index)
+        return user_index
+
+
+def _sync_user_index(user_id: str, user_index: _UserIndex, summaries: List[Dict[str, Any]]) -> None:
+    """Index new and changed graphs and drop deleted ones, comparing updated_at."""
+    current = {summary["id"]: summary.get("updated_at") for summary in summaries}
+
+    for graph_id in list(user_index.versions):
+        if graph_id not in current:
+            user_index.index.remove(graph_id)
+            del user_index.versions[graph_id]
+
+    changed = [graph_id for graph_id, updated_at in current.items()
+               if graph_id not in user_index.versions or user_index.versions[graph_id] != updated_at]
+    if not changed:
+        return
+
+    # A summary deleted since it was listed has no terms
+    for graph_id, terms in get_goal_graph_terms(user_id, changed).items():
+        user_index.index.add(graph_id, terms)
+        user_index.versions[graph_id] = current[graph_id]
+
+
+@timed_stage("search_user_goals")
+def search_user_goals(user_id: str, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Search a user's goal graphs by their goal, node labels and descriptions.
+
+    The user's summaries are read, the graphs that changed since the last
+    search are indexed again from the terms stored in their summaries, and
+    the matches are ranked by BM25. The call blocks on Firestore; run it in
+    the threadpool from async code.
+
+    Args:
+        user_id (str): The ID of the user
+        query (str): The search text, Polish or English
+        limit (int, optional): Maximum number of results, settings.SEARCH_MAX_RESULTS by default
+
+    Returns:
+        List[Dict[str, Any]]: The summaries of the matching graphs with their score, best first
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    summaries = get_user_goal_graphs(user_id)
+    by_id = {summary["id"]: summary for summary in summaries}
+
+    user_index = _get_user_index(user_id)
+    with user_index.lock:
+        _sync_user_index(user_id, user_index, summaries)
+        ranked = user_index.index.search(terms, limit or settings.SEARCH_MAX_RESULTS)
+
+    return [dict(by_id[graph_id], score=round(score, 4))
+            for graph_id, score in ranked if graph_id in by_id]
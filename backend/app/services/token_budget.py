@@ -0,0 +1,189 @@
+import re
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Union
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# tiktoken is optional; without it a word-piece estimate is used. The encoding
+# is loaded on first use, since loading it may download it.
+_NOT_LOADED = object()
+_encoding: Any = _NOT_LOADED
+_encoding_lock = threading.Lock()
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# Chat formatting overhead per message
+_TOKENS_PER_MESSAGE = 4
+
+_lock = threading.Lock()
+_usage_totals: Dict[str, Dict[str, int]] = {}
+
+
+def _get_encoding() -> Any:
+    """Return the tiktoken encoding, loading it on the first call; None without tiktoken."""
+    global _encoding
+
+    if _encoding is _NOT_LOADED:
+        with _encoding_lock:
+            if _encoding is _NOT_LOADED:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text locally.
+
+    Uses tiktoken when it is installed, otherwise estimates roughly one token
+    per four characters of every word plus one per punctuation mark.
+
+    Args:
+        text (str): The text to count
+
+    Returns:
+        int: The number of tokens
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum((len(piece) + 3) // 4 for piece in _WORD_PATTERN.findall(text))
+
+
+def count_prompt_tokens(prompt: Union[str, List[Dict[str, str]]]) -> int:
+    """
+    Count the tokens of a plain prompt or a list of chat messages.
+
+    Args:
+        prompt (Union[str, List[Dict[str, str]]]): The prompt
+
+    Returns:
+        int: The number of tokens
+    """
+    if isinstance(prompt, str):
+        return count_tokens(prompt)
+    return sum(count_tokens(message.get("content", "")) + _TOKENS_PER_MESSAGE for message in prompt)
+
+
+def enforce_prompt_budget(prompt: Union[str, List[Dict[str, str]]], budget: Optional[int] = None) -> int:
+    """
+    Check that a prompt fits into the input token budget before it is sent.
+
+    Args:
+        prompt (Union[str, List[Dict[str, str]]]): The prompt
+        budget (int, optional): The budget. Defaults to settings.MAX_PROMPT_TOKENS.
+
+    Returns:
+        int: The number of prompt tokens
+
+    Raises:
+        ValueError: If the prompt is over budget
+    """
+    budget = budget or settings.MAX_PROMPT_TOKENS
+    prompt_tokens = count_prompt_tokens(prompt)
+    if prompt_tokens > budget:
+        raise ValueError(
+            f"Prompt is too long: {prompt_tokens} tokens, budget is {budget}")
+    return prompt_tokens
+
+
+def output_token_budget(
+    expected_nodes: int,
+    reasoning: bool = False,
+    tokens_per_node: Optional[int] = None,
+) -> int:
+    """
+    Compute the output token budget for a response with the expected number of nodes.
+
+    Args:
+        expected_nodes (int): The number of nodes the response should contain
+        reasoning (bool): Add the allowance for reasoning tokens, which o-series models count as
+            output; it also grows with the expected node count
+        tokens_per_node (int, optional): Share per node. Defaults to settings.OUTPUT_TOKENS_PER_NODE.
+
+    Returns:
+        int: The maximum number of output tokens
+    """
+    if tokens_per_node is None:
+        tokens_per_node = settings.OUTPUT_TOKENS_PER_NODE
+    budget = settings.OUTPUT_TOKENS_BASE + expected_nodes * tokens_per_node
+    if reasoning:
+        budget += settings.REASONING_TOKENS_ALLOWANCE + expected_nodes * settings.REASONING_TOKENS_PER_NODE
+    return budget
+
+
+def record_token_usage(call_name: str, response: Any, prompt_estimate: Optional[int] = None) -> Dict[str, int]:
+    """
+    Record the token usage reported by an OpenAI or Gemini response.
+
+    Args:
+        call_name (str): The name of the LLM call, e.g. "create_graph_from_actions"
+        response (Any): The provider response
+        prompt_estimate (int, optional): The local prompt token count, used if the provider reports none
+
+    Returns:
+        Dict[str, int]: The prompt, completion and cached prompt tokens of this call
+    """
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) if details else 0
+    else:
+        # Gemini reports usage as usage_metadata
+        metadata = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(metadata, "prompt_token_count", None)
+        completion_tokens = getattr(metadata, "candidates_token_count", None)
+        cached_tokens = getattr(metadata, "cached_content_token_count", 0)
+
+    call_usage = {
+        "prompt_tokens": prompt_tokens if isinstance(prompt_tokens, int) else (prompt_estimate or 0),
+        "completion_tokens": completion_tokens if isinstance(completion_tokens, int) else 0,
+        "cached_prompt_tokens": cached_tokens if isinstance(cached_tokens, int) else 0,
+    }
+
+    with _lock:
+        totals = _usage_totals.setdefault(
+            call_name, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0})
+        totals["calls"] += 1
+        for key, value in call_usage.items():
+            totals[key] += value
+
+    logger.debug("%s used %d prompt tokens (%d cached) and %d completion tokens", call_name,
+                 call_usage["prompt_tokens"], call_usage["cached_prompt_tokens"], call_usage["completion_tokens"])
+
+    return call_usage
+
+
+def get_token_usage() -> Dict[str, Dict[str, int]]:
+    """
+    Return the accumulated token usage per LLM call.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Calls, prompt, completion and cached prompt tokens per call name
+    """
+    with _lock:
+        return {call_name: dict(totals) for call_name, totals in _usage_totals.items()}
+
+
+def _collect_token_metrics():
+    """Expose the accumulated token usage as counters on the /metrics endpoint."""
+    usage = get_token_usage()
+    yield ("llm_calls_total", "counter", "LLM calls with recorded token usage.",
+           [({"call": call_name}, totals["calls"]) for call_name, totals in usage.items()])
+    yield ("llm_tokens_total", "counter", "Tokens used by LLM calls by call and kind.",
+           [({"call": call_name, "kind": kind}, totals[kind + "_tokens"])
+            for call_name, totals in usage.items()
+            for kind in ("prompt", "completion", "cached_prompt")])
+
+
+registry.register_collector(_collect_token_metrics)
@@ -0,0 +1,39 @@
+from .graph_utils import (
+    find_node,
+    get_ancestor_path,
+    get_descendant_ids,
+    get_node_depths,
+    splice_subtree,
+    validate_tree
+)
+from .graph_scoring import score_graph, rank_graphs
+from .outline_parser import parse_outline, outline_to_actions
+from .goal_complexity import classify_goal, detect_language, TIER_SIMPLE, TIER_COMPLEX
+from .ttl_cache import TTLCache
+from .shared_cache import SQLiteCache, create_cache
+from .search_index import BM25Index
+from .graph_diff import diff_nodes, apply_delta, delta_stats
+
+__all__ = [
+    "find_node",
+    "get_ancestor_path",
+    "get_descendant_ids",
+    "get_node_depths",
+    "splice_subtree",
+    "validate_tree",
+    "score_graph",
+    "rank_graphs",
+    "parse_outline",
+    "outline_to_actions",
+    "classify_goal",
+    "detect_language",
+    "TIER_SIMPLE",
+    "TIER_COMPLEX",
+    "TTLCache",
+    "SQLiteCache",
+    "create_cache",
+    "BM25Index",
+    "diff_nodes",
+    "apply_delta",
+    "delta_stats"
+]
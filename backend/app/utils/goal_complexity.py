@@ -0,0 +1,107 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+# Pipeline tiers picked by classify_goal
+TIER_SIMPLE = "simple"
+TIER_COMPLEX = "complex"
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+_POLISH_LETTERS = set("ąćęłńóśźż")
+_POLISH_STOPWORDS = {"się", "w", "na", "do", "z", "i", "oraz", "nie", "że", "jak", "dla"}
+
+# Word stems (prefix matches) of goals that need a multi-level plan...
+_COMPLEX_STEMS = {
+    "en": ("launch", "business", "startup", "saas", "company", "career", "degree", "marathon",
+           "build", "develop", "learn", "master", "language", "publish", "organiz",
+           "organis", "migrat", "renovat", "invest", "certif", "product", "market", "novel"),
+    "pl": ("założ", "uruchom", "biznes", "firm", "startup", "karier", "studi", "maraton",
+           "zbudow", "stworz", "nauczy", "naucz", "język", "opublik", "książk", "zorganiz",
+           "remont", "inwest", "certyfik", "produkt", "sprzeda"),
+}
+# ...and of everyday habits and chores that a single breakdown covers
+_SIMPLE_STEMS = {
+    "en": ("drink", "water", "walk", "sleep", "read", "call", "clean", "tidy", "stretch",
+           "meditat", "floss", "cook", "wash", "buy"),
+    "pl": ("pić", "wod", "spacer", "spać", "czyta", "zadzwo", "posprząt", "sprząt",
+           "rozciąga", "medyt", "ugotow", "umy", "kupi"),
+}
+# Conjunctions joining several requirements ("a" is only one in Polish)
+_CLAUSE_WORDS = {
+    "en": ("and", "then", "while"),
+    "pl": ("i", "oraz", "a", "potem"),
+}
+# Words of a long time horizon ("in 6 months", "w ciągu roku")
+_HORIZON_STEMS = {
+    "en": ("month", "year"),
+    "pl": ("miesi", "rok", "lat"),
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words, keeping Polish letters."""
+    return _WORD_PATTERN.findall(text.lower())
+
+
+def detect_language(text: str) -> str:
+    """Tell Polish ("pl") from English ("en") text by its letters and stopwords."""
+    words = tokenize(text)
+    if any(char in _POLISH_LETTERS for char in text.lower()):
+        return "pl"
+    if any(word in _POLISH_STOPWORDS for word in words) and not {"the", "a", "to"} & set(words):
+        return "pl"
+    return "en"
+
+
+def _count_stems(words: List[str], stems: tuple) -> int:
+    return sum(1 for word in words if word.startswith(stems))
+
+
+def complexity_score(goal_text: str, language: str) -> float:
+    """Score how much planning a goal needs. Higher is more complex.
+
+    The score adds the word entropy of the goal (a long goal with many
+    distinct words carries more requirements), its clauses, words of a long
+    time horizon and keywords of known complex goals, and subtracts keywords
+    of everyday habits and chores.
+
+    Args:
+        goal_text (str): The goal
+        language (str): "pl" or "en", selects the keyword lists
+
+    Returns:
+        float: The complexity score, around 0 for habits and above 2 for projects
+    """
+    words = tokenize(goal_text)
+    if not words:
+        return 0.0
+
+    counts = Counter(words)
+    entropy = -sum(count / len(words) * math.log2(count / len(words)) for count in counts.values())
+
+    clauses = goal_text.count(",") + goal_text.count(";") + sum(
+        counts[word] for word in _CLAUSE_WORDS[language])
+
+    score = entropy / 3
+    score += min(clauses, 3) * 0.5
+    score += 0.5 if _count_stems(words, _HORIZON_STEMS[language]) else 0.0
+    score += min(_count_stems(words, _COMPLEX_STEMS[language]), 2)
+    score -= min(_count_stems(words, _SIMPLE_STEMS[language]), 1)
+    return score
+
+
+def classify_goal(goal_text: str, max_simple_score: float) -> Dict[str, Any]:
+    """Pick the pipeline tier of a goal with local heuristics, without any LLM call.
+
+    Args:
+        goal_text (str): The goal
+        max_simple_score (float): Goals scoring at most this are simple
+
+    Returns:
+        Dict[str, Any]: The tier ("simple" or "complex"), the score and the detected language
+    """
+    language = detect_language(goal_text)
+    score = complexity_score(goal_text, language)
+    tier = TIER_SIMPLE if score <= max_simple_score else TIER_COMPLEX
+    return {"tier": tier, "score": round(score, 3), "language": language}
@@ -0,0 +1,85 @@
+import copy
+from typing import List, Dict, Any
+
+
+def diff_nodes(old_nodes: List[Dict[str, Any]], new_nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compute the structural changes that turn one node list into another.
+
+    Args:
+        old_nodes (List[Dict[str, Any]]): The nodes before the change
+        new_nodes (List[Dict[str, Any]]): The nodes after the change
+
+    Returns:
+        Dict[str, Any]: The delta, with only the non-empty parts of
+            "added" (new nodes), "removed" (IDs), "changed" (changed fields
+            other than parent_id, by ID), "reparented" (new parent ID, by ID)
+            and "order" (all IDs, if the nodes were reordered)
+    """
+    old_by_id = {node.get("id"): node for node in old_nodes}
+    new_by_id = {node.get("id"): node for node in new_nodes}
+
+    added = [copy.deepcopy(node) for node in new_nodes if node.get("id") not in old_by_id]
+    removed = [node.get("id") for node in old_nodes if node.get("id") not in new_by_id]
+    changed = {}
+    reparented = {}
+    for node_id, node in new_by_id.items():
+        old = old_by_id.get(node_id)
+        if old is None:
+            continue
+        if node.get("parent_id") != old.get("parent_id"):
+            reparented[node_id] = node.get("parent_id")
+        fields = {key: copy.deepcopy(value) for key, value in node.items()
+                  if key not in ("id", "parent_id") and old.get(key) != value}
+        # A field missing from the new node is stored as None
+        fields.update({key: None for key in old
+                       if key not in node and key not in ("id", "parent_id") and old[key] is not None})
+        if fields:
+            changed[node_id] = fields
+
+    delta = {"added": added, "removed": removed, "changed": changed, "reparented": reparented}
+    delta = {key: value for key, value in delta.items() if value}
+
+    # Surviving nodes keep their order and added ones are appended, unless stored otherwise
+    new_order = [node.get("id") for node in new_nodes]
+    if _default_order(old_nodes, delta) != new_order:
+        delta["order"] = new_order
+    return delta
+
+
+def _default_order(old_nodes: List[Dict[str, Any]], delta: Dict[str, Any]) -> List[str]:
+    removed = set(delta.get("removed", []))
+    return ([node.get("id") for node in old_nodes if node.get("id") not in removed]
+            + [node.get("id") for node in delta.get("added", [])])
+
+
+def apply_delta(nodes: List[Dict[str, Any]], delta: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Apply a delta computed by diff_nodes to the node list it was computed from.
+
+    Args:
+        nodes (List[Dict[str, Any]]): The nodes before the change
+        delta (Dict[str, Any]): The delta
+
+    Returns:
+        List[Dict[str, Any]]: The nodes after the change
+    """
+    removed = set(delta.get("removed", []))
+    result = {}
+    for node in nodes:
+        if node.get("id") in removed:
+            continue
+        node = copy.deepcopy(node)
+        node_id = node.get("id")
+        if node_id in delta.get("reparented", {}):
+            node["parent_id"] = delta["reparented"][node_id]
+        node.update(copy.deepcopy(delta.get("changed", {}).get(node_id, {})))
+        result[node_id] = node
+    for node in delta.get("added", []):
+        result[node.get("id")] = copy.deepcopy(node)
+
+    order = delta.get("order") or _default_order(nodes, delta)
+    return [result[node_id] for node_id in order if node_id in result]
+
+
+def delta_stats(delta: Dict[str, Any]) -> Dict[str, int]:
+    """Count the added, removed, changed and reparented nodes of a delta."""
+    return {key: len(delta.get(key, ())) for key in ("added", "removed", "changed", "reparented")}
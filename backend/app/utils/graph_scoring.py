@@ -0,0 +1,81 @@
+from typing import List, Dict, Any
+
+from .graph_utils import validate_tree, get_node_depths
+
+# The prompts ask for a tree of 5-15 subgoals
+TARGET_MIN_NODES = 5
+TARGET_MAX_NODES = 15
+# Preferred number of levels below the root
+TARGET_MIN_DEPTH = 2
+TARGET_MAX_DEPTH = 4
+
+
+def score_graph(nodes: List[Dict[str, Any]]) -> float:
+    """Score a generated graph on its structure. Higher is better.
+
+    The score rewards a node count within the 5-15 target, a depth of two to
+    four levels and evenly balanced branches, and penalizes duplicate labels.
+    Graphs that are not a valid tree score negative infinity.
+
+    Args:
+        nodes (List[Dict[str, Any]]): The nodes of the graph
+
+    Returns:
+        float: The structural score, at most 4.0
+    """
+    if validate_tree(nodes):
+        return float("-inf")
+
+    # Node count (the root is the goal itself, not a subgoal)
+    subgoal_count = len(nodes) - 1
+    if subgoal_count < TARGET_MIN_NODES:
+        count_score = subgoal_count / TARGET_MIN_NODES
+    elif subgoal_count > TARGET_MAX_NODES:
+        count_score = TARGET_MAX_NODES / subgoal_count
+    else:
+        count_score = 1.0
+
+    # Depth
+    max_depth = max(get_node_depths(nodes).values())
+    if max_depth < TARGET_MIN_DEPTH:
+        depth_score = max_depth / TARGET_MIN_DEPTH
+    elif max_depth > TARGET_MAX_DEPTH:
+        depth_score = TARGET_MAX_DEPTH / max_depth
+    else:
+        depth_score = 1.0
+
+    # Balance: how evenly children are spread over the nodes that have any
+    child_counts: Dict[str, int] = {}
+    for node in nodes:
+        if node.get("parent_id") is not None:
+            child_counts[node["parent_id"]] = child_counts.get(node["parent_id"], 0) + 1
+    counts = list(child_counts.values())
+    if len(counts) > 1:
+        mean = sum(counts) / len(counts)
+        variance = sum((count - mean) ** 2 for count in counts) / len(counts)
+        balance_score = 1.0 / (1.0 + (variance ** 0.5) / mean)
+    else:
+        balance_score = 0.5 if counts else 0.0
+
+    # Duplicate labels
+    labels = [str(node.get("label", "")).strip().lower() for node in nodes]
+    duplicate_count = len(labels) - len(set(labels))
+    duplicate_score = 1.0 / (1.0 + duplicate_count)
+
+    return count_score + depth_score + balance_score + duplicate_score
+
+
+def rank_graphs(candidates: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    """Sort candidate graphs from best to worst, dropping invalid trees.
+
+    Args:
+        candidates (List[List[Dict[str, Any]]]): The node lists of the candidates
+
+    Returns:
+        List[List[Dict[str, Any]]]: The valid candidates, best first
+    """
+    scored = [(score_graph(nodes), index, nodes)
+              for index, nodes in enumerate(candidates)]
+    scored = [item for item in scored if item[0] != float("-inf")]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [nodes for _, _, nodes in scored]
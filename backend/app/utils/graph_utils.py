@@ -0,0 +1,184 @@
+from typing import List, Dict, Any, Optional
+
+
+def find_node(nodes: List[Dict[str, Any]], node_id: str) -> Optional[Dict[str, Any]]:
+    """Find a node by its ID.
+
+    Args:
+        nodes (List[Dict[str, Any]]): The nodes of the graph
+        node_id (str): The ID of the node to find
+
+    Returns:
+        Optional[Dict[str, Any]]: The node if found, None otherwise
+    """
+    return next((node for node in nodes if node.get("id") == node_id), None)
+
+
+def get_ancestor_path(nodes: List[Dict[str, Any]], node_id: str) -> List[Dict[str, Any]]:
+    """Get the path from the root node down to (and including) the given node.
+
+    Args:
+        nodes (List[Dict[str, Any]]): The nodes of the graph
+        node_id (str): The ID of the node at the end of the path
+
+    Returns:
+        List[Dict[str, Any]]: The nodes on the path, root first. Empty if the node does not exist.
+    """
+    nodes_by_id = {node.get("id"): node for node in nodes}
+    path = []
+    seen = set()
+    current = nodes_by_id.get(node_id)
+
+    while current is not None and current.get("id") not in seen:
+        seen.add(current.get("id"))
+        path.append(current)
+        current = nodes_by_id.get(current.get("parent_id"))
+
+    path.reverse()
+    return path
+
+
+def get_descendant_ids(nodes: List[Dict[str, Any]], node_id: str) -> List[str]:
+    """Get the IDs of all descendants of a node (not including the node itself).
+
+    Args:
+        nodes (List[Dict[str, Any]]): The nodes of the graph
+        node_id (str): The ID of the node whose descendants to collect
+
+    Returns:
+        List[str]: The descendant IDs in breadth-first order
+    """
+    children_by_parent: Dict[Optional[str], List[str]] = {}
+    for node in nodes:
+        children_by_parent.setdefault(node.get("parent_id"), []).append(node.get("id"))
+
+    descendants = []
+    seen = {node_id}
+    queue = list(children_by_parent.get(node_id, []))
+
+    while queue:
+        child_id = queue.pop(0)
+        if child_id in seen:
+            continue
+        seen.add(child_id)
+        descendants.append(child_id)
+        queue.extend(children_by_parent.get(child_id, []))
+
+    return descendants
+
+
+def _next_free_id(used_ids: set) -> str:
+    """Return the lowest numeric string ID that is not in use yet."""
+    candidate = 0
+    while str(candidate) in used_ids:
+        candidate += 1
+    return str(candidate)
+
+
+def splice_subtree(
+    nodes: List[Dict[str, Any]],
+    node_id: str,
+    new_nodes: List[Dict[str, Any]],
+    replace: bool = True,
+) -> List[Dict[str, Any]]:
+    """Attach a freshly generated subtree under a node of an existing graph.
+
+    The IDs of the new nodes are reassigned so they never collide with the
+    IDs already used in the graph. New nodes whose parent is missing, null or
+    unknown are attached directly to ``node_id``.
+
+    Args:
+        nodes (List[Dict[str, Any]]): The nodes of the existing graph
+        node_id (str): The ID of the node to attach the subtree to
+        new_nodes (List[Dict[str, Any]]): The generated subtree nodes
+        replace (bool): If True, the current descendants of the node are removed first
+
+    Returns:
+        List[Dict[str, Any]]: The updated list of nodes
+    """
+    if find_node(nodes, node_id) is None:
+        raise ValueError(f"Node {node_id} not found in the graph")
+
+    removed_ids = set(get_descendant_ids(nodes, node_id)) if replace else set()
+    result = [dict(node) for node in nodes if node.get("id") not in removed_ids]
+
+    used_ids = {node.get("id") for node in result}
+    id_map = {}
+    for node in new_nodes:
+        new_id = _next_free_id(used_ids)
+        used_ids.add(new_id)
+        id_map[str(node.get("id"))] = new_id
+
+    for node in new_nodes:
+        parent_id = node.get("parent_id")
+        parent_id = str(parent_id) if parent_id is not None else None
+        result.append({
+            "id": id_map[str(node.get("id"))],
+            "label": node.get("label"),
+            "parent_id": id_map.get(parent_id, node_id),
+            "description": node.get("description"),
+        })
+
+    return result
+
+
+def validate_tree(nodes: List[Dict[str, Any]]) -> List[str]:
+    """Check that the nodes form a single tree.
+
+    Args:
+        nodes (List[Dict[str, Any]]): The nodes of the graph
+
+    Returns:
+        List[str]: A list of problems found, empty if the nodes form a valid tree
+    """
+    if not nodes:
+        return ["Graph has no nodes"]
+
+    errors = []
+    ids = [node.get("id") for node in nodes]
+    if len(ids) != len(set(ids)):
+        errors.append("Duplicate node IDs")
+
+    roots = [node for node in nodes if node.get("parent_id") is None]
+    if len(roots) != 1:
+        errors.append(f"Expected exactly one root node, found {len(roots)}")
+
+    id_set = set(ids)
+    for node in nodes:
+        parent_id = node.get("parent_id")
+        if parent_id is not None and parent_id not in id_set:
+            errors.append(f"Node {node.get('id')} has unknown parent {parent_id}")
+
+    if len(roots) == 1:
+        reachable = {roots[0].get("id")}
+        reachable.update(get_descendant_ids(nodes, roots[0].get("id")))
+        if len(reachable) != len(id_set):
+            errors.append("Some nodes are not reachable from the root")
+
+    return errors
+
+
+def get_node_depths(nodes: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Get the depth of every node reachable from a root (roots have depth 0).
+
+    Args:
+        nodes (List[Dict[str, Any]]): The nodes of the graph
+
+    Returns:
+        Dict[str, int]: Mapping of node ID to its depth
+    """
+    children_by_parent: Dict[Optional[str], List[str]] = {}
+    for node in nodes:
+        children_by_parent.setdefault(node.get("parent_id"), []).append(node.get("id"))
+
+    depths = {}
+    queue = [(root_id, 0) for root_id in children_by_parent.get(None, [])]
+    while queue:
+        node_id, depth = queue.pop(0)
+        if node_id in depths:
+            continue
+        depths[node_id] = depth
+        queue.extend((child_id, depth + 1)
+                     for child_id in children_by_parent.get(node_id, []))
+
+    return depths
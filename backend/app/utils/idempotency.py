@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .shared_cache import create_cache
+
+
+class IdempotencyKeyMismatchError(Exception):
+    """Raised when an idempotency key is reused with a different request."""
+
+
+class IdempotencyKeyInProgressError(Exception):
+    """Raised when waiting for a concurrent request with the same key takes too long."""
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Hash a JSON-serializable request payload.
+
+    Args:
+        payload (Any): The request data that must match for a replay
+
+    Returns:
+        str: A stable fingerprint of the payload
+    """
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Run each idempotent request once and replay its response to duplicates.
+
+    The first request with a key records that it is in progress. Concurrent
+    duplicates wait for it to finish, later duplicates get the stored response
+    until it expires. Failed requests are not stored, so they can be retried.
+    The handler is not cancelled when the caller that started it goes away.
+
+    With a shared_path, stored responses are kept in a SQLite file and replayed
+    by every worker process on the host; responses must then be JSON
+    serializable. Requests in progress are only known to their own worker: a
+    duplicate that reaches another worker while the first one runs is not held
+    back and runs the handler again.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        wait_timeout_seconds: float,
+        max_size: int = 10000,
+        shared_path: Optional[str] = None,
+    ):
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self._responses = create_cache("idempotency", ttl_seconds, max_size, shared_path)
+        self._in_progress: Dict[str, Tuple[str, asyncio.Event]] = {}
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        """Run the handler once per key.
+
+        Args:
+            key (str): The scoped idempotency key
+            fingerprint (str): Fingerprint of the request, see request_fingerprint
+            handler (Callable): Coroutine function producing the response
+
+        Returns:
+            Tuple[Any, bool]: The response and whether it was replayed
+        """
+        while True:
+            stored = self._responses.get(key)
+            if stored is not None:
+                if stored["fingerprint"] != fingerprint:
+                    raise IdempotencyKeyMismatchError(
+                        "Idempotency key was already used with a different request")
+                return stored["response"], True
+
+            pending = self._in_progress.get(key)
+            if pending is None:
+                break
+
+            pending_fingerprint, event = pending
+            if pending_fingerprint != fingerprint:
+                raise IdempotencyKeyMismatchError(
+                    "Idempotency key is in use by a different request")
+
+            try:
+                await asyncio.wait_for(event.wait(), timeout=self.wait_timeout_seconds)
+            except asyncio.TimeoutError:
+                raise IdempotencyKeyInProgressError(
+                    "A request with this idempotency key is still in progress")
+
+        event = asyncio.Event()
+        self._in_progress[key] = (fingerprint, event)
+
+        def finish(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is None:
+                self._responses.set(
+                    key, {"fingerprint": fingerprint, "response": task.result()})
+            del self._in_progress[key]
+            event.set()
+
+        # The handler runs in a task of its own, so it keeps running for the
+        # duplicates waiting on it when the caller that started it stops waiting
+        task = asyncio.ensure_future(handler())
+        task.add_done_callback(finish)
+        return await asyncio.shield(task), False
+
+    def clear(self) -> None:
+        """Forget all stored responses."""
+        self._responses.clear()
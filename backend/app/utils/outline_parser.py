@@ -0,0 +1,138 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+# Matches "1.", "1)", "1.1", "1.2.3." and "-", "*", "•", "+" list markers
+OUTLINE_LINE_PATTERN = re.compile(
+    r'^(?P<indent>\s*)'
+    r'(?:(?P<number>\d+(?:\.\d+)+\.?|\d+[.)])|(?P<bullet>[-*•+]))'
+    r'\s+(?P<text>.+)$'
+)
+
+LABEL_SEPARATORS = [": ", " - ", " – ", " — "]
+
+
+def _clean_line(line: str) -> str:
+    """Remove markdown decorations that LLMs like to add around list items."""
+    line = line.expandtabs(4).rstrip().replace("**", "").replace("__", "")
+    stripped = line.lstrip()
+    if stripped.startswith("#"):
+        indent = line[:len(line) - len(stripped)]
+        line = indent + stripped.lstrip("#").lstrip()
+    return line
+
+
+def _split_label(text: str) -> Tuple[str, Optional[str]]:
+    """Split "Label: description" into its label and description parts."""
+    for separator in LABEL_SEPARATORS:
+        if separator in text:
+            label, description = text.split(separator, 1)
+            if label.strip() and description.strip():
+                return label.strip(), description.strip()
+    return text.strip(), None
+
+
+def _parse_items(outline_text: str) -> List[Dict[str, Any]]:
+    """Extract the list items from an outline, keeping their indent and numbering."""
+    items = []
+    for raw_line in outline_text.split('\n'):
+        line = _clean_line(raw_line)
+        if not line.strip():
+            continue
+
+        match = OUTLINE_LINE_PATTERN.match(line)
+        if match:
+            number = match.group("number")
+            parts = None
+            if number:
+                parts = tuple(part for part in re.split(r'[.)]', number) if part)
+            items.append({
+                "indent": len(match.group("indent")),
+                "depth": len(parts) if parts else None,
+                "number": parts,
+                "text": match.group("text").strip(),
+            })
+        elif items and line[0].isspace():
+            # Indented unmarked lines continue the text of the previous item
+            items[-1]["text"] = f"{items[-1]['text']} {line.strip()}"
+
+    return items
+
+
+def outline_to_actions(outline_text: str) -> List[str]:
+    """Flatten an outline into a plain list of actions.
+
+    Args:
+        outline_text (str): The outline text returned by the LLM
+
+    Returns:
+        List[str]: The action texts without their list markers
+    """
+    return [item["text"] for item in _parse_items(outline_text)]
+
+
+def parse_outline(goal_text: str, outline_text: str) -> List[Dict[str, Any]]:
+    """Build a goal graph from an outline-numbered or indented list.
+
+    Numbered items ("1.", "1.1", "1.2.1") are nested under the item whose
+    number is their prefix ("2.1" under "2."), bulleted items by their
+    indentation. The main goal becomes the root node
+    with id "0".
+
+    Args:
+        goal_text (str): The main goal, used as the root node label
+        outline_text (str): The outline text returned by the LLM
+
+    Returns:
+        List[Dict[str, Any]]: A list of nodes representing the graph structure
+
+    Raises:
+        ValueError: If the outline cannot be turned into a valid tree
+    """
+    items = _parse_items(outline_text)
+    if not items:
+        raise ValueError("No outline items found in LLM response")
+
+    nodes = [{
+        "id": "0",
+        "label": goal_text,
+        "parent_id": None,
+        "description": None,
+    }]
+
+    # Stack of (indent, depth, node_id); the root sits below every item
+    stack = [(-1, 0, "0")]
+    # Node IDs of the numbered items by their number
+    numbered = {}
+
+    for index, item in enumerate(items, 1):
+        if item["depth"] is not None:
+            # Numbered items never nest under bullets or deeper numbers
+            while len(stack) > 1 and (stack[-1][1] is None or stack[-1][1] >= item["depth"]):
+                stack.pop()
+            if item["depth"] > 1:
+                # The parent is the item numbered with the prefix, not just the previous shallower one
+                parent_id = numbered.get(item["number"][:-1])
+                if parent_id is None:
+                    raise ValueError(
+                        "Outline item {} has no parent item {}".format(
+                            ".".join(item["number"]), ".".join(item["number"][:-1])))
+                if stack[-1][2] != parent_id:
+                    stack.append((item["indent"], item["depth"] - 1, parent_id))
+        else:
+            while len(stack) > 1 and stack[-1][0] >= item["indent"]:
+                stack.pop()
+
+        label, description = _split_label(item["text"])
+        node_id = str(index)
+        nodes.append({
+            "id": node_id,
+            "label": label,
+            "parent_id": stack[-1][2],
+            "description": description,
+        })
+
+        stack.append((item["indent"], item["depth"], node_id))
+        if item["number"]:
+            numbered[item["number"]] = node_id
+
+    return nodes
@@ -0,0 +1,160 @@
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.utils.goal_complexity import tokenize, detect_language
+
+_STOPWORDS = {
+    "en": {"a", "an", "and", "the", "to", "of", "in", "on", "for", "with", "my", "by", "at",
+           "or", "is", "be", "it", "from", "as", "into", "your", "how"},
+    "pl": {"i", "w", "we", "na", "do", "z", "ze", "o", "się", "oraz", "dla", "po", "od", "jak",
+           "nie", "że", "to", "a", "mój", "moje", "moja", "przez", "lub", "czy"},
+}
+_ALL_STOPWORDS = _STOPWORDS["en"] | _STOPWORDS["pl"]
+
+# Inflection endings, longest first; a stem keeps at least _MIN_STEM letters
+_SUFFIXES = {
+    "en": ("ations", "ation", "ings", "ing", "ies", "ed", "es", "ly", "e", "s", "y"),
+    "pl": ("owania", "owanie", "ościach", "ości", "ość", "ami", "ach", "ego", "emu", "ych",
+           "ymi", "imi", "owi", "iem", "ów", "om", "ie", "ia", "ej", "ze", "ą", "ę", "a", "e", "i",
+           "o", "u", "y"),
+}
+_MIN_STEM = 3
+
+# Polish letters are folded, so a query typed without them still matches
+_FOLD = str.maketrans("ąćęłńóśźż", "acelnoszz")
+
+
+def stem(word: str, language: str) -> str:
+    """Strip the longest known inflection ending of a word and fold Polish letters."""
+    for suffix in _SUFFIXES[language]:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            word = word[:-len(suffix)]
+            # running -> run, planned -> plan
+            if language == "en" and len(word) > _MIN_STEM and word[-1] == word[-2] and word[-1] not in "aeiouls":
+                word = word[:-1]
+            break
+    return word.translate(_FOLD)
+
+
+def analyze(text: str, language: Optional[str] = None) -> List[str]:
+    """Turn text into index terms: words without stopwords, stemmed for its language.
+
+    Args:
+        text (str): The text to index
+        language (str, optional): "pl" or "en"; detected from the text if not given
+
+    Returns:
+        List[str]: The terms, in order
+    """
+    language = language or detect_language(text)
+    return [stem(word, language) for word in tokenize(text) if word not in _ALL_STOPWORDS]
+
+
+def query_terms(text: str) -> List[Set[str]]:
+    """Turn a search query into its alternative terms, one set per query word.
+
+    A short query does not tell its language, so every word is stemmed for
+    both Polish and English and matches a document indexed in either.
+    """
+    return [{stem(word, "en"), stem(word, "pl")}
+            for word in tokenize(text) if word not in _ALL_STOPWORDS]
+
+
+def graph_terms(graph: Dict[str, Any]) -> List[str]:
+    """
+    Build the index terms of a goal graph from its goal, node labels and descriptions.
+
+    The language is detected once from all of the graph's text, which is
+    more reliable than from a single label.
+
+    Args:
+        graph (Dict[str, Any]): The goal graph
+
+    Returns:
+        List[str]: The terms
+    """
+    texts = [graph.get("goal") or ""]
+    for node in graph.get("nodes") or []:
+        texts.append(node.get("label") or "")
+        texts.append(node.get("description") or "")
+
+    text = "\n".join(texts)
+    return analyze(text, detect_language(text))
+
+
+class BM25Index:
+    """An inverted index ranking documents by Okapi BM25.
+
+    Documents are added, replaced and removed one at a time; a search only
+    reads the postings of the query terms.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._terms: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def add(self, doc_id: str, terms: Iterable[str]) -> None:
+        """Index a document by its terms, replacing an earlier version."""
+        self.remove(doc_id)
+        counts = Counter(terms)
+        self._terms[doc_id] = counts
+        self._lengths[doc_id] = sum(counts.values())
+        self._total_length += self._lengths[doc_id]
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_id: str) -> None:
+        """Remove a document from the index, if it is there."""
+        counts = self._terms.pop(doc_id, None)
+        if counts is None:
+            return
+        self._total_length -= self._lengths.pop(doc_id)
+        for term in counts:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, terms: List[Set[str]], limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Rank the documents matching any of the query terms.
+
+        Args:
+            terms (List[Set[str]]): Alternative terms of each query word (see query_terms)
+            limit (int): Maximum number of results
+
+        Returns:
+            List[Tuple[str, float]]: Document IDs and scores, best first
+        """
+        doc_count = len(self._terms)
+        if not doc_count:
+            return []
+        average_length = self._total_length / doc_count
+
+        scores: Dict[str, float] = {}
+        for alternatives in terms:
+            # The best scoring alternative counts once per query word
+            word_scores: Dict[str, float] = {}
+            for term in alternatives:
+                postings = self._postings.get(term, {})
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, count in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    score = idf * count * (self.k1 + 1) / (count + norm)
+                    word_scores[doc_id] = max(word_scores.get(doc_id, 0.0), score)
+            for doc_id, score in word_scores.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._terms
+
+    def __len__(self) -> int:
+        return len(self._terms)
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Union
+
+import orjson
+
+from app.utils.ttl_cache import TTLCache
+
+_MISSING = object()
+
+
+class SQLiteCache:
+    """A TTL cache stored in a SQLite file, shared by all worker processes on a host.
+
+    It has the interface of TTLCache, so a worker can find values cached by
+    another one. Values must be JSON serializable; keys may be strings or
+    tuples of strings. ``pop`` is atomic across processes, so a value is
+    never handed out twice. Every cache uses its own namespace in the file.
+    """
+
+    def __init__(self, path: str, namespace: str, ttl_seconds: float, max_size: int = 1024):
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._local = threading.local()
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection of this thread and process, opening it on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode; pop opens its own write transaction
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _encode_key(key: Union[str, tuple]) -> str:
+        return key if isinstance(key, str) else orjson.dumps(key).decode("utf-8")
+
+    def get(self, key: Union[str, tuple], default: Any = None) -> Any:
+        """Return the value stored under key, or default if missing or expired."""
+        connection = self._connect()
+        encoded_key = self._encode_key(key)
+        now = time.time()
+        row = connection.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, encoded_key)).fetchone()
+        if row is None:
+            return default
+
+        if row[1] <= now:
+            connection.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                (self.namespace, encoded_key, now))
+            return default
+
+        connection.execute(
+            "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, encoded_key))
+        return orjson.loads(row[0])
+
+    def set(self, key: Union[str, tuple], value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value under key, optionally with a custom time to live."""
+        connection = self._connect()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, self._encode_key(key), orjson.dumps(value), now + ttl, now))
+
+        # Evict expired entries, then the least recently used ones over the size limit
+        connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+        connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache_entries WHERE namespace = ? "
+            "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_size))
+
+    def pop(self, key: Union[str, tuple], default: Any = None) -> Any:
+        """Remove the entry stored under key and return its value."""
+        connection = self._connect()
+        encoded_key = self._encode_key(key)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, encoded_key)).fetchone()
+            if row is not None:
+                connection.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, encoded_key))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        if row is None or row[1] <= time.time():
+            return default
+        return orjson.loads(row[0])
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._connect().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def __contains__(self, key: Union[str, tuple]) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, time.time())).fetchone()
+        return row[0]
+
+
+def create_cache(
+    namespace: str,
+    ttl_seconds: float,
+    max_size: int = 1024,
+    shared_path: Optional[str] = None,
+) -> Union[TTLCache, SQLiteCache]:
+    """Create an in-process TTLCache, or a SQLiteCache shared by all workers if a path is given.
+
+    Args:
+        namespace (str): Name of the cache within the shared file
+        ttl_seconds (float): Default time to live of the entries
+        max_size (int): Maximum number of entries
+        shared_path (str, optional): Path of the shared SQLite file
+
+    Returns:
+        Union[TTLCache, SQLiteCache]: The cache
+    """
+    if shared_path:
+        return SQLiteCache(shared_path, namespace, ttl_seconds, max_size)
+    return TTLCache(ttl_seconds, max_size)
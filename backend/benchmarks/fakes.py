@@ -0,0 +1,407 @@
+"""
+Local stand-ins for the LLM providers and Firestore, used by the load test.
+
+- FakeLLMServer serves the OpenAI chat completions API and the Gemini
+  generateContent REST API over HTTP, answering after a configurable latency
+  with jitter, so requests go through the real provider SDKs and connection
+  pools. Streamed chat completions are sent node by node, spread over the
+  latency.
+- InMemoryFirestore implements the part of the Firestore client API used by
+  app/db/firebase.py, with an optional per-operation latency.
+"""
+import copy
+import json
+import operator
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GEMINI_ACTIONS = "\n".join([
+    "1. Define the desired outcome and a deadline",
+    "2. Break the goal into weekly milestones",
+    "3. Gather the tools and resources needed",
+    "4. Schedule a fixed time for practice",
+    "5. Track progress in a journal",
+    "6. Ask for feedback from someone experienced",
+    "7. Review and adjust the plan every month",
+])
+
+
+def graph_nodes(node_count=8):
+    """Build the nodes of a plausible goal graph."""
+    nodes = [{"id": "0", "label": "Main goal", "parent_id": None,
+              "description": "The goal that is broken down into subgoals"}]
+    for i in range(1, node_count):
+        nodes.append({"id": str(i), "label": f"Step {i}", "parent_id": str((i - 1) // 3),
+                      "description": f"A detailed description of what step {i} involves"})
+    return nodes
+
+
+class FakeLLMServer:
+    """HTTP server answering OpenAI and Gemini requests after a simulated latency."""
+
+    def __init__(self, latency_ms=500.0, jitter_ms=100.0, node_count=8):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.node_count = node_count
+        self.requests = 0
+        self.streamed_chunks = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _sleep(self):
+        delay = max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0)
+        time.sleep(delay / 1000)
+
+    def _openai_response(self, body):
+        content = json.dumps({"nodes": graph_nodes(self.node_count)})
+        choices = [{"index": i, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content}}
+                   for i in range(body.get("n") or 1)]
+        return {
+            "id": "chatcmpl-" + uuid.uuid4().hex, "object": "chat.completion",
+            "created": int(time.time()), "model": body.get("model", "o3-mini"),
+            "choices": choices,
+            "usage": {"prompt_tokens": 300, "completion_tokens": 400, "total_tokens": 700},
+        }
+
+    def _openai_stream_chunks(self, body):
+        """Split a chat completion into server-sent events, one node per chunk."""
+        base = {"id": "chatcmpl-" + uuid.uuid4().hex, "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", "o3-mini")}
+        nodes = [json.dumps(node) for node in graph_nodes(self.node_count)]
+        parts = ['{"nodes": [' + nodes[0]] + [", " + node for node in nodes[1:]] + ["]}"]
+        for i, part in enumerate(parts):
+            finish_reason = "stop" if i == len(parts) - 1 else None
+            yield dict(base, choices=[{"index": 0, "delta": {"content": part}, "finish_reason": finish_reason}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield dict(base, choices=[], usage={"prompt_tokens": 300, "completion_tokens": 400, "total_tokens": 700})
+
+    @staticmethod
+    def _gemini_response():
+        return {"candidates": [{
+            "content": {"parts": [{"text": GEMINI_ACTIONS}], "role": "model"},
+            "finishReason": "STOP", "index": 0,
+        }]}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                if self.path.endswith("/chat/completions") and body.get("stream"):
+                    self._stream(list(server._openai_stream_chunks(body)))
+                    return
+
+                server._sleep()
+
+                if self.path.endswith("/chat/completions"):
+                    payload = server._openai_response(body)
+                elif ":generateContent" in self.path:
+                    payload = server._gemini_response()
+                else:
+                    self.send_error(404)
+                    return
+
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, chunks):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                delay = server.latency_ms / 1000 / len(chunks)
+                try:
+                    for chunk in chunks:
+                        time.sleep(delay)
+                        self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+                        self.wfile.flush()
+                        with server._lock:
+                            server.streamed_chunks += 1
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading the stream
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _Snapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class _DocumentReference:
+    def __init__(self, store, path, doc_id):
+        self._store = store
+        self._path = path
+        self.id = doc_id
+
+    @property
+    def _key(self):
+        return self._path + (self.id,)
+
+    def set(self, data):
+        self._store._write(self._key, data, merge=False)
+
+    def update(self, data):
+        if self._store._read(self._key) is None:
+            raise KeyError(f"No document to update: {'/'.join(self._key)}")
+        self._store._write(self._key, data, merge=True)
+
+    def get(self, transaction=None):
+        return _Snapshot(self, self._store._read(self._key))
+
+    def delete(self):
+        self._store._delete(self._key)
+
+    def collection(self, name):
+        return _Query(self._store, self._key + (name,))
+
+    def on_snapshot(self, callback):
+        return self._store._watch(self, callback)
+
+
+_OPERATORS = {
+    "==": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _project(data, field_paths):
+    if data is None or field_paths is None:
+        return data
+    return {field: data[field] for field in field_paths if field in data}
+
+
+class _Query:
+    def __init__(self, store, path, filters=(), order=None, limit_count=None, fields=None):
+        self._store = store
+        self._path = path
+        self._filters = filters
+        self._order = order
+        self._limit = limit_count
+        self._fields = fields
+
+    def document(self, doc_id=None):
+        return _DocumentReference(self._store, self._path, doc_id or uuid.uuid4().hex[:20])
+
+    def where(self, field, op, value):
+        if op not in _OPERATORS:
+            raise NotImplementedError(f"Unsupported operator: {op}")
+        return _Query(self._store, self._path, self._filters + ((field, op, value),), self._order, self._limit,
+                      self._fields)
+
+    def select(self, field_paths):
+        return _Query(self._store, self._path, self._filters, self._order, self._limit, list(field_paths))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return _Query(self._store, self._path, self._filters, (field, direction), self._limit, self._fields)
+
+    def limit(self, count):
+        return _Query(self._store, self._path, self._filters, self._order, count, self._fields)
+
+    def stream(self, transaction=None):
+        docs = self._store._list(self._path)
+        docs = [(doc_id, data) for doc_id, data in docs
+                if all(data.get(field) is not None and _OPERATORS[op](data.get(field), value)
+                       for field, op, value in self._filters)]
+        if self._order:
+            field, direction = self._order
+            docs.sort(key=lambda item: item[1].get(field) or datetime.min.replace(tzinfo=timezone.utc),
+                      reverse=str(direction).upper().endswith("DESCENDING"))
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return [_Snapshot(_DocumentReference(self._store, self._path, doc_id), _project(data, self._fields))
+                for doc_id, data in docs]
+
+
+class _Watch:
+    """Snapshot listener handle returned by on_snapshot."""
+
+    def __init__(self, store, key, callback):
+        self._store = store
+        self._key = key
+        self._callback = callback
+
+    def unsubscribe(self):
+        with self._store._lock:
+            listeners = self._store._listeners.get(self._key, [])
+            if self in listeners:
+                listeners.remove(self)
+
+
+class _Transaction:
+    """Transaction accepted by firestore.transactional; writes are applied on commit."""
+
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+        self._id = None
+        self._read_only = False
+        self._max_attempts = 1
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._store._transaction_lock.acquire()
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        try:
+            for write in self._writes:
+                write()
+        finally:
+            self._clean_up()
+            self._store._transaction_lock.release()
+        return []
+
+    def _rollback(self):
+        if self._id is not None:
+            self._clean_up()
+            self._store._transaction_lock.release()
+
+    def set(self, reference, data):
+        self._writes.append(lambda: reference.set(data))
+
+    def update(self, reference, data):
+        self._writes.append(lambda: reference.update(data))
+
+    def delete(self, reference):
+        self._writes.append(reference.delete)
+
+
+class InMemoryFirestore:
+    """In-memory stand-in for google.cloud.firestore.Client with simulated latency."""
+
+    def __init__(self, latency_ms=5.0, jitter_ms=2.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._documents = {}
+        self._lock = threading.Lock()
+        # Transactions run one at a time
+        self._transaction_lock = threading.Lock()
+        # Snapshot listeners by document key; they are called right after each write
+        self._listeners = {}
+        # Documents read, as Firestore bills them
+        self.reads = 0
+
+    def collection(self, name):
+        return _Query(self, (name,))
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        # One round trip for all of the documents
+        self._sleep()
+        with self._lock:
+            found = [(reference, copy.deepcopy(self._documents.get(reference._key))) for reference in references]
+            self.reads += len(found)
+        return [_Snapshot(reference, _project(data, field_paths)) for reference, data in found]
+
+    def close(self):
+        pass
+
+    def _sleep(self):
+        delay = max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+    @classmethod
+    def _resolve(cls, data, now=None):
+        from firebase_admin import firestore
+
+        now = now or datetime.now(timezone.utc)
+        return {key: now if value is firestore.SERVER_TIMESTAMP
+                else cls._resolve(value, now) if isinstance(value, dict) else copy.deepcopy(value)
+                for key, value in data.items()}
+
+    def _write(self, key, data, merge):
+        self._sleep()
+        with self._lock:
+            current = self._documents.get(key, {}) if merge else {}
+            self._documents[key] = dict(current, **self._resolve(data))
+        self._notify(key)
+
+    def _read(self, key):
+        self._sleep()
+        with self._lock:
+            self.reads += 1
+            return copy.deepcopy(self._documents.get(key))
+
+    def _delete(self, key):
+        self._sleep()
+        with self._lock:
+            self._documents.pop(key, None)
+        self._notify(key)
+
+    def _watch(self, reference, callback):
+        watch = _Watch(self, reference._key, callback)
+        with self._lock:
+            self._listeners.setdefault(reference._key, []).append(watch)
+        self._notify(reference._key, [watch])
+        return watch
+
+    def _notify(self, key, watches=None):
+        with self._lock:
+            watches = list(self._listeners.get(key, [])) if watches is None else watches
+            data = copy.deepcopy(self._documents.get(key))
+        if not watches:
+            return
+        snapshot = _Snapshot(_DocumentReference(self, key[:-1], key[-1]), data)
+        for watch in watches:
+            watch._callback([snapshot], [], datetime.now(timezone.utc))
+
+    def _list(self, path):
+        self._sleep()
+        with self._lock:
+            docs = [(key[-1], copy.deepcopy(data)) for key, data in self._documents.items()
+                    if key[:-1] == path]
+            self.reads += max(len(docs), 1)
+            return docs
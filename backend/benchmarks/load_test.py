@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+"""
+Load test of the goal API against local LLM and Firestore stand-ins.
+
+Runs the real FastAPI app with uvicorn in a subprocess. Its OpenAI and Gemini
+clients point at a local fake server with configurable latency and jitter (see
+benchmarks/fakes.py) and its Firestore client is an in-memory fake. Concurrent
+load is driven through POST /goals/process, GET /goals/user/{user_id} and
+PUT /goals/{graph_id}, and the throughput and p50/p95/p99 latencies of each
+scenario are written to a JSON file. Pass an earlier result file with
+--compare to print the change per scenario.
+
+Usage:
+    python benchmarks/load_test.py [--requests 100] [--concurrency 10]
+        [--llm-latency-ms 500] [--llm-jitter-ms 100] [--firestore-latency-ms 5]
+        [--output results.json] [--compare benchmarks/results/load_test-<commit>.json]
+
+Results are written to benchmarks/results/load_test-<commit>.json by default.
+
+With --cassette, the app answers LLM calls from a cassette recorded earlier
+(e.g. by running the app against the real providers with
+LLM_CASSETTE_MODE=record) instead of calling the stand-in server.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add the backend directory to the path so Python can find the app module
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+
+from benchmarks.fakes import FakeLLMServer, InMemoryFirestore, graph_nodes  # noqa: E402
+
+SCENARIOS = ["process", "list", "update"]
+
+
+def percentile(values, fraction):
+    """Return the value at the given fraction of the sorted values (nearest rank)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(latencies, errors, duration):
+    """Summarize the latencies (in seconds) of one scenario in milliseconds."""
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "mean_ms": round(1000 * sum(latencies) / len(latencies), 2) if latencies else None,
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(1000 * percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 2) if latencies else None,
+        "max_ms": round(1000 * max(latencies), 2) if latencies else None,
+    }
+
+
+async def run_scenario(client, concurrency, requests):
+    """Send the requests with at most `concurrency` in flight and measure them."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    responses = []
+    errors = 0
+
+    async def send(request):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.request(*request[:2], **request[2])
+            except httpx.HTTPError:
+                errors += 1
+                return
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+                responses.append(response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(request) for request in requests))
+    return summarize(latencies, errors, time.perf_counter() - start), responses
+
+
+async def drive_load(base_url, args):
+    """Run the process, list and update scenarios one after another."""
+    users = [f"load-user-{i}" for i in range(args.users)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        process_requests = [("POST", "/api/v1/goals/process", {"json": {
+            "goal": f"Learn to play the guitar in {i % 12 + 1} months",
+            "user_id": users[i % len(users)]}}) for i in range(args.requests)]
+        results["process"], responses = await run_scenario(client, args.concurrency, process_requests)
+        graph_ids = [response.json()["graph_id"] for response in responses if response.json().get("graph_id")]
+
+        list_requests = [("GET", f"/api/v1/goals/user/{users[i % len(users)]}", {})
+                         for i in range(args.requests)]
+        results["list"], _ = await run_scenario(client, args.concurrency, list_requests)
+
+        update_requests = [("PUT", f"/api/v1/goals/{graph_ids[i % len(graph_ids)]}",
+                            {"json": {"nodes": graph_nodes(args.nodes)}})
+                           for i in range(args.requests)] if graph_ids else []
+        results["update"], _ = await run_scenario(client, args.concurrency, update_requests)
+
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url, server, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("The app server exited during startup")
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("The app server did not start in time")
+
+
+def serve(args):
+    """Run the app with the in-memory Firestore (subprocess entry point)."""
+    import uvicorn
+    from app.db import firebase
+    from app.main import app
+
+    firebase._db = InMemoryFirestore(args.firestore_latency_ms, args.firestore_jitter_ms)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_results(results, previous=None):
+    header = f"{'Scenario':<10} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    print(header)
+    print("-" * len(header))
+    for scenario in SCENARIOS:
+        stats = results[scenario]
+        print(f"{scenario:<10} {stats['throughput_rps']:>8} {stats['p50_ms']!s:>9} "
+              f"{stats['p95_ms']!s:>9} {stats['p99_ms']!s:>9} {stats['errors']:>7}")
+        if previous and scenario in previous:
+            before, after = previous[scenario].get("p95_ms"), stats["p95_ms"]
+            if before and after:
+                print(f"{'':<10} p95 {after - before:+.2f} ms ({(after - before) / before:+.1%}) "
+                      f"vs {previous.get('_commit') or 'previous run'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the goal API against local stand-ins")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at a time")
+    parser.add_argument("--users", type=int, default=10, help="Number of distinct user IDs")
+    parser.add_argument("--nodes", type=int, default=8, help="Nodes per generated graph")
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--firestore-latency-ms", type=float, default=5.0)
+    parser.add_argument("--firestore-jitter-ms", type=float, default=2.0)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/load_test-<commit>.json)")
+    parser.add_argument("--compare", help="An earlier result file to compare against")
+    parser.add_argument("--cassette", help="Replay LLM responses from this cassette file")
+    parser.add_argument("--replay-latency", choices=["recorded", "zero"], default="recorded",
+                        help="Replay the recorded LLM latency or answer immediately")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    llm_server = FakeLLMServer(args.llm_latency_ms, args.llm_jitter_ms, args.nodes).start()
+    port = free_port()
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="load-test", OPENAI_BASE_URL=llm_server.url + "/v1",
+        GOOGLE_GEMINI_API_KEY="load-test", GOOGLE_GEMINI_API_ENDPOINT=llm_server.url,
+        GRAPH_PIPELINE_MODE="dual_llm", PREFETCH_VARIANTS_ENABLED="false",
+        FIREBASE_SERVICE_ACCOUNT_KEY="", TRACING_EXPORTER="", PROFILING_SAMPLE_EVERY="0",
+        LLM_CASSETTE_MODE="")
+    if args.cassette:
+        env.update(LLM_CASSETTE_MODE="replay", LLM_CASSETTE_PATH=os.path.abspath(args.cassette),
+                   LLM_CASSETTE_REPLAY_LATENCY=args.replay_latency)
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+         "--firestore-latency-ms", str(args.firestore_latency_ms),
+         "--firestore-jitter-ms", str(args.firestore_jitter_ms)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(base_url, server)
+        results = asyncio.run(drive_load(base_url, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        llm_server.stop()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    print_results(results, previous)
+
+    results["_commit"] = commit = git_commit()
+    results["_timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    results["_config"] = {key: value for key, value in vars(args).items()
+                          if key not in ("serve", "port", "output", "compare")}
+    results["_llm_requests"] = llm_server.requests
+
+    output = args.output or os.path.join(
+        BACKEND_DIR, "benchmarks", "results", "load_test-{}.json".format(commit or time.strftime("%Y%m%d-%H%M%S")))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Benchmark the CPU cost of serializing goal graph responses.
+
+Compares FastAPI's default path (response_model validation plus
+jsonable_encoder and json.dumps) with the trusted orjson path used by the
+goal routes, for graphs of 10, 100 and 1,000 nodes.
+
+Usage:
+    python benchmarks/serialization_benchmark.py [--requests 200]
+"""
+import os
+import sys
+import time
+import argparse
+
+# Add the backend directory to the path so Python can find the app module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.responses import trusted_response  # noqa: E402
+from app.models import GoalGraphResponse  # noqa: E402
+
+GRAPH_SIZES = [10, 100, 1000]
+
+
+def build_graph(node_count):
+    """Build a goal graph payload with the given number of nodes."""
+    nodes = [{
+        "id": "0",
+        "label": "Main goal",
+        "parent_id": None,
+        "description": "The goal that is broken down into subgoals"
+    }]
+    for i in range(1, node_count):
+        nodes.append({
+            "id": str(i),
+            "label": f"Subgoal {i}",
+            "parent_id": str((i - 1) // 3),
+            "description": f"A detailed description of what subgoal {i} involves"
+        })
+    return {"nodes": nodes, "saved": True, "graph_id": "benchmark", "pipeline": "dual_llm"}
+
+
+def build_app(payloads):
+    """Build an app that serves the payloads through both serialization paths."""
+    app = FastAPI()
+
+    @app.get("/before/{size}", response_model=GoalGraphResponse)
+    async def before(size: int):
+        return payloads[size]
+
+    @app.get("/after/{size}", response_model=GoalGraphResponse)
+    async def after(size: int):
+        return trusted_response(payloads[size])
+
+    return app
+
+
+def measure(client, path, requests):
+    """Return the CPU milliseconds per request for a path."""
+    client.get(path)  # Warm up
+    start = time.process_time()
+    for _ in range(requests):
+        response = client.get(path)
+        assert response.status_code == 200
+    return (time.process_time() - start) * 1000 / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per graph size and path")
+    args = parser.parse_args()
+
+    payloads = {size: build_graph(size) for size in GRAPH_SIZES}
+    client = TestClient(build_app(payloads))
+
+    print(f"{'nodes':>6} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for size in GRAPH_SIZES:
+        before = measure(client, f"/before/{size}", args.requests)
+        after = measure(client, f"/after/{size}", args.requests)
+        print(f"{size:>6} {before:>10.3f} {after:>10.3f} {before / after:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Production entry point: several uvicorn worker processes managed by gunicorn.
+
+- WEB_CONCURRENCY sets the number of workers (default: one per CPU core).
+- Workers finish their in-flight requests within GRACEFUL_TIMEOUT_SECONDS on
+  shutdown; `kill -HUP <master pid>` restarts them one after another without
+  dropping the listening socket.
+- PRELOAD_APP imports the app once in the master before forking, so workers
+  share its memory and start faster (a HUP then does not load new code).
+- Workers are recycled after MAX_REQUESTS_PER_WORKER requests.
+- The LLM caches are shared by all workers through a SQLite file
+  (SHARED_CACHE_PATH, defaulting to a file in the temp directory).
+
+gunicorn is not available on Windows; there the workers are run by uvicorn's
+own process manager, without graceful restarts.
+
+Usage:
+    python serve.py
+"""
+import os
+import sys
+import tempfile
+import multiprocessing
+
+from dotenv import load_dotenv
+
+# Add the current directory to the path so Python can find the app module
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Load environment variables
+load_dotenv()
+
+# Share the caches between the workers unless configured otherwise.
+# This must happen before the settings are loaded.
+os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(
+    tempfile.gettempdir(), "graphedgoal", "shared_cache.sqlite3"))
+
+from app.core.config import settings  # noqa: E402
+
+
+def worker_count():
+    """Return the number of worker processes to run."""
+    return settings.WEB_CONCURRENCY or multiprocessing.cpu_count()
+
+
+def gunicorn_options():
+    """Build the gunicorn configuration from the settings."""
+    return {
+        "bind": f"{settings.HOST}:{settings.PORT}",
+        "workers": worker_count(),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": settings.PRELOAD_APP,
+        "graceful_timeout": settings.GRACEFUL_TIMEOUT_SECONDS,
+        # A worker that does not report for this long is restarted
+        "timeout": settings.GRACEFUL_TIMEOUT_SECONDS + 30,
+        "keepalive": 5,
+        "max_requests": settings.MAX_REQUESTS_PER_WORKER,
+        "max_requests_jitter": settings.MAX_REQUESTS_PER_WORKER // 10,
+        "accesslog": "-",
+    }
+
+
+def run_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options().items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    Application().run()
+
+
+def run_uvicorn():
+    import uvicorn
+
+    uvicorn.run("app.main:app", host=settings.HOST, port=settings.PORT,
+                workers=worker_count(), timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT_SECONDS)
+
+
+if __name__ == "__main__":
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("Warning: gunicorn is not installed, running the workers with uvicorn without graceful restarts.")
+        run_uvicorn()
+    else:
+        run_gunicorn()
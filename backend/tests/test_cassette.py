@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from openai.types.chat import ChatCompletion  # noqa: E402
+from app.services import cassette, goal_analysis_service  # noqa: E402
+
+NODES = [{"id": "0", "label": "Learn guitar", "parent_id": None, "description": "The goal"},
+         {"id": "1", "label": "Buy a guitar", "parent_id": "0", "description": "Pick one"}]
+
+
+def _completion():
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 1, "model": "o3-mini",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": json.dumps({"nodes": NODES})}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}})
+
+
+def _offline():
+    raise AssertionError("Replay must not call the provider")
+
+
+def _use_cassette(tmp_path, mode):
+    return [patch.object(cassette.settings, "LLM_CASSETTE_MODE", mode),
+            patch.object(cassette.settings, "LLM_CASSETTE_PATH", str(tmp_path / "llm.jsonl")),
+            patch.object(cassette.settings, "LLM_CASSETTE_REPLAY_LATENCY", "zero")]
+
+
+def _run(patches, func, *args):
+    for p in patches:
+        p.start()
+    try:
+        return func(*args)
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def test_openai_call_is_replayed_offline(tmp_path):
+    """A recorded o3-mini call is answered from the cassette without the client."""
+    with patch.object(goal_analysis_service, "get_openai_client") as mock_client:
+        mock_client.return_value.chat.completions.create.return_value = _completion()
+        recorded = _run(_use_cassette(tmp_path, "record"),
+                        goal_analysis_service.create_graph_from_actions, "Learn guitar", ["Buy a guitar"])
+
+    with patch.object(goal_analysis_service, "get_openai_client", _offline):
+        replayed = _run(_use_cassette(tmp_path, "replay"),
+                        goal_analysis_service.create_graph_from_actions, "Learn guitar", ["Buy a guitar"])
+
+    assert replayed == recorded
+    entry = json.loads((tmp_path / "llm.jsonl").read_text())
+    assert entry["provider"] == "openai" and entry["latency_ms"] >= 0
+
+
+def test_gemini_call_is_replayed_and_unknown_requests_fail(tmp_path):
+    """Gemini responses are replayed by fingerprint; an unrecorded prompt is an error."""
+    response = SimpleNamespace(text="1. Buy a guitar\n2. Learn chords",
+                               usage_metadata=SimpleNamespace(prompt_token_count=5, candidates_token_count=7))
+    with patch.object(goal_analysis_service, "get_gemini_model") as mock_model:
+        mock_model.return_value.generate_content.return_value = response
+        recorded = _run(_use_cassette(tmp_path, "record"),
+                        goal_analysis_service.analyze_goal_for_actions, "Learn guitar")
+
+    with patch.object(goal_analysis_service, "get_gemini_model", _offline):
+        replayed = _run(_use_cassette(tmp_path, "replay"),
+                        goal_analysis_service.analyze_goal_for_actions, "Learn guitar")
+        with pytest.raises(ValueError):
+            _run(_use_cassette(tmp_path, "replay"),
+                 goal_analysis_service.analyze_goal_for_actions, "Run a marathon")
+
+    assert replayed == recorded == ["Buy a guitar", "Learn chords"]
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import description_service, goal_analysis_service  # noqa: E402
+from app.services.llm_json import parse_descriptions  # noqa: E402
+
+client = TestClient(app)
+
+LABEL_NODES = [
+    {"id": "0", "label": "Learn guitar", "parent_id": None, "description": None},
+    {"id": "1", "label": "Buy a guitar", "parent_id": "0", "description": "Pick an acoustic one"},
+    {"id": "2", "label": "Learn chords", "parent_id": "0", "description": None},
+]
+GRAPH = {"id": "graph-1", "goal": "Learn guitar", "user_id": "user-1", "nodes": LABEL_NODES}
+
+
+def _openai_client(content):
+    """A stand-in OpenAI client answering every chat completion with the given content."""
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+    openai_client = MagicMock()
+    openai_client.chat.completions.create.return_value = response
+    return openai_client
+
+
+@patch.object(goal_analysis_service.settings, "NODE_DESCRIPTIONS_MODE", "background")
+def test_labels_first_structuring_asks_for_no_descriptions():
+    """Labels-first structuring uses the schema without descriptions and a smaller output budget."""
+    content = json.dumps({"nodes": [{"id": "0", "label": "Learn guitar", "parent_id": None}]})
+    openai_client = _openai_client(content)
+
+    with patch.object(goal_analysis_service, "get_openai_client", return_value=openai_client):
+        nodes = goal_analysis_service.create_graph_from_actions("Learn guitar", ["Buy a guitar"])
+
+    request = openai_client.chat.completions.create.call_args.kwargs
+    node_schema = request["response_format"]["json_schema"]["schema"]["properties"]["nodes"]["items"]
+    assert "description" not in node_schema["properties"]
+    assert request["extra_body"]["max_completion_tokens"] < goal_analysis_service.output_token_budget(
+        goal_analysis_service.MAX_GRAPH_NODES, reasoning=True)
+    assert nodes == [{"id": "0", "label": "Learn guitar", "parent_id": None, "description": None}]
+
+
+def test_missing_descriptions_are_filled_in_one_batch():
+    """Only nodes without a description are sent, in a single call, and the result is stored."""
+    content = json.dumps({"descriptions": [{"id": "0", "description": "Play songs"},
+                                           {"id": "2", "description": "Practice open chords"}]})
+    openai_client = _openai_client(content)
+    stored = [dict(node) for node in LABEL_NODES]
+
+    with patch.object(description_service, "get_goal_graph_by_id", return_value=GRAPH), \
+            patch.object(description_service, "get_openai_client", return_value=openai_client), \
+            patch.object(description_service, "set_node_descriptions", return_value=stored) as mock_set:
+        nodes = description_service.fill_missing_descriptions("graph-1")
+
+    prompt = openai_client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+    assert "2: Learn guitar > Learn chords" in prompt
+    assert "Buy a guitar" not in prompt
+    openai_client.chat.completions.create.assert_called_once()
+    mock_set.assert_called_once_with("graph-1", {"0": "Play songs", "2": "Practice open chords"})
+    assert nodes == stored
+
+
+@patch("app.api.routes.goals.get_goal_graph_by_id", return_value=GRAPH)
+def test_description_endpoint(mock_get):
+    """A stored description is returned as is, a missing one is generated for the whole graph."""
+    filled = [dict(node, description=node["description"] or "Practice open chords") for node in LABEL_NODES]
+
+    with patch("app.api.routes.goals.fill_missing_descriptions", return_value=filled) as mock_fill:
+        stored = client.get("/api/v1/goals/graph-1/nodes/1/description")
+        mock_fill.assert_not_called()
+        generated = client.get("/api/v1/goals/graph-1/nodes/2/description")
+        missing = client.get("/api/v1/goals/graph-1/nodes/9/description")
+
+    assert stored.json()["description"] == "Pick an acoustic one"
+    assert generated.json() == {"graph_id": "graph-1", "node_id": "2", "description": "Practice open chords"}
+    mock_fill.assert_called_once_with("graph-1")
+    assert missing.status_code == 404
+
+
+@patch.object(description_service.settings, "NODE_DESCRIPTIONS_MODE", "background")
+def test_background_fill_is_scheduled_for_undescribed_graphs():
+    """Only labels-first graphs with undescribed nodes get a background call."""
+    with patch.object(description_service, "submit_background_task") as mock_submit:
+        assert description_service.schedule_description_fill("graph-1", LABEL_NODES)
+        assert not description_service.schedule_description_fill("graph-2", LABEL_NODES[1:2])
+
+    mock_submit.assert_called_once()
+
+
+def test_parse_descriptions_skips_incomplete_items():
+    """Items without an ID or a text are ignored."""
+    content = '{"descriptions": [{"id": "1", "description": " Tune it "}, {"id": "2"}, {"description": "x"}]}'
+
+    assert parse_descriptions(content) == {"1": "Tune it"}
@@ -0,0 +1,52 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from app.core.metrics import GOAL_ROUTING, TIER_LATENCY  # noqa: E402
+from app.services import goal_analysis_service  # noqa: E402
+from app.utils import classify_goal, detect_language  # noqa: E402
+
+NODES = [{"id": "0", "label": "Goal", "parent_id": None}]
+
+
+@pytest.mark.parametrize("goal, tier", [
+    ("Drink more water", "simple"),
+    ("Read a book", "simple"),
+    ("Pić więcej wody", "simple"),
+    ("Launch a SaaS business", "complex"),
+    ("Learn to play the guitar in 6 months", "complex"),
+    ("Get fit, eat healthier and lose 10 kg before summer", "complex"),
+    ("Nauczyć się języka hiszpańskiego w 6 miesięcy", "complex"),
+    ("Założyć własny biznes online sprzedający ręcznie robioną biżuterię", "complex"),
+])
+def test_classify_goal(goal, tier):
+    """Habits and chores are simple, projects with several requirements are complex."""
+    assert classify_goal(goal, 1.0)["tier"] == tier
+
+
+def test_detect_language():
+    """Polish is recognized by its letters or stopwords."""
+    assert detect_language("Przygotować się do maratonu") == "pl"
+    assert detect_language("Zrobic prawo jazdy w tym roku i kupic auto") == "pl"
+    assert detect_language("Prepare for a marathon") == "en"
+
+
+@patch.object(goal_analysis_service.settings, "SIMPLE_GOAL_MODEL", "fast-model")
+def test_auto_mode_routes_by_tier():
+    """Simple goals take a single call with the fast model, complex goals the dual LLM pipeline."""
+    simple_before = GOAL_ROUTING.get(tier="simple", language="en")
+    latency_before = TIER_LATENCY.get_count(tier="complex")
+
+    with patch.object(goal_analysis_service, "generate_goal_breakdown", return_value=NODES) as mock_single, \
+            patch.object(goal_analysis_service, "process_goal_with_dual_llm", return_value=NODES) as mock_dual:
+        simple = goal_analysis_service.process_goal_with_pipeline("Drink more water", "auto")
+        complex_ = goal_analysis_service.process_goal_with_pipeline("Launch a SaaS business", "auto", "key")
+
+    assert simple == (NODES, "single_call")
+    assert complex_ == (NODES, "dual_llm")
+    mock_single.assert_called_once_with("Drink more water", "fast-model")
+    mock_dual.assert_called_once_with("Launch a SaaS business", "key")
+    assert GOAL_ROUTING.get(tier="simple", language="en") == simple_before + 1
+    assert TIER_LATENCY.get_count(tier="complex") == latency_before + 1
@@ -0,0 +1,76 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from app.db import firebase, graph_cache  # noqa: E402
+from benchmarks.fakes import InMemoryFirestore, graph_nodes  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    db = InMemoryFirestore(latency_ms=0, jitter_ms=0)
+    with patch.object(firebase, "_db", db), \
+            patch.object(graph_cache.settings, "GRAPH_CACHE_ENABLED", True), \
+            patch.object(graph_cache.settings, "GRAPH_CACHE_MAX_LISTENERS", 2):
+        yield db
+        graph_cache.clear_graph_cache()
+
+
+def test_cached_graph_follows_changes_of_other_workers(db):
+    """Repeated reads come from memory, and changes made elsewhere reach the cache."""
+    firebase.save_goal_graph("user-1", "Learn guitar", graph_nodes(3), "graph-1")
+    assert firebase.get_goal_graph_by_id("graph-1")["goal"] == "Learn guitar"
+
+    other_worker = db.collection("goal_graphs").document("graph-1")
+    served_from_memory = patch.object(db, "_read", side_effect=AssertionError("read from Firestore"))
+    with served_from_memory:
+        assert firebase.get_goal_graph_by_id("graph-1")["goal"] == "Learn guitar"
+    other_worker.update({"goal": "Learn bass"})
+    with served_from_memory:
+        assert firebase.get_goal_graph_by_id("graph-1")["goal"] == "Learn bass"
+    other_worker.delete()
+    with served_from_memory:
+        assert firebase.get_goal_graph_by_id("graph-1") is None
+
+
+def test_own_writes_are_read_back(db):
+    """A graph updated by this worker is never served in its old version."""
+    firebase.save_goal_graph("user-1", "Learn guitar", graph_nodes(3), "graph-1")
+    firebase.get_goal_graph_by_id("graph-1")
+
+    firebase.update_goal_graph("graph-1", nodes=graph_nodes(5))
+
+    assert len(firebase.get_goal_graph_by_id("graph-1")["nodes"]) == 5
+
+
+def test_least_recently_read_graph_loses_its_listener(db):
+    """The number of listeners stays bounded; the oldest graph is read from Firestore again."""
+    for graph_id in ("graph-1", "graph-2", "graph-3"):
+        firebase.save_goal_graph("user-1", graph_id, graph_nodes(2), graph_id)
+    before = graph_cache.GRAPH_CACHE_LISTENERS.get()
+
+    firebase.get_goal_graph_by_id("graph-1")
+    firebase.get_goal_graph_by_id("graph-2")
+    firebase.get_goal_graph_by_id("graph-1")
+    firebase.get_goal_graph_by_id("graph-3")
+
+    assert not db._listeners[("goal_graphs", "graph-2")]
+    assert len(db._listeners[("goal_graphs", "graph-1")]) == 1
+    assert graph_cache.GRAPH_CACHE_LISTENERS.get() == before + 2
+    assert graph_cache.get_cached_graph("graph-2") == (False, None)
+
+
+def test_read_overtaken_by_a_local_write_is_not_cached(db):
+    """A read that started before a write finished after it must not fill the cache."""
+    firebase.save_goal_graph("user-1", "Learn guitar", graph_nodes(3), "graph-1")
+    generation = graph_cache.cache_generation("graph-1")
+    doc_ref = db.collection("goal_graphs").document("graph-1")
+    stale = doc_ref.get().to_dict()
+
+    firebase.update_goal_graph("graph-1", goal="Learn bass")
+    graph_cache.cache_graph("graph-1", doc_ref, stale, generation)
+
+    assert graph_cache.get_cached_graph("graph-1") == (False, None)
+    assert firebase.get_goal_graph_by_id("graph-1")["goal"] == "Learn bass"
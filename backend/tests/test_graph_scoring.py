@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+from unittest.mock import patch, MagicMock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.graph_scoring import score_graph, rank_graphs  # noqa: E402
+
+
+def _node(node_id, parent_id, label=None):
+    return {"id": node_id, "label": label or f"Step {node_id}", "parent_id": parent_id}
+
+
+def _balanced_graph():
+    nodes = [_node("0", None)]
+    for branch in range(1, 4):
+        nodes.append(_node(str(branch), "0"))
+        nodes.append(_node(f"{branch}a", str(branch)))
+        nodes.append(_node(f"{branch}b", str(branch)))
+    return nodes
+
+
+def _flat_graph():
+    return [_node("0", None)] + [_node(str(i), "0") for i in range(1, 4)]
+
+
+def test_invalid_tree_scores_lowest():
+    """Cycles, orphans and multiple roots are rejected."""
+    assert score_graph([_node("0", None), _node("1", "missing")]) == float("-inf")
+    assert score_graph([_node("0", None), _node("1", None)]) == float("-inf")
+    assert score_graph([]) == float("-inf")
+
+
+def test_balanced_graph_beats_flat_and_duplicated_graphs():
+    """Depth, node count and unique labels all raise the score."""
+    duplicated = _balanced_graph()
+    for node in duplicated[1:]:
+        node["label"] = "Same step"
+
+    assert score_graph(_balanced_graph()) > score_graph(_flat_graph())
+    assert score_graph(_balanced_graph()) > score_graph(duplicated)
+
+
+def test_rank_graphs_drops_invalid_candidates():
+    """Ranking returns the valid candidates, best first."""
+    invalid = [_node("0", None), _node("1", None)]
+    ranked = rank_graphs([_flat_graph(), invalid, _balanced_graph()])
+
+    assert ranked == [_balanced_graph(), _flat_graph()]
+
+
+@patch("app.core.config.settings.REGENERATE_MODEL", "gpt-4o")
+def test_regenerate_returns_best_candidate_and_caches_alternates():
+    """Multi-candidate regenerate keeps the runner-up for the next call."""
+    from app.services import openai_service
+
+    openai_service.alternate_breakdowns.clear()
+    completion = MagicMock()
+    completion.choices = [
+        MagicMock(message=MagicMock(content=json.dumps({"nodes": _flat_graph()}))),
+        MagicMock(message=MagicMock(content="not json")),
+        MagicMock(message=MagicMock(content=json.dumps({"nodes": _balanced_graph()}))),
+    ]
+
+    with patch.object(openai_service, "get_openai_client") as mock_client:
+        mock_create = mock_client.return_value.chat.completions.create
+        mock_create.return_value = completion
+        best = openai_service.regenerate_goal_breakdown(
+            "Goal", candidates=3, cache_key="graph-1")
+        alternate = openai_service.regenerate_goal_breakdown(
+            "Goal", candidates=3, cache_key="graph-1")
+
+    assert [node["id"] for node in best] == [node["id"] for node in _balanced_graph()]
+    assert [node["id"] for node in alternate] == [node["id"] for node in _flat_graph()]
+    mock_create.assert_called_once()
+    assert mock_create.call_args.kwargs["n"] == 3
+
+
+@patch("app.core.config.settings.REGENERATE_MODEL", "gpt-4o")
+def test_alternates_are_scoped_by_cache_key():
+    """Alternates cached for one graph are not served to another graph with the same goal."""
+    from app.services import openai_service
+
+    openai_service.alternate_breakdowns.clear()
+    completion = MagicMock()
+    completion.choices = [
+        MagicMock(message=MagicMock(content=json.dumps({"nodes": _flat_graph()}))),
+        MagicMock(message=MagicMock(content=json.dumps({"nodes": _balanced_graph()}))),
+    ]
+
+    with patch.object(openai_service, "get_openai_client") as mock_client:
+        mock_create = mock_client.return_value.chat.completions.create
+        mock_create.return_value = completion
+        openai_service.regenerate_goal_breakdown(
+            "Goal", candidates=2, cache_key="graph-1")
+        openai_service.regenerate_goal_breakdown(
+            "Goal", candidates=2, cache_key="graph-2")
+
+    assert mock_create.call_count == 2
+
+
+@patch("app.core.config.settings.REGENERATE_MODEL", "o3-mini")
+def test_reasoning_model_candidates_differ_by_prompt():
+    """o-series candidates get one call each with a different approach, and no temperature."""
+    from app.services import openai_service
+
+    openai_service.alternate_breakdowns.clear()
+    completions = [MagicMock(choices=[MagicMock(message=MagicMock(content=json.dumps({"nodes": graph})))])
+                   for graph in (_flat_graph(), _balanced_graph(), _flat_graph())]
+
+    with patch.object(openai_service, "get_openai_client") as mock_client:
+        mock_create = mock_client.return_value.chat.completions.create
+        mock_create.side_effect = completions
+        best = openai_service.regenerate_goal_breakdown("Goal", candidates=3)
+
+    requests = [call.kwargs for call in mock_create.call_args_list]
+    assert [node["id"] for node in best] == [node["id"] for node in _balanced_graph()]
+    assert len(requests) == 3
+    assert len({request["messages"][-1]["content"] for request in requests}) == 3
+    assert all("temperature" not in request and "n" not in request for request in requests)
+
+
+def test_regenerate_route_uses_ranked_candidates():
+    """With several candidates configured, the regenerate route ranks them."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.api.routes import goals
+
+    graph = {"id": "graph-1", "goal": "Goal", "user_id": "user-1", "nodes": _flat_graph()}
+    with patch.object(goals.settings, "REGENERATE_CANDIDATES", 3), \
+            patch.object(goals, "get_goal_graph_by_id", return_value=graph), \
+            patch.object(goals, "take_prefetched_variant", return_value=None), \
+            patch.object(goals, "schedule_variant_prefetch"), \
+            patch.object(goals, "update_goal_graph", return_value=True), \
+            patch.object(goals, "process_goal_with_pipeline") as mock_pipeline, \
+            patch.object(goals, "regenerate_goal_breakdown",
+                         return_value=_balanced_graph()) as mock_regenerate:
+        response = TestClient(app).post("/api/v1/goals/graph-1/regenerate")
+
+    assert response.status_code == 200
+    assert response.json()["pipeline"] == "ranked_candidates"
+    mock_regenerate.assert_called_once_with("Goal", cache_key="graph-1")
+    mock_pipeline.assert_not_called()
@@ -0,0 +1,56 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.graph_utils import get_ancestor_path, get_descendant_ids, splice_subtree  # noqa: E402
+
+
+def _sample_nodes():
+    return [
+        {"id": "0", "label": "Learn Spanish", "parent_id": None, "description": None},
+        {"id": "1", "label": "Resources", "parent_id": "0", "description": None},
+        {"id": "2", "label": "Schedule", "parent_id": "0", "description": None},
+        {"id": "3", "label": "Buy textbook", "parent_id": "1", "description": None},
+        {"id": "4", "label": "Install app", "parent_id": "3", "description": None},
+    ]
+
+
+def test_get_ancestor_path():
+    """The path runs from the root down to the requested node."""
+    path = get_ancestor_path(_sample_nodes(), "4")
+    assert [node["id"] for node in path] == ["0", "1", "3", "4"]
+    assert get_ancestor_path(_sample_nodes(), "missing") == []
+
+
+def test_get_descendant_ids():
+    """All descendants are collected, but not the node itself."""
+    assert get_descendant_ids(_sample_nodes(), "1") == ["3", "4"]
+    assert get_descendant_ids(_sample_nodes(), "2") == []
+
+
+def test_splice_subtree_replace():
+    """Replacing drops the old branch and remaps the new IDs."""
+    subtree = [
+        {"id": "n1", "label": "Pick a course", "parent_id": None},
+        {"id": "n2", "label": "Enroll", "parent_id": "n1"},
+    ]
+    nodes = splice_subtree(_sample_nodes(), "1", subtree, replace=True)
+
+    ids = [node["id"] for node in nodes]
+    assert len(ids) == len(set(ids))
+    assert not any(node["label"] == "Buy textbook" for node in nodes)
+
+    course = next(node for node in nodes if node["label"] == "Pick a course")
+    enroll = next(node for node in nodes if node["label"] == "Enroll")
+    assert course["parent_id"] == "1"
+    assert enroll["parent_id"] == course["id"]
+
+
+def test_splice_subtree_expand():
+    """Expanding keeps the existing children."""
+    subtree = [{"id": "n1", "label": "Watch videos", "parent_id": None}]
+    nodes = splice_subtree(_sample_nodes(), "1", subtree, replace=False)
+
+    assert len(nodes) == 6
+    assert any(node["label"] == "Buy textbook" for node in nodes)
+    assert next(node for node in nodes if node["label"] == "Watch videos")["parent_id"] == "1"
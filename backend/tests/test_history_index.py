@@ -0,0 +1,63 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import firebase  # noqa: E402
+from benchmarks.fakes import InMemoryFirestore, graph_nodes  # noqa: E402
+
+
+def test_history_index_follows_every_write():
+    """Saves, updates and deletes keep the user's summaries in step with the graphs."""
+    db = InMemoryFirestore(latency_ms=0, jitter_ms=0)
+    with patch.object(firebase, "_db", db):
+        firebase.get_user_goal_graphs("user-1")
+        firebase.save_goal_graph("user-1", "Learn guitar", graph_nodes(3), "graph-1")
+        firebase.save_goal_graph("user-1", "Run a marathon", graph_nodes(5), "graph-2")
+        firebase.update_goal_graph("graph-1", goal="Learn bass", nodes=graph_nodes(4))
+        firebase.delete_goal_graph("graph-2")
+
+        list_documents = db._list
+
+        def list_summaries(path):
+            assert path != ("goal_graphs",), "the history page scanned the graphs"
+            return list_documents(path)
+
+        with patch.object(db, "_list", side_effect=list_summaries):
+            history = firebase.get_user_goal_graphs("user-1")
+
+    assert [(entry["id"], entry["goal"], entry["node_count"]) for entry in history] == [
+        ("graph-1", "Learn bass", 4)]
+    assert history[0]["updated_at"] > history[0]["created_at"]
+    assert "nodes" not in history[0] and "terms" not in history[0]
+
+
+def test_history_index_is_built_for_existing_graphs():
+    """Graphs saved before the user had an index are listed, and the index is stored."""
+    db = InMemoryFirestore(latency_ms=0, jitter_ms=0)
+    with patch.object(firebase, "_db", db):
+        firebase.save_goal_graph("user-1", "Learn guitar", graph_nodes(3), "graph-1")
+        firebase.save_goal_graph("user-1", "Run a marathon", graph_nodes(3), "graph-2")
+        firebase.save_goal_graph("user-2", "Learn Spanish", graph_nodes(3), "graph-3")
+
+        first = firebase.get_user_goal_graphs("user-1")
+        firebase.save_goal_graph("user-1", "Read more", graph_nodes(2), "graph-4")
+        second = firebase.get_user_goal_graphs("user-1")
+
+    assert [entry["id"] for entry in first] == ["graph-2", "graph-1"]
+    assert [entry["id"] for entry in second] == ["graph-4", "graph-2", "graph-1"]
+
+
+def test_history_summaries_are_one_document_per_graph():
+    """No document is written by every save of a user, so busy users do not contend on it."""
+    db = InMemoryFirestore(latency_ms=0, jitter_ms=0)
+    with patch.object(firebase, "_db", db):
+        firebase.get_user_goal_graphs("user-1")
+        marker = db._read(("user_goal_index", "user-1"))
+        for number in range(3):
+            firebase.save_goal_graph("user-1", f"Goal {number}", graph_nodes(2), f"graph-{number}")
+
+        assert db._read(("user_goal_index", "user-1")) == marker
+        summaries = db._list(("user_goal_index", "user-1", "goals"))
+
+    assert sorted(graph_id for graph_id, _ in summaries) == ["graph-0", "graph-1", "graph-2"]
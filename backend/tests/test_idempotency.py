@@ -0,0 +1,90 @@
+import os
+import sys
+import asyncio
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api.routes import goals  # noqa: E402
+from app.utils.idempotency import IdempotencyStore, IdempotencyKeyMismatchError  # noqa: E402
+
+client = TestClient(app)
+
+NODES = [{"id": "0", "label": "Learn guitar",
+          "parent_id": None, "description": None}]
+
+
+def test_concurrent_duplicates_share_one_run():
+    """Concurrent requests with the same key wait for the first one."""
+    store = IdempotencyStore(ttl_seconds=60, wait_timeout_seconds=5)
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"graph_id": "abc"}
+
+    async def run_all():
+        return await asyncio.gather(*[store.run("key", "fp", handler) for _ in range(3)])
+
+    results = asyncio.run(run_all())
+
+    assert len(calls) == 1
+    assert [result for result, _ in results] == [{"graph_id": "abc"}] * 3
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+
+def test_key_reused_with_different_request():
+    """A key cannot be reused for a different request."""
+    store = IdempotencyStore(ttl_seconds=60, wait_timeout_seconds=5)
+
+    async def handler():
+        return {"graph_id": "abc"}
+
+    asyncio.run(store.run("key", "fp", handler))
+    with pytest.raises(IdempotencyKeyMismatchError):
+        asyncio.run(store.run("key", "other", handler))
+
+
+def test_stored_responses_are_replayed_by_other_workers(tmp_path):
+    """With a shared path, a response stored by one worker's store is replayed by another's."""
+    path = str(tmp_path / "shared.sqlite3")
+    first = IdempotencyStore(ttl_seconds=60, wait_timeout_seconds=5, shared_path=path)
+    second = IdempotencyStore(ttl_seconds=60, wait_timeout_seconds=5, shared_path=path)
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return {"graph_id": "abc"}
+
+    asyncio.run(first.run("key", "fp", handler))
+    result, replayed = asyncio.run(second.run("key", "fp", handler))
+
+    assert result == {"graph_id": "abc"}
+    assert replayed
+    assert len(calls) == 1
+
+
+@patch("app.api.routes.goals.save_goal_graph", return_value="graph-1")
+@patch("app.api.routes.goals.process_goal_with_pipeline", return_value=(NODES, "dual_llm"))
+def test_process_goal_replays_response(mock_pipeline, mock_save):
+    """A retried /goals/process request replays the stored response."""
+    goals.idempotency_store.clear()
+    payload = {"goal": "Learn guitar", "user_id": "user-1"}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/api/v1/goals/process", json=payload, headers=headers)
+    second = client.post("/api/v1/goals/process", json=payload, headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers.get("Idempotent-Replayed") == "true"
+    mock_pipeline.assert_called_once()
+    mock_save.assert_called_once()
+
+    conflict = client.post("/api/v1/goals/process",
+                           json={"goal": "Learn piano", "user_id": "user-1"}, headers=headers)
+    assert conflict.status_code == 422
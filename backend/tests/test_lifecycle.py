@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import time
+import threading
+import asyncio
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.core import lifecycle  # noqa: E402
+from app.api.routes import goals  # noqa: E402
+from app.core.metrics import CLIENT_DISCONNECTS  # noqa: E402
+from app.services import goal_analysis_service  # noqa: E402
+
+NODES = [{"id": "0", "label": "Learn guitar",
+          "parent_id": None, "description": None}]
+
+
+def test_cancelled_request_skips_the_remaining_llm_calls():
+    """Once cancelled, the pipeline stops before the next provider call and does not retry."""
+    token = lifecycle.CancellationToken()
+
+    def analyze(goal_text):
+        token.cancel()
+        return ["First"]
+
+    with patch.object(goal_analysis_service, "analyze_goal_for_actions", side_effect=analyze), \
+            patch.object(goal_analysis_service, "get_openai_client") as mock_client, \
+            patch.object(goal_analysis_service.settings, "STRUCTURE_STAGE_MAX_ATTEMPTS", 3):
+        with pytest.raises(lifecycle.OperationCancelledError):
+            lifecycle._run_with_token(token, goal_analysis_service.process_goal_with_dual_llm, "Goal")
+
+    mock_client.assert_not_called()
+
+
+async def _post_and_disconnect(path, payload, disconnected, headers=()):
+    """Send a request straight to the app; the client disconnects once `disconnected` is set."""
+    messages = [{"type": "http.request", "body": json.dumps(payload).encode(), "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "client": ("testclient", 50000),
+        "server": ("testserver", 80), "headers": [(b"content-type", b"application/json"), *headers],
+    }
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+
+@patch("app.api.routes.goals.schedule_variant_prefetch", return_value=0)
+@patch("app.api.routes.goals.save_goal_graph", return_value="graph-1")
+def test_client_disconnect_cancels_the_request(mock_save, mock_schedule):
+    """A client leaving mid-pipeline gets no graph saved, and the disconnect is counted."""
+    async def run():
+        loop = asyncio.get_running_loop()
+        disconnected = asyncio.Event()
+
+        def pipeline(*args):
+            loop.call_soon_threadsafe(disconnected.set)
+            deadline = time.monotonic() + 5
+            while not lifecycle._current_token.get().cancelled and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return NODES, "dual_llm"
+
+        with patch("app.api.routes.goals.process_goal_with_pipeline", side_effect=pipeline):
+            status = await _post_and_disconnect(
+                "/api/v1/goals/process", {"goal": "Learn guitar", "user_id": "user-1"}, disconnected)
+            drained = await lifecycle.drain(5)
+        return status, drained
+
+    before = CLIENT_DISCONNECTS.get(route="/api/v1/goals/process")
+    status, drained = asyncio.run(run())
+
+    assert status == 499
+    assert drained
+    mock_save.assert_not_called()
+    assert CLIENT_DISCONNECTS.get(route="/api/v1/goals/process") == before + 1
+
+
+@patch("app.api.routes.goals.schedule_description_fill", return_value=0)
+@patch("app.api.routes.goals.schedule_variant_prefetch", return_value=0)
+@patch("app.api.routes.goals.save_goal_graph", return_value="graph-1")
+def test_disconnect_does_not_cancel_work_a_retry_waits_for(mock_save, mock_schedule, mock_fill):
+    """With an Idempotency-Key, the first client leaving does not stop the pipeline its retry waits on."""
+    goals.idempotency_store.clear()
+    release = threading.Event()
+    calls = []
+
+    def pipeline(*args):
+        calls.append(args)
+        release.wait(5)
+        return NODES, "dual_llm"
+
+    async def run():
+        disconnected, never = asyncio.Event(), asyncio.Event()
+        payload = {"goal": "Learn guitar", "user_id": "user-1"}
+        headers = [(b"idempotency-key", b"retry-1")]
+        with patch("app.api.routes.goals.process_goal_with_pipeline", side_effect=pipeline):
+            first = asyncio.ensure_future(_post_and_disconnect(
+                "/api/v1/goals/process", payload, disconnected, headers))
+            await asyncio.sleep(0.1)
+            retry = asyncio.ensure_future(_post_and_disconnect(
+                "/api/v1/goals/process", payload, never, headers))
+            await asyncio.sleep(0.1)
+            disconnected.set()
+            first_status = await first
+            release.set()
+            retry_status = await retry
+        return first_status, retry_status
+
+    first_status, retry_status = asyncio.run(run())
+
+    assert first_status == 499
+    assert retry_status == 200
+    assert len(calls) == 1
+    mock_save.assert_called_once()
+
+
+@patch("app.api.routes.goals.schedule_variant_prefetch", return_value=0)
+@patch("app.api.routes.goals.save_goal_graph", side_effect=lambda user_id, goal, nodes, graph_id: graph_id)
+def test_async_job_completes_before_shutdown(mock_save, mock_schedule):
+    """An async job answers at once, and shutdown waits for it to save the graph."""
+    def pipeline(*args):
+        time.sleep(0.2)
+        return NODES, "dual_llm"
+
+    with patch("app.api.routes.goals.process_goal_with_pipeline", side_effect=pipeline):
+        with TestClient(app) as client:
+            response = client.post("/api/v1/goals/process",
+                                   json={"goal": "Learn guitar", "user_id": "user-1", "async_job": True})
+            assert response.status_code == 202
+            assert response.json()["status"] == "pending"
+            mock_save.assert_not_called()
+
+    graph_id = response.json()["graph_id"]
+    mock_save.assert_called_once_with("user-1", "Learn guitar", NODES, graph_id)
+
+
+def test_async_job_needs_a_user():
+    """Without a user the graph of an async job could not be fetched later."""
+    response = TestClient(app).post("/api/v1/goals/process",
+                                    json={"goal": "Learn guitar", "async_job": True})
+
+    assert response.status_code == 400
@@ -0,0 +1,55 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from app.services.llm_json import parse_graph_nodes, repair_json_text, graph_response_format  # noqa: E402
+
+
+def test_parse_strict_json():
+    """Valid JSON is validated and missing optional fields are filled in."""
+    nodes = parse_graph_nodes('{"nodes": [{"id": "0", "label": "Goal", "parent_id": null}]}')
+    assert nodes == [{"id": "0", "label": "Goal", "parent_id": None, "description": None}]
+
+
+def test_parse_repairs_near_json():
+    """Code fences, surrounding prose, trailing commas and numeric IDs are tolerated."""
+    content = """Here is the graph:
+```json
+{
+  "nodes": [
+    {"id": 0, "label": "Goal", "parent_id": null, "description": "Main goal",},
+    {"id": 1, "label": "Step", "parent_id": 0, "description": "First step"},
+  ],
+}
+```
+Let me know if you need anything else."""
+
+    nodes = parse_graph_nodes(content)
+
+    assert [(node["id"], node["parent_id"]) for node in nodes] == [("0", None), ("1", "0")]
+
+
+def test_parse_rejects_invalid_responses():
+    """Empty, non-JSON and invalid node responses raise ValueError."""
+    with pytest.raises(ValueError):
+        parse_graph_nodes("")
+    with pytest.raises(ValueError, match="Invalid JSON format"):
+        parse_graph_nodes("I cannot help with that.")
+    with pytest.raises(ValueError, match="Invalid node structure"):
+        parse_graph_nodes('{"nodes": [{"id": "0"}]}')
+
+
+def test_repair_json_text_keeps_valid_json():
+    """Repair leaves valid JSON untouched."""
+    assert repair_json_text('{"nodes": []}') == '{"nodes": []}'
+
+
+def test_graph_response_format_is_strict():
+    """The structured output schema requires every node field."""
+    response_format = graph_response_format()
+    item_schema = response_format["json_schema"]["schema"]["properties"]["nodes"]["items"]
+
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["strict"] is True
+    assert set(item_schema["required"]) == {"id", "label", "parent_id", "description"}
@@ -0,0 +1,34 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import firebase  # noqa: E402
+from benchmarks.fakes import InMemoryFirestore, graph_nodes  # noqa: E402
+from benchmarks.load_test import percentile, summarize  # noqa: E402
+
+
+def test_firebase_functions_run_against_the_in_memory_fake():
+    """The load test's Firestore stand-in supports every call of app/db/firebase.py it drives."""
+    with patch.object(firebase, "_db", InMemoryFirestore(latency_ms=1, jitter_ms=0)):
+        first = firebase.save_goal_graph("user-1", "Learn guitar", graph_nodes(3), "graph-1")
+        firebase.save_goal_graph("user-1", "Run a marathon", graph_nodes(3), "graph-2")
+        firebase.save_goal_graph("user-2", "Learn Spanish", graph_nodes(3), "graph-3")
+
+        assert first == "graph-1"
+        assert [graph["id"] for graph in firebase.get_user_goal_graphs("user-1")] == ["graph-2", "graph-1"]
+        assert firebase.update_goal_graph("graph-1", goal="Learn bass")
+        assert firebase.get_goal_graph_by_id("graph-1")["goal"] == "Learn bass"
+        assert firebase.delete_goal_graph("graph-1")
+        assert firebase.get_goal_graph_by_id("graph-1") is None
+
+
+def test_summary_percentiles():
+    """Latencies are reported in milliseconds with nearest-rank percentiles."""
+    latencies = [i / 1000 for i in range(1, 101)]
+    stats = summarize(latencies, errors=2, duration=2.0)
+
+    assert percentile(latencies, 0.5) == 0.051
+    assert stats["requests"] == 102
+    assert stats["p99_ms"] == 99.0
+    assert stats["throughput_rps"] == 50.0
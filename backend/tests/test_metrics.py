@@ -0,0 +1,56 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.core import metrics  # noqa: E402
+from app.api.routes import goals  # noqa: E402
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Histogram buckets are cumulative and end with +Inf, sum and count."""
+    histogram = metrics.Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5, stage="a")
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{stage="a"} 5.55' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+
+def test_timed_stage_counts_llm_errors():
+    """A failing stage is timed and counted as an error of its provider."""
+    @metrics.timed_stage("test_stage", provider="test_provider")
+    def failing_stage():
+        raise ValueError("Empty response from LLM")
+
+    with pytest.raises(ValueError):
+        failing_stage()
+
+    assert metrics.LLM_ERRORS.get(provider="test_provider", stage="test_stage") == 1
+    assert metrics.STAGE_LATENCY.get_count(stage="test_stage") == 1
+
+
+def test_metrics_endpoint_reports_route_templates():
+    """Requests are labelled with their route template, not the raw path."""
+    with patch.object(goals, "get_goal_graph_by_id", return_value=None):
+        client.get("/api/v1/goals/graph-123")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/v1/goals/{graph_id}",status="404"' in response.text
+    assert "graph-123" not in response.text
+    assert "# TYPE http_requests_in_flight gauge" in response.text
+    assert "# TYPE llm_tokens_total counter" in response.text
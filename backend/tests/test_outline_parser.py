@@ -0,0 +1,85 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from app.utils.outline_parser import parse_outline, outline_to_actions  # noqa: E402
+
+
+def test_parse_numbered_outline():
+    """Outline numbering decides the parent of every node."""
+    outline = """
+    **1. Find resources**: Gather books and apps
+    1.1 Buy a textbook - pick one for beginners
+    1.2 Install a language app
+    2. Practice daily
+    2.1 Speak for 15 minutes
+    """
+    nodes = parse_outline("Learn Spanish", outline)
+
+    assert nodes[0] == {"id": "0", "label": "Learn Spanish",
+                        "parent_id": None, "description": None}
+    assert [(node["label"], node["parent_id"]) for node in nodes[1:]] == [
+        ("Find resources", "0"),
+        ("Buy a textbook", "1"),
+        ("Install a language app", "1"),
+        ("Practice daily", "0"),
+        ("Speak for 15 minutes", "4"),
+    ]
+    assert nodes[1]["description"] == "Gather books and apps"
+
+
+def test_parse_indented_outline():
+    """Bullets are nested by their indentation."""
+    outline = "Plan:\n- Train\n  - Run 5 km\n    - Buy shoes\n  - Stretch\n- Rest"
+    nodes = parse_outline("Marathon", outline)
+
+    assert [(node["label"], node["parent_id"]) for node in nodes[1:]] == [
+        ("Train", "0"),
+        ("Run 5 km", "1"),
+        ("Buy shoes", "2"),
+        ("Stretch", "1"),
+        ("Rest", "0"),
+    ]
+
+
+def test_parse_outline_rejects_invalid_outline():
+    """Skipped levels and prose without items cannot be parsed."""
+    with pytest.raises(ValueError):
+        parse_outline("Goal", "1. First\n1.1.1 Too deep")
+    with pytest.raises(ValueError):
+        parse_outline("Goal", "Sorry, I cannot help with that.")
+
+
+def test_numbering_decides_the_parent():
+    """An item whose parent number is missing is rejected, not attached to the previous item."""
+    with pytest.raises(ValueError):
+        parse_outline("Goal", "1. First\n1.1 Step\n2.1 Orphan")
+
+    nodes = parse_outline("Goal", "1. First\n2. Second\n1.1 Late step\n2.1 Step")
+    assert [node["parent_id"] for node in nodes[1:]] == ["0", "0", "1", "2"]
+
+
+def test_outline_to_actions():
+    """Flattening strips the list markers."""
+    assert outline_to_actions("1. First\n1.1 Second\n- Third") == [
+        "First", "Second", "Third"]
+
+
+def test_pipeline_falls_back_to_llm_structuring():
+    """An unparseable outline is structured by the second LLM call."""
+    from app.services import goal_analysis_service
+
+    fallback_nodes = [
+        {"id": "0", "label": "Goal", "parent_id": None},
+        {"id": "1", "label": "First", "parent_id": "0"},
+    ]
+    with patch.object(goal_analysis_service, "analyze_goal_for_outline", return_value="1. First\n1.1.1 Deep"), \
+            patch.object(goal_analysis_service, "create_graph_from_actions", return_value=fallback_nodes) as mock_create:
+        nodes, pipeline = goal_analysis_service.process_goal_with_pipeline(
+            "Goal", "local_outline")
+
+    assert pipeline == "local_outline_fallback"
+    assert len(nodes) == 2
+    mock_create.assert_called_once_with("Goal", ["First", "Deep"])
@@ -0,0 +1,55 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import prefetch_service  # noqa: E402
+
+client = TestClient(app)
+
+NODES = [{"id": "0", "label": "Learn guitar",
+          "parent_id": None, "description": None}]
+GRAPH = {"id": "graph-1", "goal": "Learn guitar",
+         "user_id": "user-1", "nodes": NODES}
+
+
+@patch.object(prefetch_service.settings, "PREFETCH_VARIANTS_ENABLED", True)
+@patch.object(prefetch_service.settings, "PREFETCH_MAX_RUNS_PER_HOUR", 2)
+def test_schedule_respects_budget():
+    """Prefetch runs beyond the hourly budget are skipped."""
+    prefetch_service._recent_runs.clear()
+
+    with patch.object(prefetch_service, "process_goal_with_pipeline", return_value=(NODES, "dual_llm")), \
+            patch.object(prefetch_service, "add_goal_graph_variant", return_value="variant-1") as mock_add:
+        scheduled = prefetch_service.schedule_variant_prefetch(
+            "graph-1", "Learn guitar", count=3)
+        prefetch_service._executor.submit(lambda: None).result()
+
+    assert scheduled == 2
+    assert mock_add.call_count == 2
+    assert prefetch_service.get_prefetch_stats()["budget_remaining"] == 0
+
+
+@patch.object(prefetch_service.settings, "PREFETCH_VARIANTS_ENABLED", True)
+@patch("app.api.routes.goals.schedule_variant_prefetch", return_value=1)
+@patch("app.api.routes.goals.update_goal_graph", return_value=True)
+@patch("app.api.routes.goals.get_goal_graph_by_id", return_value=GRAPH)
+@patch("app.api.routes.goals.process_goal_with_pipeline")
+def test_regenerate_swaps_in_prefetched_variant(mock_pipeline, mock_get, mock_update, mock_schedule):
+    """Regenerate uses a ready variant instead of calling the LLMs and refills the pool."""
+    variant_nodes = [{"id": "0", "label": "Play guitar",
+                      "parent_id": None, "description": None}]
+    variant = {"goal": "Learn guitar",
+               "nodes": variant_nodes, "pipeline": "dual_llm"}
+
+    with patch.object(prefetch_service, "pop_goal_graph_variant", return_value=variant):
+        hits_before = prefetch_service.get_prefetch_stats()["hits"]
+        response = client.post("/api/v1/goals/graph-1/regenerate")
+
+    assert response.status_code == 200
+    assert response.json()["nodes"] == variant_nodes
+    mock_pipeline.assert_not_called()
+    mock_schedule.assert_called_once_with("graph-1", "Learn guitar", count=1)
+    assert prefetch_service.get_prefetch_stats()["hits"] == hits_before + 1
@@ -0,0 +1,58 @@
+import os
+import sys
+import pstats
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.core import profiling  # noqa: E402
+from app.api.routes import goals  # noqa: E402
+
+client = TestClient(app)
+
+NODES = [{"id": "0", "label": "Learn guitar", "parent_id": None, "description": None}]
+
+
+def _process(*args, **kwargs):
+    return NODES, "dual_llm"
+
+
+def test_profile_requires_admin_token(tmp_path):
+    """The profile flag is ignored without the admin token."""
+    with patch.object(profiling.settings, "PROFILING_ADMIN_TOKEN", "secret"), \
+            patch.object(profiling.settings, "PROFILING_DIR", str(tmp_path)), \
+            patch.object(goals, "process_goal_with_pipeline", _process):
+        response = client.post("/api/v1/goals/process?profile=1", json={"goal": "Learn guitar"},
+                               headers={"X-Admin-Token": "wrong"})
+
+    assert response.status_code == 200
+    assert "x-profile-file" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+
+def test_profile_includes_threadpool_work(tmp_path):
+    """An admin-requested profile contains the route helper run in the threadpool."""
+    with patch.object(profiling.settings, "PROFILING_ADMIN_TOKEN", "secret"), \
+            patch.object(profiling.settings, "PROFILING_DIR", str(tmp_path)), \
+            patch.object(goals, "process_goal_with_pipeline", _process):
+        response = client.post("/api/v1/goals/process", json={"goal": "Learn guitar"},
+                               headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+
+    profile_path = os.path.join(tmp_path, response.headers["x-profile-file"])
+    functions = {name for _, _, name in pstats.Stats(profile_path).stats}
+
+    assert response.status_code == 200
+    assert "_process_goal" in functions
+
+
+def test_sampled_mode_profiles_one_in_n(tmp_path):
+    """The sampled mode profiles every Nth goal API request."""
+    with patch.object(profiling.settings, "PROFILING_SAMPLE_EVERY", 2), \
+            patch.object(profiling.settings, "PROFILING_DIR", str(tmp_path)), \
+            patch.object(profiling, "_request_counter", iter(range(1, 100))), \
+            patch.object(goals, "get_goal_graph_by_id", return_value=None):
+        for _ in range(4):
+            client.get("/api/v1/goals/graph-1")
+
+    assert len(os.listdir(tmp_path)) == 2
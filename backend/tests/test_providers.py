@@ -0,0 +1,58 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import providers  # noqa: E402
+
+
+def setup_function():
+    providers.close_providers()
+
+
+def teardown_function():
+    providers.close_providers()
+
+
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"})
+@patch.object(providers.settings, "LLM_HTTP_MAX_CONNECTIONS", 7)
+@patch.object(providers.settings, "LLM_HTTP_CONNECT_TIMEOUT_SECONDS", 3.0)
+def test_openai_client_is_shared_and_uses_tuned_pool():
+    """The OpenAI client is created once, with the pool limits and timeouts from settings"""
+    client = providers.get_openai_client()
+
+    assert providers.get_openai_client() is client
+    http_client = client._client
+    assert http_client.timeout.connect == 3.0
+    assert http_client._transport._pool._max_connections == 7
+
+
+@patch.dict(os.environ, {"GOOGLE_GEMINI_API_KEY": "test-key"})
+def test_gemini_model_handle_is_reused_per_model():
+    """One GenerativeModel handle is kept per model name"""
+    model = providers.get_gemini_model("gemini-2.0-flash")
+
+    assert providers.get_gemini_model("gemini-2.0-flash") is model
+    assert providers.get_gemini_model("gemini-1.5-pro") is not model
+
+
+def test_close_providers_closes_http_pools():
+    """Closing the registry closes the clients so the next call creates new ones"""
+    with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+        client = providers.get_openai_client()
+        providers.close_providers()
+
+        assert client._client.is_closed
+        assert providers.get_openai_client() is not client
+
+
+def test_warm_up_skips_missing_keys_and_sdks():
+    """Warm-up never raises for a provider without a key or an installed SDK"""
+    def missing_sdk():
+        raise ImportError("No module named 'google.generativeai'")
+
+    with patch.dict(os.environ, {"OPENAI_API_KEY": ""}), \
+            patch.object(providers, "get_gemini_model", missing_sdk):
+        providers.warm_up_providers()
+
+    assert "openai" not in providers._clients
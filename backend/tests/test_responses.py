@@ -0,0 +1,26 @@
+import os
+import sys
+import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson  # noqa: E402
+from app.core.responses import trusted_response  # noqa: E402
+from app.models import SubgoalNode  # noqa: E402
+
+
+class _Timestamp(datetime.datetime):
+    """Stand-in for Firestore's DatetimeWithNanoseconds."""
+
+
+def test_trusted_response_serializes_firestore_values():
+    """Datetime subclasses and Pydantic models are rendered by orjson."""
+    created_at = _Timestamp(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    response = trusted_response(
+        {"created_at": created_at, "nodes": [SubgoalNode(id="0", label="Goal")]},
+        headers={"Idempotent-Replayed": "true"})
+
+    body = orjson.loads(response.body)
+
+    assert body["created_at"] == "2024-01-01T00:00:00+00:00"
+    assert body["nodes"][0] == {"id": "0", "label": "Goal", "parent_id": None, "description": None}
+    assert response.headers["Idempotent-Replayed"] == "true"
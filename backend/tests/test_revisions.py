@@ -0,0 +1,95 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.db import firebase  # noqa: E402
+from app.utils import diff_nodes, apply_delta  # noqa: E402
+from benchmarks.fakes import InMemoryFirestore, graph_nodes  # noqa: E402
+
+client = TestClient(app)
+
+
+def test_delta_round_trip():
+    """A delta holds only the edit, and replaying it gives the new nodes back."""
+    old = graph_nodes(6)
+    new = [dict(node) for node in old if node["id"] != "5"]
+    new[1]["label"] = "Practice daily"
+    new[2]["parent_id"] = "1"
+    new.append({"id": "9", "label": "Play a concert", "parent_id": "0", "description": None})
+
+    delta = diff_nodes(old, new)
+
+    assert delta == {
+        "added": [new[-1]],
+        "removed": ["5"],
+        "changed": {"1": {"label": "Practice daily"}},
+        "reparented": {"2": "1"},
+    }
+    assert apply_delta(old, delta) == new
+    reordered = list(reversed(new))
+    assert apply_delta(old, diff_nodes(old, reordered)) == reordered
+
+
+@pytest.fixture
+def db():
+    db = InMemoryFirestore(latency_ms=0, jitter_ms=0)
+    with patch.object(firebase, "_db", db), \
+            patch.object(firebase.settings, "REVISION_SNAPSHOT_INTERVAL", 3):
+        yield db
+
+
+def test_every_write_is_logged_as_a_small_delta(db):
+    """Edits are stored as deltas with periodic snapshots, and every revision can be rebuilt."""
+    versions = [graph_nodes(12)]
+    firebase.save_goal_graph("user-1", "Learn guitar", versions[0], "graph-1")
+    for i in range(1, 6):
+        nodes = [dict(node) for node in versions[-1]]
+        nodes[i]["label"] = f"Edited step {i}"
+        versions.append(nodes)
+        firebase.update_goal_graph("graph-1", nodes=nodes)
+
+    revisions = firebase.get_goal_graph_revisions("graph-1")
+    stored = {key[-1]: data for key, data in db._documents.items() if "revisions" in key}
+
+    assert [revision["kind"] for revision in revisions] == [
+        "snapshot", "delta", "delta", "snapshot", "delta", "delta"]
+    assert revisions[2]["stats"] == {"added": 0, "removed": 0, "changed": 1, "reparented": 0}
+    assert "nodes" not in stored["00000002"]
+    assert db._documents[("goal_graphs", "graph-1")]["revision"] == 6
+    for number, nodes in enumerate(versions, start=1):
+        assert firebase.get_goal_graph_revision("graph-1", number)["nodes"] == nodes
+    assert firebase.get_goal_graph_revision("graph-1", 7) is None
+
+
+def test_graphs_saved_before_the_log_keep_their_version(db):
+    """The first edit of a graph without revisions logs its stored version first."""
+    db.collection("goal_graphs").document("graph-1").set(
+        {"user_id": "user-1", "goal": "Learn guitar", "nodes": graph_nodes(8)})
+
+    firebase.update_goal_graph("graph-1", goal="Learn bass")
+
+    assert firebase.get_goal_graph_revision("graph-1", 1)["goal"] == "Learn guitar"
+    assert firebase.get_goal_graph_revision("graph-1", 2)["nodes"] == graph_nodes(8)
+
+    firebase.delete_goal_graph("graph-1")
+    assert firebase.get_goal_graph_revisions("graph-1") == []
+
+
+def test_diff_endpoint(db):
+    """The diff of two revisions lists the node changes and the goal change."""
+    firebase.save_goal_graph("user-1", "Learn guitar", graph_nodes(4), "graph-1")
+    nodes = graph_nodes(4)[:3]
+    firebase.update_goal_graph("graph-1", goal="Learn bass", nodes=nodes)
+
+    response = client.get("/api/v1/goals/graph-1/diff", params={"from": 1, "to": 2})
+    revisions = client.get("/api/v1/goals/graph-1/revisions")
+    missing = client.get("/api/v1/goals/graph-1/diff", params={"from": 1, "to": 9})
+
+    assert response.json()["delta"] == {"removed": ["3"]}
+    assert response.json()["goal"] == {"from": "Learn guitar", "to": "Learn bass"}
+    assert [revision["revision"] for revision in revisions.json()] == [1, 2]
+    assert missing.status_code == 404
@@ -0,0 +1,99 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.db import firebase  # noqa: E402
+from app.services import search_service  # noqa: E402
+from app.utils.search_index import BM25Index, analyze, query_terms  # noqa: E402
+from benchmarks.fakes import InMemoryFirestore  # noqa: E402
+
+client = TestClient(app)
+
+
+def _nodes(*labels):
+    return [{"id": str(i), "label": label, "parent_id": None if i == 0 else "0", "description": None}
+            for i, label in enumerate(labels)]
+
+
+@pytest.mark.parametrize("text, query", [
+    ("Nauczyć się gry na gitarze", "gitara"),
+    ("Nauczyć się języka hiszpańskiego", "jezyk hiszpanski"),
+    ("Learn to play the guitar", "playing guitars"),
+])
+def test_inflected_and_unaccented_queries_match(text, query):
+    """Polish and English word forms, and queries typed without Polish letters, find the goal."""
+    index = BM25Index()
+    index.add("graph-1", analyze(text))
+    index.add("graph-2", analyze("Run a marathon"))
+
+    assert [doc_id for doc_id, _ in index.search(query_terms(query))] == ["graph-1"]
+
+
+def test_bm25_prefers_focused_documents():
+    """A short document about the query ranks above a long one mentioning it once."""
+    index = BM25Index()
+    index.add("focused", analyze("Guitar practice: guitar chords and guitar songs"))
+    index.add("broad", analyze("Plan a holiday, learn cooking, buy a guitar, paint the house, read books"))
+    index.remove("missing")
+
+    assert [doc_id for doc_id, _ in index.search(query_terms("guitar"))] == ["focused", "broad"]
+
+
+@pytest.fixture
+def db():
+    db = InMemoryFirestore(latency_ms=0, jitter_ms=0)
+    with patch.object(firebase, "_db", db), \
+            patch.object(search_service, "_user_indexes", search_service.TTLCache(60)):
+        yield db
+
+
+def test_search_indexes_only_changed_graphs(db):
+    """Later searches read the terms of new and changed graphs only, and deleted graphs disappear."""
+    firebase.save_goal_graph("user-1", "Learn guitar", _nodes("Learn guitar", "Buy strings"), "graph-1")
+    firebase.save_goal_graph("user-1", "Run a marathon", _nodes("Run a marathon", "Buy shoes"), "graph-2")
+    firebase.save_goal_graph("user-2", "Buy a car", _nodes("Buy a car"), "graph-3")
+
+    first = search_service.search_user_goals("user-1", "buy")
+    firebase.update_goal_graph("graph-2", nodes=_nodes("Run a marathon", "Train every week"))
+    firebase.delete_goal_graph("graph-1")
+    with patch.object(search_service, "get_goal_graph_terms", wraps=firebase.get_goal_graph_terms) as mock_get:
+        second = search_service.search_user_goals("user-1", "buy")
+        third = search_service.search_user_goals("user-1", "training")
+
+    assert sorted(result["id"] for result in first) == ["graph-1", "graph-2"]
+    assert second == []
+    assert [result["id"] for result in third] == ["graph-2"]
+    assert third[0]["goal"] == "Run a marathon" and third[0]["score"] > 0
+    mock_get.assert_called_once_with("user-1", ["graph-2"])
+
+
+def test_cold_search_reads_summaries_not_graphs(db):
+    """A first search reads each summary twice (listing, batched terms) and no graph."""
+    for number in range(5):
+        firebase.save_goal_graph("user-1", f"Learn guitar {number}",
+                                 _nodes("Learn guitar", "Buy strings"), f"graph-{number}")
+    firebase.get_user_goal_graphs("user-1")
+    db.reads = 0
+
+    with patch.object(firebase, "get_goal_graph_by_id", side_effect=AssertionError("a graph was read")):
+        results = search_service.search_user_goals("user-1", "strings")
+
+    assert len(results) == 5
+    # The history marker, five listed summaries and one batch of five terms
+    assert db.reads == 1 + 5 + 5
+
+
+def test_search_endpoint():
+    """The query is required, and results come from the search service."""
+    results = [{"id": "graph-1", "goal": "Learn guitar", "node_count": 3, "score": 1.2}]
+    with patch("app.api.routes.goals.search_user_goals", return_value=results) as mock_search:
+        response = client.get("/api/v1/goals/user/user-1/search", params={"q": "guitar", "limit": 5})
+        missing = client.get("/api/v1/goals/user/user-1/search")
+
+    assert response.json() == results
+    mock_search.assert_called_once_with("user-1", "guitar", 5)
+    assert missing.status_code == 422
@@ -0,0 +1,47 @@
+import os
+import sys
+import subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import SQLiteCache, TTLCache, create_cache  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_values_are_shared_between_processes(tmp_path):
+    """A value set by another process is visible, and pop hands it out only once."""
+    path = str(tmp_path / "cache.sqlite3")
+    script = ("from app.utils import SQLiteCache; "
+              "SQLiteCache({!r}, 'alternates', 60).set(('graph-1', 'Goal'), [[{{'id': '0'}}]])").format(path)
+    subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, check=True)
+
+    cache = SQLiteCache(path, "alternates", 60)
+    other_worker = SQLiteCache(path, "alternates", 60)
+
+    assert ("graph-1", "Goal") in cache
+    assert cache.pop(("graph-1", "Goal")) == [[{"id": "0"}]]
+    assert other_worker.pop(("graph-1", "Goal")) is None
+
+
+def test_expiry_eviction_and_namespaces(tmp_path):
+    """Entries expire, the least recently used ones are evicted and namespaces are separate."""
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path, "checkpoints", 60, max_size=2)
+    other = SQLiteCache(path, "alternates", 60)
+
+    cache.set("expired", "x", ttl_seconds=-1)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("expired") is None
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
+    assert other.get("a") is None
+
+
+def test_create_cache_is_in_process_without_a_path(tmp_path):
+    """Without a shared path the caches stay in the process."""
+    assert isinstance(create_cache("checkpoints", 60), TTLCache)
+    assert isinstance(create_cache("checkpoints", 60, shared_path=str(tmp_path / "c.sqlite3")), SQLiteCache)
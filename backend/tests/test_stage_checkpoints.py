@@ -0,0 +1,50 @@
+import os
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from app.services import goal_analysis_service  # noqa: E402
+
+NODES = [
+    {"id": "0", "label": "Goal", "parent_id": None},
+    {"id": "1", "label": "First", "parent_id": "0"},
+]
+
+
+def test_retry_resumes_at_second_stage():
+    """A failed second stage keeps the first stage result for the retry."""
+    goal_analysis_service.stage_checkpoints.clear()
+    key = goal_analysis_service.make_checkpoint_key("process", "user", "Goal")
+
+    with patch.object(goal_analysis_service, "analyze_goal_for_actions", return_value=["First"]) as mock_analyze, \
+            patch.object(goal_analysis_service, "create_graph_from_actions", side_effect=ValueError("Invalid JSON")), \
+            patch.object(goal_analysis_service.settings, "STRUCTURE_STAGE_MAX_ATTEMPTS", 1):
+        with pytest.raises(ValueError):
+            goal_analysis_service.process_goal_with_dual_llm("Goal", key)
+
+    assert mock_analyze.call_count == 1
+    assert key in goal_analysis_service.stage_checkpoints
+
+    with patch.object(goal_analysis_service, "analyze_goal_for_actions") as mock_analyze, \
+            patch.object(goal_analysis_service, "create_graph_from_actions", return_value=NODES) as mock_create:
+        nodes = goal_analysis_service.process_goal_with_dual_llm("Goal", key)
+
+    mock_analyze.assert_not_called()
+    mock_create.assert_called_once_with("Goal", ["First"])
+    assert len(nodes) == 2
+    assert key not in goal_analysis_service.stage_checkpoints
+
+
+def test_stage_retries_use_their_own_limit():
+    """The second stage is retried within the request up to its own limit."""
+    goal_analysis_service.stage_checkpoints.clear()
+
+    with patch.object(goal_analysis_service, "analyze_goal_for_actions", return_value=["First"]) as mock_analyze, \
+            patch.object(goal_analysis_service, "create_graph_from_actions", side_effect=[ValueError("Invalid JSON"), NODES]) as mock_create, \
+            patch.object(goal_analysis_service.settings, "STRUCTURE_STAGE_MAX_ATTEMPTS", 2):
+        nodes = goal_analysis_service.process_goal_with_dual_llm("Goal")
+
+    assert mock_analyze.call_count == 1
+    assert mock_create.call_count == 2
+    assert len(nodes) == 2
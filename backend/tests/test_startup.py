@@ -0,0 +1,40 @@
+import os
+import sys
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budget for app.main, in milliseconds
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+LAZY_MODULES = ["openai", "anthropic", "google.generativeai", "firebase_admin"]
+
+
+def _import_app():
+    """Import app.main in a fresh interpreter without provider keys."""
+    env = {key: value for key, value in os.environ.items()
+           if not key.endswith("_API_KEY") and key != "FIREBASE_SERVICE_ACCOUNT_KEY"}
+    code = "import sys, app.main; print(','.join(m for m in {!r} if m in sys.modules))".format(
+        LAZY_MODULES)
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60)
+
+
+def test_app_imports_without_provider_keys_or_sdks():
+    """Importing the app needs no API keys and loads no provider SDKs."""
+    result = _import_app()
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+
+def test_app_import_time_budget():
+    """The cumulative import time of app.main stays within the budget."""
+    result = _import_app()
+
+    app_line = next(line for line in result.stderr.splitlines()
+                    if line.rstrip().endswith("| app.main"))
+    cumulative_ms = int(app_line.split("|")[1]) / 1000
+
+    assert cumulative_ms <= IMPORT_TIME_BUDGET_MS
@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openai  # noqa: E402
+from app.services import goal_analysis_service  # noqa: E402
+from app.services.llm_json import StreamingNodeParser, close_truncated_graph, is_truncated_graph  # noqa: E402
+from benchmarks.fakes import FakeLLMServer  # noqa: E402
+
+
+def test_streaming_parser_counts_complete_nodes():
+    """Braces and quotes inside strings do not end a node, split chunks are joined."""
+    content = json.dumps({"nodes": [
+        {"id": "0", "label": "Learn {guitar}", "parent_id": None},
+        {"id": "1", "label": "Buy a \"good\" guitar]", "parent_id": "0"},
+        {"id": "2", "label": "Learn chords", "parent_id": "0"},
+    ]})
+    parser = StreamingNodeParser()
+
+    counts = [parser.feed(content[i:i + 7]) for i in range(0, len(content), 7)]
+
+    assert counts[-1] == 3
+    assert counts == sorted(counts)
+    assert parser.nodes[1]["label"] == 'Buy a "good" guitar]'
+
+
+def test_truncated_graph_drops_orphans():
+    """Nodes whose parent was cut off are dropped, and the response is marked."""
+    content = close_truncated_graph([
+        {"id": "0", "label": "Goal", "parent_id": None},
+        {"id": "2", "label": "Step", "parent_id": "1"},
+        {"id": "3", "label": "Other step", "parent_id": "0"},
+    ])
+
+    assert [node["id"] for node in json.loads(content)["nodes"]] == ["0", "3"]
+    assert is_truncated_graph(content)
+    assert not is_truncated_graph('{"nodes": []}')
+
+
+@patch.object(goal_analysis_service.settings, "STRUCTURE_NODE_CAP", 3)
+def test_structuring_stream_stops_at_the_node_cap():
+    """The stream is closed after the cap, the graph is cut there and the run is flagged."""
+    server = FakeLLMServer(latency_ms=50, jitter_ms=0, node_count=12).start()
+    openai_client = openai.OpenAI(api_key="test", base_url=server.url + "/v1", max_retries=0)
+    try:
+        with patch.object(goal_analysis_service, "get_openai_client", return_value=openai_client), \
+                patch.object(goal_analysis_service, "analyze_goal_for_actions", return_value=["Step"]):
+            nodes, pipeline = goal_analysis_service.process_goal_with_pipeline("Learn guitar", "dual_llm")
+            truncated = goal_analysis_service.was_graph_truncated()
+    finally:
+        server.stop()
+
+    assert pipeline == "dual_llm"
+    assert len(nodes) == 3
+    assert truncated
+    assert server.streamed_chunks < 12
+
+
+@patch.object(goal_analysis_service.settings, "STRUCTURE_NODE_CAP", 20)
+def test_structuring_stream_below_the_cap_is_complete():
+    """A graph smaller than the cap is streamed to the end and not flagged."""
+    server = FakeLLMServer(latency_ms=10, jitter_ms=0, node_count=4).start()
+    openai_client = openai.OpenAI(api_key="test", base_url=server.url + "/v1", max_retries=0)
+    try:
+        with patch.object(goal_analysis_service, "get_openai_client", return_value=openai_client), \
+                patch.object(goal_analysis_service, "analyze_goal_for_actions", return_value=["Step"]):
+            nodes, _ = goal_analysis_service.process_goal_with_pipeline("Learn guitar", "dual_llm")
+            truncated = goal_analysis_service.was_graph_truncated()
+    finally:
+        server.stop()
+
+    assert len(nodes) == 4
+    assert not truncated
+
+
+@patch.object(goal_analysis_service.settings, "STRUCTURE_NODE_CAP", 0)
+def test_truncated_flag_does_not_outlive_its_graph():
+    """A structuring call outside the pipeline entry point clears a flag left by an earlier one."""
+    content = json.dumps({"nodes": [{"id": "0", "label": "Learn guitar", "parent_id": None}]})
+    openai_client = MagicMock()
+    openai_client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+    goal_analysis_service._graph_truncated.set(True)
+
+    with patch.object(goal_analysis_service, "get_openai_client", return_value=openai_client):
+        goal_analysis_service.create_graph_from_actions("Learn guitar", ["Buy a guitar"])
+
+    assert not goal_analysis_service.was_graph_truncated()
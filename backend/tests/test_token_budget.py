@@ -0,0 +1,84 @@
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from app.services import token_budget  # noqa: E402
+from app.services.prompts import (  # noqa: E402
+    GRAPH_STRUCTURE_SYSTEM_PROMPT,
+    GRAPH_STRUCTURE_USER_TEMPLATE,
+    build_messages
+)
+
+
+def test_static_prefix_is_shared_between_goals():
+    """Only the last message depends on the goal."""
+    first = build_messages(GRAPH_STRUCTURE_SYSTEM_PROMPT, GRAPH_STRUCTURE_USER_TEMPLATE,
+                           goal_text="Learn Spanish", actions_text="1. Buy a book")
+    second = build_messages(GRAPH_STRUCTURE_SYSTEM_PROMPT, GRAPH_STRUCTURE_USER_TEMPLATE,
+                            goal_text="Run a marathon", actions_text="1. Buy shoes")
+
+    assert first[0] == second[0]
+    assert "Learn Spanish" in first[1]["content"]
+    assert "{" not in first[1]["content"]
+
+
+def test_enforce_prompt_budget():
+    """Prompts over the input budget are rejected before they are sent."""
+    assert token_budget.count_tokens("") == 0
+    assert token_budget.enforce_prompt_budget("Learn Spanish", budget=100) > 0
+    with pytest.raises(ValueError):
+        token_budget.enforce_prompt_budget("word " * 200, budget=50)
+
+
+@patch.object(token_budget.settings, "OUTPUT_TOKENS_BASE", 100)
+@patch.object(token_budget.settings, "OUTPUT_TOKENS_PER_NODE", 10)
+@patch.object(token_budget.settings, "REASONING_TOKENS_ALLOWANCE", 1000)
+@patch.object(token_budget.settings, "REASONING_TOKENS_PER_NODE", 50)
+def test_output_token_budget_scales_with_nodes():
+    """The output budget, with or without the reasoning allowance, grows with the expected node count."""
+    assert token_budget.output_token_budget(16) == 260
+    assert token_budget.output_token_budget(16, reasoning=True) == 2060
+    assert (token_budget.output_token_budget(32, reasoning=True)
+            - token_budget.output_token_budget(16, reasoning=True)) == 16 * 60
+
+
+def test_encoding_is_loaded_on_first_use():
+    """The tokenizer is not loaded at import, and only once."""
+    tiktoken = SimpleNamespace(get_encoding=MagicMock(
+        return_value=SimpleNamespace(encode=lambda text: text.split())))
+    with patch.object(token_budget, "_encoding", token_budget._NOT_LOADED), \
+            patch.dict(sys.modules, {"tiktoken": tiktoken}):
+        assert token_budget.count_tokens("learn to play") == 3
+        assert token_budget.count_tokens("guitar") == 1
+
+    tiktoken.get_encoding.assert_called_once_with("o200k_base")
+
+
+def test_record_token_usage():
+    """Provider usage is recorded per call, with the local estimate as fallback."""
+    response = SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=120, completion_tokens=80,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=64)))
+    before = token_budget.get_token_usage().get("test_call", {}).get("calls", 0)
+
+    usage = token_budget.record_token_usage("test_call", response)
+    fallback = token_budget.record_token_usage("test_call", SimpleNamespace(), 42)
+
+    assert usage == {"prompt_tokens": 120, "completion_tokens": 80, "cached_prompt_tokens": 64}
+    assert fallback["prompt_tokens"] == 42
+    assert token_budget.get_token_usage()["test_call"]["calls"] == before + 2
+
+
+def test_token_stats_endpoint_reports_usage():
+    """Accumulated token usage is served by the API."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    token_budget.record_token_usage("endpoint_call", SimpleNamespace(), 10)
+    response = TestClient(app).get("/api/v1/goals/tokens/stats")
+
+    assert response.status_code == 200
+    assert response.json()["endpoint_call"]["prompt_tokens"] >= 10
@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.core import tracing  # noqa: E402
+from app.core.metrics import timed_stage  # noqa: E402
+from app.api.routes import goals  # noqa: E402
+
+client = TestClient(app)
+
+
+def _exported_spans(path):
+    with open(path) as f:
+        return [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0] for line in f]
+
+
+def test_request_id_is_returned_and_reused():
+    """A valid incoming X-Request-ID is echoed, otherwise one is generated."""
+    response = client.get("/", headers={"X-Request-ID": "req-42"})
+    generated = client.get("/")
+
+    assert response.headers["x-request-id"] == "req-42"
+    assert len(generated.headers["x-request-id"]) == 32
+    assert generated.headers["traceparent"].startswith("00-")
+
+
+def test_stage_spans_are_children_of_the_request_span(tmp_path):
+    """Firestore and LLM stages run in the threadpool still attach to the request span."""
+    export_path = str(tmp_path / "spans.jsonl")
+
+    @timed_stage("firestore_get")
+    def fake_get(graph_id):
+        return None
+
+    with patch.object(tracing.settings, "TRACING_EXPORTER", "file"), \
+            patch.object(tracing.settings, "TRACING_EXPORT_PATH", export_path), \
+            patch.object(tracing, "_export_file", None), \
+            patch.object(goals, "get_goal_graph_by_id", fake_get):
+        response = client.get("/api/v1/goals/graph-1")
+        tracing._export_file.close()
+
+    spans = {span["name"]: span for span in _exported_spans(export_path)}
+    request_span = spans["GET /api/v1/goals/{graph_id}"]
+    stage_span = spans["firestore_get"]
+
+    assert response.status_code == 404
+    assert stage_span["traceId"] == request_span["traceId"]
+    assert stage_span["parentSpanId"] == request_span["spanId"]
+    assert response.headers["traceparent"].split("-")[1] == request_span["traceId"]
+
+
+def test_log_records_carry_the_request_id():
+    """Log records created within a span carry its request ID."""
+    import logging
+
+    tracing.install_log_record_factory()
+    with tracing.start_span("test", request_id="req-7"):
+        record = logging.getLogger("test").makeRecord("test", logging.INFO, __file__, 1, "msg", (), None)
+
+    assert record.request_id == "req-7"
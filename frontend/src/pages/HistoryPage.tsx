@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { apiService } from '../services/api';
-import { SavedGoalGraph, SubgoalNode } from '../types';
+import { GoalGraphSummary, SavedGoalGraph, SubgoalNode } from '../types';
 import GoalGraph from '../components/GoalGraph';
 
 // Mock user ID for demo purposes
@@ -9,8 +9,9 @@ const DEMO_USER_ID = 'demo-user-123';
 const HistoryPage: React.FC = () => {
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const [goalGraphs, setGoalGraphs] = useState<SavedGoalGraph[]>([]);
+  const [goalGraphs, setGoalGraphs] = useState<GoalGraphSummary[]>([]);
   const [selectedGraph, setSelectedGraph] = useState<SavedGoalGraph | null>(null);
+  const [selectedId, setSelectedId] = useState<string | null>(null);
 
   useEffect(() => {
     const fetchGoalGraphs = async () => {
@@ -23,7 +24,7 @@ const HistoryPage: React.FC = () => {
         
         // Select the first graph by default if available
         if (graphs.length > 0) {
-          setSelectedGraph(graphs[0]);
+          setSelectedId(graphs[0].id);
         }
       } catch (err) {
         console.error('Error fetching goal graphs:', err);
@@ -36,8 +37,34 @@ const HistoryPage: React.FC = () => {
     fetchGoalGraphs();
   }, []);
 
-  const handleSelectGraph = (graph: SavedGoalGraph) => {
-    setSelectedGraph(graph);
+  // The list holds summaries only, so the nodes are fetched for the selected graph
+  useEffect(() => {
+    if (!selectedId) return;
+    let cancelled = false;
+
+    const fetchGoalGraph = async () => {
+      setSelectedGraph(null);
+      try {
+        const graph = await apiService.getGoalGraph(selectedId);
+        if (!cancelled) {
+          setSelectedGraph(graph);
+        }
+      } catch (err) {
+        console.error('Error fetching goal graph:', err);
+        if (!cancelled) {
+          setError('Failed to load the selected goal graph. Please try again later.');
+        }
+      }
+    };
+
+    fetchGoalGraph();
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedId]);
+
+  const handleSelectGraph = (graph: GoalGraphSummary) => {
+    setSelectedId(graph.id);
   };
 
   const formatDate = (timestamp: any) => {
@@ -86,7 +113,7 @@ const HistoryPage: React.FC = () => {
                 {goalGraphs.map((graph) => (
                   <li 
                     key={graph.id} 
-                    className={selectedGraph?.id === graph.id ? 'selected' : ''}
+                    className={selectedId === graph.id ? 'selected' : ''}
                     onClick={() => handleSelectGraph(graph)}
                   >
                     <h3>{graph.goal}</h3>
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { GoalRequest, GoalGraphResponse, SavedGoalGraph } from '../types';
+import { GoalRequest, GoalGraphResponse, GoalGraphSummary, SavedGoalGraph } from '../types';
 
 // Get the API URL from environment variables or use default
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
@@ -25,10 +25,10 @@ export const apiService = {
     }
   },
 
-  // Get all goal graphs for a user
-  getUserGoalGraphs: async (userId: string): Promise<SavedGoalGraph[]> => {
+  // Get the summaries of all goal graphs of a user, without their nodes
+  getUserGoalGraphs: async (userId: string): Promise<GoalGraphSummary[]> => {
     try {
-      const response = await apiClient.get<SavedGoalGraph[]>(`/user/${userId}/goal-graphs`);
+      const response = await apiClient.get<GoalGraphSummary[]>(`/api/v1/goals/user/${userId}`);
       return response.data;
     } catch (error) {
       console.error('Error fetching user goal graphs:', error);
@@ -36,6 +36,17 @@ export const apiService = {
     }
   },
 
+  // Get a goal graph with its nodes
+  getGoalGraph: async (graphId: string): Promise<SavedGoalGraph> => {
+    try {
+      const response = await apiClient.get<SavedGoalGraph>(`/api/v1/goals/${graphId}`);
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching goal graph:', error);
+      throw error;
+    }
+  },
+
   // Health check
   healthCheck: async (): Promise<{ message: string }> => {
     try {
@@ -30,6 +30,16 @@ export interface SavedGoalGraph {
   user_id: string;
 }
 
+// Summary of a saved goal graph in the user's history, without its nodes
+export interface GoalGraphSummary {
+  id: string;
+  goal: string;
+  node_count: number;
+  created_at: Timestamp;
+  updated_at?: Timestamp;
+  user_id: string;
+}
+
 // For the force-directed graph visualization
 export interface GraphData {
   nodes: Array<{